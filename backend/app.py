@@ -11,15 +11,22 @@ project_root = Path(__file__).parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+import json
 import logging
+import multiprocessing
+import threading
+import time
 import uuid
 
 from backend.config import Config
 from backend.services.llm_service import LLMService
-from backend.services.rag_engine import RAGEngine
+from backend.services.rag_engine import RAGEngine, parse_search_filters
+from backend.services.index_snapshot import latest_snapshot, acquire_writer_role, request_index_update, index_update_requests
+from backend.services.context_packer import pack_context, context_sources
+from backend.services.answer_cache import SemanticAnswerCache, answer_scope
 from backend.services.audio_service import AudioService
 from backend.services.video_service import VideoService
 from backend.models import db
@@ -52,6 +59,7 @@ llm_service = None
 rag_engine = None
 audio_service = None
 video_service = None
+answer_cache = None
 
 def get_llm_service():
     global llm_service
@@ -59,40 +67,157 @@ def get_llm_service():
         llm_service = LLMService()
     return llm_service
 
+rag_engine_lock = threading.Lock()
+snapshot_writer_lock = None  # held for the life of the worker process that writes snapshots
+
 def get_rag_engine():
     global rag_engine
     if rag_engine is None:
-        rag_engine = RAGEngine()
-        if not rag_engine.is_initialized:
+        with rag_engine_lock:
+            if rag_engine is None:
+                rag_engine = start_rag_engine()
+    return rag_engine
+
+def start_rag_engine():
+    """
+    Create the RAG engine without blocking the caller.
+    The newest index snapshot is loaded (memory-mapped) so queries are served
+    immediately. Of several worker processes, one becomes the snapshot
+    writer: a background thread reconciles the index against the
+    ContentSource table (or runs a full ingestion if there is no snapshot),
+    publishes a snapshot, and then handles reindex requests from the other
+    workers. The other workers only load the snapshots it publishes.
+    """
+    global snapshot_writer_lock
+    rag = RAGEngine(llm_service=get_llm_service())
+    snapshot_writer_lock = acquire_writer_role()
+    rag.is_snapshot_writer = snapshot_writer_lock is not None
+    loaded_path = latest_snapshot()
+    try:
+        if loaded_path:
+            rag.load_index(loaded_path)
+    except Exception as e:
+        logger.warning(f"Could not load RAG index snapshot, re-ingesting: {e}")
+        loaded_path = None
+    
+    def update_index(rebuild):
+        with app.app_context():
             try:
-                with app.app_context():
-                    rag_engine.initialize()
+                if rebuild:
+                    rag.initialize()
+                    changed = True
+                else:
+                    changed = rag.reconcile()
+                if changed:
+                    rag.save_index()
                 logger.info("RAG engine initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize RAG engine: {e}")
                 # Mark as initialized even if empty to prevent repeated errors
-                rag_engine.is_initialized = True
-                rag_engine.chunks = []
-                rag_engine.index = None
-    return rag_engine
+                rag.is_initialized = True
+    
+    def write_snapshots():
+        handled = index_update_requests()
+        update_index(rebuild=loaded_path is None)
+        while True:
+            time.sleep(Config.RAG_SNAPSHOT_POLL_SECONDS)
+            requested = index_update_requests()
+            if requested != handled:
+                rebuild = requested[1] != handled[1]
+                handled = requested
+                update_index(rebuild)
+    
+    def follow_snapshots():
+        current = loaded_path
+        while True:
+            time.sleep(Config.RAG_SNAPSHOT_POLL_SECONDS)
+            latest = latest_snapshot()
+            if latest and latest != current:
+                current = latest
+                try:
+                    rag.load_index(latest)
+                except Exception as e:
+                    logger.error(f"Failed to load RAG index snapshot {latest}: {e}")
+    
+    if rag.is_snapshot_writer:
+        logger.info(f"Process {os.getpid()} is the RAG snapshot writer")
+        threading.Thread(target=write_snapshots, daemon=True).start()
+    else:
+        threading.Thread(target=follow_snapshots, daemon=True).start()
+    return rag
 
 def get_audio_service():
     global audio_service
     if audio_service is None:
-        audio_service = AudioService()
+        audio_service = AudioService(llm_service=get_llm_service())
     return audio_service
 
 def get_video_service():
     global video_service
     if video_service is None:
-        video_service = VideoService()
+        video_service = VideoService(llm_service=get_llm_service(), audio_service=get_audio_service())
     return video_service
 
-# Create tables
-with app.app_context():
-    db.create_all()
-    # Create upload directories
-    os.makedirs('backend/static/uploads/pdfs', exist_ok=True)
+def get_answer_cache():
+    """Semantic answer cache, or None when it is disabled"""
+    global answer_cache
+    if answer_cache is None and Config.ANSWER_CACHE_ENABLED:
+        answer_cache = SemanticAnswerCache(
+            threshold=Config.ANSWER_CACHE_SIMILARITY,
+            max_entries=Config.ANSWER_CACHE_MAX_ENTRIES,
+            sync_seconds=Config.ANSWER_CACHE_SYNC_SECONDS
+        )
+    return answer_cache
+
+def reindex_source_in_background(source_id):
+    """
+    Re-index a single content source without blocking the request, or drop
+    it from the index if it was deleted or deactivated. Only the given source
+    is downloaded and embedded; every other source stays in the live index
+    untouched. Workers other than the snapshot writer ask the writer to
+    reconcile instead, and pick the change up with its next snapshot.
+    """
+    rag = get_rag_engine()
+    if not rag.is_snapshot_writer:
+        request_index_update()
+        return
+    def reindex_with_context():
+        with app.app_context():
+            try:
+                source = ContentSource.query.get(source_id)
+                if source and source.is_active:
+                    rag.add_source(source)
+                else:
+                    rag.remove_source(source_id)
+                rag.save_index()
+            except Exception as e:
+                logger.error(f"Failed to re-index source {source_id}: {e}")
+    threading.Thread(target=reindex_with_context, daemon=True).start()
+
+def save_rag_index_in_background():
+    """Persist a fresh index snapshot so restarts start warm"""
+    rag = get_rag_engine()
+    def save():
+        try:
+            rag.save_index()
+        except Exception as e:
+            logger.error(f"Failed to save RAG index snapshot: {e}")
+    threading.Thread(target=save, daemon=True).start()
+
+# PDF parse workers are spawned processes that re-import the main module (and
+# with it this one); only the serving process creates tables and starts the engine
+if multiprocessing.current_process().name == 'MainProcess':
+    # Create tables
+    with app.app_context():
+        db.create_all()
+        # Create upload directories
+        os.makedirs('backend/static/uploads/pdfs', exist_ok=True)
+    
+    # Warm start: serve from the last index snapshot while reconciling in background
+    try:
+        get_rag_engine()
+    except Exception as e:
+        logger.warning(f"RAG engine warm start failed, will retry on first request: {e}")
 
 @app.route('/', methods=['GET'])
 def root():
@@ -120,12 +245,98 @@ def health_check():
         'rag_initialized': rag.is_initialized if rag else False
     })
 
+@app.route('/api/stats', methods=['GET'])
+def service_stats():
+    """Cache and retrieval statistics"""
+    try:
+        llm = get_llm_service()
+        rag = get_rag_engine()
+        cache = get_answer_cache()
+        return jsonify({
+            'embedding_cache': llm.embedding_cache.stats() if llm.embedding_cache else None,
+            'response_cache': llm.response_cache.stats() if llm.response_cache else None,
+            'providers': {
+                'generation': llm.router.stats(),
+                'embedding': llm.embedding_router.stats() if llm.embedding_router else None
+            },
+            'single_flight': {
+                'generation': llm.generation_flights.stats(),
+                'embedding': llm.embedding_flights.stats(),
+                'tts': audio_service.tts_flights.stats() if audio_service else None
+            },
+            'answer_cache': cache.stats() if cache else None,
+            'query_cache': rag.query_cache.stats(),
+            'index_generation': rag.generations.stats()
+        })
+    except Exception as e:
+        logger.error(f"Stats error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def chat_system_prompt(mode):
+    """System prompt for a chat answer mode (normal, exam or simple)"""
+    system_prompt = Config.CHAT_SYSTEM_PROMPT
+    if mode == 'exam':
+        system_prompt += "\n\nFormat your response as bullet points suitable for exam answers."
+    elif mode == 'simple':
+        system_prompt += "\n\nExplain in simple terms, as if the student is 12 years old."
+    return system_prompt
+
+def save_chat_message(session_id, message, response, sources, mode):
+    """
+    Persist a question/answer pair.
+    
+    Returns:
+        The ChatMessage, or None if it could not be saved
+    """
+    try:
+        chat_message = ChatMessage(
+            session_id=session_id,
+            user_message=message,
+            ai_response=response,
+            sources=ChatMessage.encode_sources(sources),
+            mode=mode
+        )
+        db.session.add(chat_message)
+        db.session.commit()
+        return chat_message
+    except Exception as db_error:
+        db.session.rollback()
+        logger.warning(f"Failed to save message to database: {db_error}")
+        return None
+
+def find_cached_answer(rag, message, scope, corpus_version):
+    """
+    Look a chat question up in the semantic answer cache.
+    
+    Returns:
+        (cached answer dict or None, query embedding or None if unavailable)
+    """
+    cache = get_answer_cache()
+    if cache is None:
+        return None, None
+    try:
+        deadline = Config.RAG_EMBEDDING_DEADLINE_MS / 1000 if Config.RAG_EMBEDDING_DEADLINE_MS > 0 else None
+        query_vector = rag.embed_query(message, timeout=deadline)
+        return cache.lookup(query_vector, scope, corpus_version), query_vector
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return None, None
+
+def remember_answer(query_vector, scope, corpus_version, chat_message, sources):
+    """Add a generated answer to the semantic answer cache"""
+    cache = get_answer_cache()
+    if cache is not None and query_vector is not None and chat_message is not None:
+        cache.add(query_vector, scope, corpus_version, chat_message, sources)
+
 @app.route('/api/chat', methods=['POST', 'OPTIONS'])
 def chat():
     """
     Chat endpoint for Q&A interactions.
-    Expects: { "message": "...", "session_id": "...", "mode": "normal|exam|simple" }
+    Expects: { "message": "...", "session_id": "...", "mode": "normal|exam|simple",
+               "filters": { "source_id": [...], "source_type": "pdf|video|pdf_url|pdf_file|youtube" } }
+    (filters is optional and scopes retrieval to the given sources)
     Returns: { "response": "...", "sources": [...], "session_id": "..." }
+    ("cached": true is added when a past answer to a near-identical question is reused)
     """
     # Handle OPTIONS preflight request
     if request.method == 'OPTIONS':
@@ -139,9 +350,14 @@ def chat():
         message = data.get('message', '')
         session_id = data.get('session_id')
         mode = data.get('mode', 'normal')
+        filters = data.get('filters')
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
+        try:
+            parse_search_filters(filters)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Create or get session
         if not session_id:
@@ -165,9 +381,22 @@ def chat():
                 'session_id': session_id
             })
         
+        # A near-identical question over the same content may already be answered
+        corpus_version = rag.corpus_version
+        scope = answer_scope(mode, filters)
+        cached, query_vector = find_cached_answer(rag, message, scope, corpus_version)
+        if cached:
+            save_chat_message(session_id, message, cached['response'], cached['sources'], mode)
+            return jsonify({
+                'response': cached['response'],
+                'sources': cached['sources'],
+                'session_id': session_id,
+                'cached': True
+            })
+        
         # Try to search for relevant context
         try:
-            context_chunks = rag.search(message, top_k=Config.TOP_K_RESULTS)
+            context_chunks = rag.search(message, top_k=Config.TOP_K_RESULTS, filters=filters)
         except Exception as e:
             logger.warning(f"RAG search error: {e}")
             context_chunks = []
@@ -179,44 +408,24 @@ def chat():
                 'session_id': session_id
             })
         
-        # Build context string
-        context = "\n\n".join([
-            f"[Source: {chunk['source']}]\n{chunk['text']}"
-            for chunk in context_chunks
-        ])
+        # Build context string within the prompt token budget
+        context, context_chunks = pack_context(context_chunks, Config.CONTEXT_MAX_TOKENS)
         
         # Get sources for citation
-        sources = list(set([chunk['source'] for chunk in context_chunks]))
+        sources = context_sources(context_chunks)
         
         # Generate response using LLM
         try:
             llm = get_llm_service()
-            system_prompt = Config.CHAT_SYSTEM_PROMPT
-            if mode == 'exam':
-                system_prompt += "\n\nFormat your response as bullet points suitable for exam answers."
-            elif mode == 'simple':
-                system_prompt += "\n\nExplain in simple terms, as if the student is 12 years old."
-            
             response = llm.generate_response(
-                system_prompt=system_prompt,
+                system_prompt=chat_system_prompt(mode),
                 user_message=message,
                 context=context
             )
             
-            # Save message to database
-            try:
-                chat_message = ChatMessage(
-                    session_id=session_id,
-                    user_message=message,
-                    ai_response=response,
-                    sources=','.join(sources),
-                    mode=mode
-                )
-                db.session.add(chat_message)
-                db.session.commit()
-            except Exception as db_error:
-                logger.warning(f"Failed to save message to database: {db_error}")
-                # Continue even if DB save fails
+            # Save message to database (continue even if it fails)
+            chat_message = save_chat_message(session_id, message, response, sources, mode)
+            remember_answer(query_vector, scope, corpus_version, chat_message, sources)
             
             return jsonify({
                 'response': response,
@@ -253,6 +462,164 @@ def chat():
             'session_id': session_id_local
         })
 
+def sse(event, payload):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat over Server-Sent Events.
+    Expects the same body as /api/chat. Emits, in order:
+        event: sources  data: { "sources": [...], "session_id": "..." }
+        event: token    data: { "text": "..." }   (repeated as the answer is generated)
+        event: done     data: { "message_id": ..., "session_id": "..." }
+    or event: error with { "error": "..." } if generation fails. The answer is
+    saved as a ChatMessage once it has been generated in full.
+    """
+    data = request.json or {}
+    message = data.get('message', '')
+    session_id = data.get('session_id')
+    mode = data.get('mode', 'normal')
+    filters = data.get('filters')
+    
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+    try:
+        parse_search_filters(filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not session_id:
+        session = ChatSession()
+        db.session.add(session)
+        db.session.commit()
+        session_id = session.id
+    elif not ChatSession.query.get(session_id):
+        return jsonify({'error': 'Invalid session_id'}), 404
+    
+    rag = get_rag_engine()
+    if not rag.is_initialized:
+        return jsonify({'error': 'RAG engine is still initializing'}), 503
+    
+    corpus_version = rag.corpus_version
+    scope = answer_scope(mode, filters)
+    cached, query_vector = find_cached_answer(rag, message, scope, corpus_version)
+    if cached:
+        chat_message = save_chat_message(session_id, message, cached['response'], cached['sources'], mode)
+        events = [
+            sse('sources', {'sources': cached['sources'], 'session_id': session_id, 'cached': True}),
+            sse('token', {'text': cached['response']}),
+            sse('done', {'message_id': chat_message.id if chat_message else None, 'session_id': session_id})
+        ]
+        return Response(events, mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    
+    # Retrieval runs before the stream opens so search errors still get a status code
+    try:
+        context_chunks = rag.search(message, top_k=Config.TOP_K_RESULTS, filters=filters)
+    except Exception as e:
+        logger.warning(f"RAG search error: {e}")
+        context_chunks = []
+    context, context_chunks = pack_context(context_chunks, Config.CONTEXT_MAX_TOKENS)
+    sources = context_sources(context_chunks)
+    
+    def generate():
+        yield sse('sources', {'sources': sources, 'session_id': session_id})
+        if not context_chunks:
+            response = "I don't have relevant information about that topic in your study materials. Please make sure you've added PDFs or YouTube videos in the 'My Materials' tab, or try asking about topics covered in your materials."
+            yield sse('token', {'text': response})
+            yield sse('done', {'message_id': None, 'session_id': session_id})
+            return
+        
+        parts = []
+        try:
+            llm = get_llm_service()
+            for text in llm.generate_response_stream(
+                system_prompt=chat_system_prompt(mode),
+                user_message=message,
+                context=context
+            ):
+                parts.append(text)
+                yield sse('token', {'text': text})
+        except Exception as llm_error:
+            logger.error(f"LLM streaming error: {llm_error}")
+            yield sse('error', {'error': 'The AI service failed while answering. Please try again in a moment.'})
+            return
+        
+        chat_message = save_chat_message(session_id, message, ''.join(parts), sources, mode)
+        remember_answer(query_vector, scope, corpus_version, chat_message, sources)
+        yield sse('done', {'message_id': chat_message.id if chat_message else None, 'session_id': session_id})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop reverse proxies (nginx) from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def search_result_to_dict(chunk):
+    """
+    Public form of a search result. Chunk IDs are 63-bit, beyond what a
+    JavaScript number holds exactly, so they are sent as strings; internal
+    fields (token counts, chunk positions) are left out.
+    """
+    result = {
+        'chunk_id': str(chunk['chunk_id']),
+        'text': chunk['text'],
+        'source': chunk.get('source'),
+        'sources': context_sources([chunk])
+    }
+    if chunk.get('source_key') is not None:
+        result['source_id'] = str(chunk['source_key'])
+    if chunk.get('page') is not None:
+        result['page'] = chunk['page']
+    for score in ('similarity', 'lexical_score', 'fusion_score'):
+        if score in chunk:
+            result[score] = chunk[score]
+    return result
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    """
+    Retrieve context for many queries in one request.
+    Expects: { "queries": ["...", ...], "top_k": 5, "filters": {...} }
+    Returns: { "results": [{ "query": "...", "chunks": [...] }, ...] }, chunks as in search_result_to_dict
+    """
+    try:
+        data = request.json or {}
+        queries = data.get('queries', [])
+        top_k = int(data.get('top_k', Config.TOP_K_RESULTS))
+        filters = data.get('filters')
+        
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            return jsonify({'error': 'queries must be a non-empty list of strings'}), 400
+        if len(queries) > Config.SEARCH_BATCH_MAX_QUERIES:
+            return jsonify({'error': f'At most {Config.SEARCH_BATCH_MAX_QUERIES} queries per request'}), 400
+        if top_k < 1:
+            return jsonify({'error': 'top_k must be positive'}), 400
+        try:
+            parse_search_filters(filters)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        rag = get_rag_engine()
+        if not rag.is_initialized:
+            return jsonify({'error': 'RAG engine is still initializing'}), 503
+        
+        results = rag.search_batch(queries, top_k=top_k, filters=filters)
+        return jsonify({
+            'results': [
+                {'query': query, 'chunks': [search_result_to_dict(chunk) for chunk in chunks]}
+                for query, chunks in zip(queries, results)
+            ]
+        })
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/audio/dialogue', methods=['POST'])
 def start_dialogue():
     """
@@ -268,10 +635,7 @@ def start_dialogue():
         # Get context for topic
         rag = get_rag_engine()
         context_chunks = rag.search(topic, top_k=3)
-        context = "\n\n".join([
-            f"[Source: {chunk['source']}]\n{chunk['text']}"
-            for chunk in context_chunks
-        ])
+        context, _ = pack_context(context_chunks, Config.CONTEXT_MAX_TOKENS)
         
         # Generate initial teacher explanation
         llm = get_llm_service()
@@ -368,7 +732,7 @@ def generate_video():
         # Get context for topic
         rag = get_rag_engine()
         context_chunks = rag.search(topic, top_k=5)
-        context = "\n\n".join([chunk['text'] for chunk in context_chunks])
+        context, _ = pack_context(context_chunks, Config.CONTEXT_MAX_TOKENS, with_sources=False)
         
         video = get_video_service()
         video_id, video_url = video.generate_summary(
@@ -403,16 +767,25 @@ def get_video(video_id):
 def ingest_content():
     """
     Manually trigger content ingestion.
-    Re-initializes RAG engine with PDF and YouTube videos.
+    Rebuilds the RAG index from PDF and YouTube videos; the current index keeps
+    answering queries until the rebuilt one is swapped in.
     """
     try:
         rag = get_rag_engine()
-        # Re-initialize from scratch
-        rag.is_initialized = False
+        if not rag.is_snapshot_writer:
+            # The writer process rebuilds; this worker loads its snapshot when published
+            request_index_update(rebuild=True)
+            return jsonify({
+                'status': 'accepted',
+                'message': 'Content ingestion requested'
+            }), 202
+        # Re-initialize from scratch into a new index generation
         rag.initialize()
+        save_rag_index_in_background()
         return jsonify({
             'status': 'success',
-            'message': 'Content ingested successfully'
+            'message': 'Content ingested successfully',
+            'dedup': rag.generations.current.ingest_stats
         })
     except Exception as e:
         logger.error(f"Ingest error: {e}")
@@ -448,7 +821,7 @@ def get_session_messages(session_id):
                 'id': m.id,
                 'user_message': m.user_message,
                 'ai_response': m.ai_response,
-                'sources': m.sources.split(',') if m.sources else [],
+                'sources': ChatMessage.decode_sources(m.sources),
                 'mode': m.mode,
                 'created_at': m.created_at.isoformat()
             } for m in messages]
@@ -524,17 +897,9 @@ def add_content_source():
         db.session.add(source)
         db.session.commit()
         
-        # Trigger re-ingestion in background (don't block response)
+        # Index the new source in background (don't block response)
         try:
-            rag = get_rag_engine()
-            rag.is_initialized = False
-            # Initialize in background to avoid blocking
-            # Pass app context to background thread
-            import threading
-            def reinitialize_with_context():
-                with app.app_context():
-                    rag.initialize()
-            threading.Thread(target=reinitialize_with_context, daemon=True).start()
+            reindex_source_in_background(source.id)
         except Exception as e:
             logger.warning(f"Failed to trigger re-ingestion: {e}")
         
@@ -559,19 +924,14 @@ def delete_content_source(source_id):
         source.is_active = False
         db.session.commit()
         
-        # Trigger re-ingestion in background
+        # Drop the source's chunks from the index in background; the removal
+        # may have to wait for a rebuild in progress
         try:
-            rag = get_rag_engine()
-            rag.is_initialized = False
-            import threading
-            def reinitialize_with_context():
-                with app.app_context():
-                    rag.initialize()
-            threading.Thread(target=reinitialize_with_context, daemon=True).start()
+            reindex_source_in_background(source.id)
         except Exception as e:
-            logger.warning(f"Failed to trigger re-ingestion: {e}")
+            logger.warning(f"Failed to trigger removal from index: {e}")
         
-        return jsonify({'message': 'Content source deleted successfully'})
+        return jsonify({'message': 'Content source deleted. Removing it from the index in background...'}), 202
     
     except Exception as e:
         logger.error(f"Delete content source error: {e}")
@@ -617,15 +977,9 @@ def upload_pdf():
         db.session.add(source)
         db.session.commit()
         
-        # Trigger re-ingestion in background
+        # Index the uploaded PDF in background
         try:
-            rag = get_rag_engine()
-            rag.is_initialized = False
-            import threading
-            def reinitialize_with_context():
-                with app.app_context():
-                    rag.initialize()
-            threading.Thread(target=reinitialize_with_context, daemon=True).start()
+            reindex_source_in_background(source.id)
         except Exception as e:
             logger.warning(f"Failed to trigger re-ingestion: {e}")
         
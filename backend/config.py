@@ -35,11 +35,126 @@ class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
     GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
     
+    # Provider Clients (one pooled, keep-alive HTTP client per provider, shared by all services)
+    PROVIDER_MAX_CONNECTIONS = int(os.getenv('PROVIDER_MAX_CONNECTIONS', '20'))
+    PROVIDER_MAX_KEEPALIVE = int(os.getenv('PROVIDER_MAX_KEEPALIVE', '10'))
+    PROVIDER_KEEPALIVE_EXPIRY = float(os.getenv('PROVIDER_KEEPALIVE_EXPIRY', '30'))  # seconds an idle connection is kept
+    PROVIDER_TIMEOUT = float(os.getenv('PROVIDER_TIMEOUT', '60'))  # seconds per request
+    PROVIDER_CONNECT_TIMEOUT = float(os.getenv('PROVIDER_CONNECT_TIMEOUT', '10'))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))  # in-flight generations per process
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', '8'))  # in-flight embedding batches per process
+    
+    # Provider Routing (calls go to the fastest healthy provider; slow ones are hedged past their p95)
+    LLM_ROUTING_ENABLED = os.getenv('LLM_ROUTING_ENABLED', 'True').lower() == 'true'  # route across OpenAI + Gemini if both keys are set
+    ROUTER_HEDGE_ENABLED = os.getenv('ROUTER_HEDGE_ENABLED', 'True').lower() == 'true'
+    ROUTER_HEDGE_PERCENTILE = float(os.getenv('ROUTER_HEDGE_PERCENTILE', '95'))
+    ROUTER_HEDGE_MIN_MS = int(os.getenv('ROUTER_HEDGE_MIN_MS', '200'))
+    LLM_HEDGE_DEFAULT_MS = int(os.getenv('LLM_HEDGE_DEFAULT_MS', '8000'))  # hedge delay until a provider has latency data
+    EMBEDDING_HEDGE_DEFAULT_MS = int(os.getenv('EMBEDDING_HEDGE_DEFAULT_MS', '2000'))
+    ROUTER_LATENCY_WINDOW = int(os.getenv('ROUTER_LATENCY_WINDOW', '200'))  # recent calls per provider
+    ROUTER_FAILURE_THRESHOLD = int(os.getenv('ROUTER_FAILURE_THRESHOLD', '3'))  # consecutive failures before a cooldown
+    ROUTER_COOLDOWN_SECONDS = float(os.getenv('ROUTER_COOLDOWN_SECONDS', '30'))
+    # Extra OpenAI-compatible endpoints (comma-separated base URLs) serving OPENAI_EMBEDDING_MODEL,
+    # used for hedging and failover of embedding calls
+    OPENAI_EMBEDDING_FALLBACK_URLS = [url.strip() for url in os.getenv('OPENAI_EMBEDDING_FALLBACK_URLS', '').split(',') if url.strip()]
+    
     # RAG Settings
     CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '1000'))
     CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '200'))
     TOP_K_RESULTS = int(os.getenv('TOP_K_RESULTS', '5'))
     SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', '0.7'))
+    SEARCH_BATCH_MAX_QUERIES = int(os.getenv('SEARCH_BATCH_MAX_QUERIES', '256'))
+    CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', '3000'))  # retrieved context budget per prompt
+    
+    # Retrieval mode (hybrid = vector + BM25 fused with reciprocal rank fusion, vector, or lexical)
+    RAG_RETRIEVAL_MODE = os.getenv('RAG_RETRIEVAL_MODE', 'hybrid')
+    RAG_RRF_K = int(os.getenv('RAG_RRF_K', '60'))
+    RAG_FUSION_DEPTH = int(os.getenv('RAG_FUSION_DEPTH', '20'))  # candidates taken from each retriever
+    RAG_BM25_K1 = float(os.getenv('RAG_BM25_K1', '1.5'))
+    RAG_BM25_B = float(os.getenv('RAG_BM25_B', '0.75'))
+    # Answer from the lexical index alone if the query embedding takes longer than this (0 = always wait)
+    RAG_EMBEDDING_DEADLINE_MS = int(os.getenv('RAG_EMBEDDING_DEADLINE_MS', '1500'))
+    
+    # Vector Index (flat, ivf, hnsw, or auto to pick by chunk count)
+    RAG_INDEX_TYPE = os.getenv('RAG_INDEX_TYPE', 'auto')
+    RAG_AUTO_FLAT_MAX = int(os.getenv('RAG_AUTO_FLAT_MAX', '20000'))
+    RAG_AUTO_HNSW_MAX = int(os.getenv('RAG_AUTO_HNSW_MAX', '1000000'))
+    RAG_IVF_NLIST = int(os.getenv('RAG_IVF_NLIST', '0'))  # 0 = 4 * sqrt(chunk count)
+    RAG_IVF_NPROBE = int(os.getenv('RAG_IVF_NPROBE', '16'))
+    RAG_HNSW_M = int(os.getenv('RAG_HNSW_M', '32'))
+    RAG_HNSW_EF_CONSTRUCTION = int(os.getenv('RAG_HNSW_EF_CONSTRUCTION', '80'))
+    RAG_HNSW_EF_SEARCH = int(os.getenv('RAG_HNSW_EF_SEARCH', '64'))
+    # Vector compression (none, sq8, fp16, pq) with exact re-ranking of top candidates
+    RAG_INDEX_COMPRESSION = os.getenv('RAG_INDEX_COMPRESSION', 'none')
+    RAG_PQ_M = int(os.getenv('RAG_PQ_M', '0'))  # 0 = dim / 4 sub-quantizers (16x smaller)
+    RAG_RERANK_FACTOR = int(os.getenv('RAG_RERANK_FACTOR', '4'))  # candidates fetched per result; 0 = off
+    RAG_RAW_VECTORS_DIR = os.getenv('RAG_RAW_VECTORS_DIR', '')  # where compressed indexes spill raw vectors (default: temp dir)
+    # Vector retrieval: 'topk' (fixed k, then SIMILARITY_THRESHOLD) or 'range' (every chunk above a
+    # cosine threshold, up to RAG_RANGE_MAX_RESULTS)
+    RAG_VECTOR_SEARCH = os.getenv('RAG_VECTOR_SEARCH', 'topk')
+    RAG_RANGE_MIN_SIMILARITY = float(os.getenv('RAG_RANGE_MIN_SIMILARITY', '0'))  # 0 = calibrate on the corpus
+    RAG_RANGE_CALIBRATION_PERCENTILE = float(os.getenv('RAG_RANGE_CALIBRATION_PERCENTILE', '95'))
+    RAG_RANGE_MAX_RESULTS = int(os.getenv('RAG_RANGE_MAX_RESULTS', '20'))
+    # Filtered searches over at most this many vectors are scanned exactly instead of via the index
+    RAG_FILTER_EXACT_MAX = int(os.getenv('RAG_FILTER_EXACT_MAX', '50000'))
+    
+    # Copy-on-write updates share each structure's read-only base between generations and copy only the
+    # delta written on top of it, which is folded into a new base once it outgrows this share of the base
+    RAG_DELTA_MAX_FRACTION = float(os.getenv('RAG_DELTA_MAX_FRACTION', '0.1'))
+    RAG_DELTA_MIN_ROWS = int(os.getenv('RAG_DELTA_MIN_ROWS', '2048'))  # deltas up to this size are never folded
+    
+    # Index Snapshots (memory-mapped on-disk copies of the RAG index)
+    RAG_SNAPSHOT_DIR = os.getenv('RAG_SNAPSHOT_DIR', 'backend/data/rag_snapshots')
+    RAG_SNAPSHOT_KEEP = int(os.getenv('RAG_SNAPSHOT_KEEP', '3'))
+    RAG_SNAPSHOT_VERIFY_CHECKSUMS = os.getenv('RAG_SNAPSHOT_VERIFY_CHECKSUMS', 'False').lower() == 'true'
+    # How often worker processes check for a new snapshot (and the writer for reindex requests)
+    RAG_SNAPSHOT_POLL_SECONDS = float(os.getenv('RAG_SNAPSHOT_POLL_SECONDS', '5'))
+    
+    # Ingest-time deduplication (exact hash + MinHash near duplicates)
+    DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'True').lower() == 'true'
+    DEDUP_SIMILARITY = float(os.getenv('DEDUP_SIMILARITY', '0.8'))  # shingle Jaccard similarity for near duplicates
+    DEDUP_MIN_TOKENS = int(os.getenv('DEDUP_MIN_TOKENS', '8'))  # shorter chunks are only deduplicated exactly
+    
+    # Ingestion (sources are downloaded by a thread pool and PDFs parsed by a process pool)
+    INGEST_FETCH_WORKERS = int(os.getenv('INGEST_FETCH_WORKERS', '8'))
+    INGEST_PARSE_WORKERS = int(os.getenv('INGEST_PARSE_WORKERS', '2'))  # 0 = parse in the fetch threads
+    INGEST_SOURCE_TIMEOUT = float(os.getenv('INGEST_SOURCE_TIMEOUT', '300'))  # seconds per source; 0 = no limit
+    
+    # Embedding Provider (openai, or local for an offline hashing + TF-IDF + SVD model fit on the corpus)
+    EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+    EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '0'))  # 0 = provider default (model size for OpenAI, 256 local)
+    LOCAL_EMBEDDING_FEATURES = int(os.getenv('LOCAL_EMBEDDING_FEATURES', '32768'))
+    LOCAL_EMBEDDING_FIT_SAMPLE = int(os.getenv('LOCAL_EMBEDDING_FIT_SAMPLE', '50000'))
+    
+    # Embedding Cache (persistent, keyed by embedding model + text hash)
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'True').lower() == 'true'
+    EMBEDDING_CACHE_DIR = os.getenv('EMBEDDING_CACHE_DIR', 'backend/data/embedding_cache')
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '1024'))
+    
+    # Query Embedding Cache (in-memory LRU/TTL, optionally shared on disk across workers)
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '1024'))
+    QUERY_CACHE_TTL = int(os.getenv('QUERY_CACHE_TTL', '3600'))
+    QUERY_CACHE_SHARED = os.getenv('QUERY_CACHE_SHARED', 'True').lower() == 'true'
+    
+    # LLM Response Cache (exact match on provider, model, temperature, max_tokens and full prompt)
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1024'))  # in-memory entries
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '86400'))  # seconds; 0 = never expire
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'backend/data/response_cache.sqlite')  # empty = memory only
+    RESPONSE_CACHE_MAX_MB = int(os.getenv('RESPONSE_CACHE_MAX_MB', '256'))
+    
+    # Semantic Answer Cache (reuse a past chat answer for a near-identical question over the same content)
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', '0.95'))  # query embedding cosine similarity
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '5000'))
+    ANSWER_CACHE_SYNC_SECONDS = int(os.getenv('ANSWER_CACHE_SYNC_SECONDS', '30'))  # how often to pick up other workers' entries
+    
+    # Embedding Batching (per-request limits, concurrency and retries)
+    EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv('EMBEDDING_BATCH_MAX_ITEMS', '2048'))
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', '250000'))
+    EMBEDDING_MAX_WORKERS = int(os.getenv('EMBEDDING_MAX_WORKERS', '4'))  # concurrent batches per call
+    EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', '5'))
+    EMBEDDING_RETRY_BASE_DELAY = float(os.getenv('EMBEDDING_RETRY_BASE_DELAY', '1.0'))
     
     # Audio Settings
     TTS_PROVIDER = os.getenv('TTS_PROVIDER', 'openai')
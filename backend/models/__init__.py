@@ -6,7 +6,7 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 # Import models after db is created
-from .chat import ChatSession, ChatMessage
+from .chat import ChatSession, ChatMessage, AnswerCacheEntry
 from .content import ContentSource
 
-__all__ = ['db', 'ChatSession', 'ChatMessage', 'ContentSource']
+__all__ = ['db', 'ChatSession', 'ChatMessage', 'AnswerCacheEntry', 'ContentSource']
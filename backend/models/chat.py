@@ -1,6 +1,7 @@
 """
 Chat-related database models.
 """
+import json
 import uuid
 from datetime import datetime
 from backend.models import db
@@ -31,18 +32,47 @@ class ChatMessage(db.Model):
     session_id = db.Column(db.String(36), db.ForeignKey('chat_sessions.id'), nullable=False)
     user_message = db.Column(db.Text, nullable=False)
     ai_response = db.Column(db.Text, nullable=False)
-    sources = db.Column(db.Text)  # Comma-separated list of sources
+    sources = db.Column(db.Text)  # JSON list of source labels (comma-separated in older rows)
     mode = db.Column(db.String(20), default='normal')  # normal, exam, simple
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @staticmethod
+    def encode_sources(sources):
+        """Stored form of a list of source labels"""
+        return json.dumps(list(sources))
+    
+    @staticmethod
+    def decode_sources(value):
+        """Source labels from a stored value: JSON, or comma-separated in rows saved before JSON"""
+        if not value:
+            return []
+        if value.startswith('['):
+            try:
+                return json.loads(value)
+            except ValueError:
+                pass
+        return value.split(',')
+    
     def to_dict(self):
         return {
             'id': self.id,
             'session_id': self.session_id,
             'user_message': self.user_message,
             'ai_response': self.ai_response,
-            'sources': self.sources.split(',') if self.sources else [],
+            'sources': self.decode_sources(self.sources),
             'mode': self.mode,
             'created_at': self.created_at.isoformat()
         }
 
+class AnswerCacheEntry(db.Model):
+    """Query embedding of a past answer, for the semantic answer cache"""
+    __tablename__ = 'answer_cache_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('chat_messages.id', ondelete='CASCADE'), nullable=False)
+    corpus_version = db.Column(db.String(32), nullable=False, index=True)  # RAG content the answer was based on
+    scope = db.Column(db.String(64), nullable=False)  # answer mode + hash of the search filters
+    embedding = db.Column(db.LargeBinary, nullable=False)  # float32 query embedding
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    message = db.relationship('ChatMessage', backref=db.backref('answer_cache_entries', cascade='all, delete-orphan'))
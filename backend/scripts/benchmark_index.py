@@ -0,0 +1,135 @@
+"""
+Vector index benchmark script.
+Compares Flat, IVF and HNSW indexes (optionally compressed with SQ8, float16
+or PQ) on synthetic embeddings, reporting build time, bytes per vector (the
+FAISS index alone, and the RAM held including the raw vectors kept for
+re-ranking, which compressed indexes keep on disk), recall@k against exact
+(Flat) search and p50/p99 query latency.
+
+Run from the project root:
+    python backend/scripts/benchmark_index.py --sizes 10000,100000,1000000
+    python backend/scripts/benchmark_index.py --compressions none,sq8,fp16,pq
+"""
+import sys
+import os
+import argparse
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+from backend.services.vector_index import VectorIndex
+
+def make_dataset(count, dim, num_queries, seed=0):
+    """
+    Generate clustered unit-norm vectors that roughly resemble text embeddings,
+    plus queries drawn near the same clusters.
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = max(8, int(np.sqrt(count)))
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    
+    def sample(n):
+        vectors = np.empty((n, dim), dtype=np.float32)
+        # Generate in blocks to keep peak memory bounded at large sizes
+        for start in range(0, n, 100000):
+            end = min(start + 100000, n)
+            assignment = rng.integers(0, num_clusters, size=end - start)
+            block = centers[assignment] + 0.5 * rng.standard_normal((end - start, dim)).astype(np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+            vectors[start:end] = block
+        return vectors
+    
+    return sample(count), sample(num_queries)
+
+def recall_at_k(found_ids, true_ids, k):
+    """Fraction of the exact top-k neighbours that were retrieved"""
+    hits = 0
+    for found, truth in zip(found_ids, true_ids):
+        hits += len(set(found[:k]) & set(truth[:k]))
+    return hits / (len(true_ids) * k)
+
+def measure_latency(index, queries, k):
+    """Per-query (single-row) search latencies in milliseconds"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def run_benchmark(sizes, dim, k, num_queries, index_types, compressions, rerank_factor, params):
+    """Benchmark each index type/compression at each corpus size and print a report"""
+    header = (f"{'vectors':>9} {'index':>6} {'compress':>8} {'rerank':>6} {'build s':>9} "
+              f"{'index B/v':>10} {'RAM B/v':>10} {'recall@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    print(header)
+    print('-' * len(header))
+    
+    configs = [('flat', 'none')] + [
+        (index_type, compression)
+        for index_type in index_types
+        for compression in compressions
+        if (index_type, compression) != ('flat', 'none')
+    ]
+    
+    for count in sizes:
+        vectors, queries = make_dataset(count, dim, num_queries)
+        ids = np.arange(count, dtype=np.int64)
+        true_ids = None
+        
+        for index_type, compression in configs:
+            index = VectorIndex(dim, index_type=index_type, compression=compression, **params)
+            start = time.perf_counter()
+            index.add(ids, vectors)
+            build_seconds = time.perf_counter() - start
+            index_bytes_per_vector = index.index_bytes() / count
+            ram_bytes_per_vector = index.memory_bytes() / count
+            
+            # Compressed indexes are measured both raw and with exact re-ranking
+            rerank_settings = [0, rerank_factor] if index.active_compression != 'none' and rerank_factor > 1 else [0]
+            for rerank in rerank_settings:
+                index.params['rerank_factor'] = rerank
+                _, found_ids = index.search(queries, k)
+                if true_ids is None:
+                    true_ids = found_ids
+                recall = recall_at_k(found_ids, true_ids, k)
+                
+                latencies = measure_latency(index, queries, k)
+                print(f"{count:>9} {index_type:>6} {index.active_compression:>8} {'x' + str(rerank) if rerank else '-':>6} "
+                      f"{build_seconds:>9.2f} {index_bytes_per_vector:>10.0f} {ram_bytes_per_vector:>10.0f} {recall:>10.3f} "
+                      f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+            del index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark RAG vector index types')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated corpus sizes')
+    parser.add_argument('--dim', type=int, default=1536, help='Vector dimension')
+    parser.add_argument('--k', type=int, default=5, help='Neighbours per query')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries')
+    parser.add_argument('--types', default='flat,ivf,hnsw', help='Comma-separated index types')
+    parser.add_argument('--compressions', default='none', help='Comma-separated compressions (none,sq8,fp16,pq)')
+    parser.add_argument('--rerank-factor', type=int, default=4, help='Candidates re-ranked per result for compressed indexes')
+    parser.add_argument('--pq-m', type=int, default=None, help='PQ sub-quantizers')
+    parser.add_argument('--nprobe', type=int, default=None, help='IVF lists probed per query')
+    parser.add_argument('--ef-search', type=int, default=None, help='HNSW efSearch')
+    args = parser.parse_args()
+    
+    params = {}
+    if args.nprobe is not None:
+        params['nprobe'] = args.nprobe
+    if args.ef_search is not None:
+        params['ef_search'] = args.ef_search
+    if args.pq_m is not None:
+        params['pq_m'] = args.pq_m
+    
+    run_benchmark(
+        sizes=[int(s) for s in args.sizes.split(',') if s.strip()],
+        dim=args.dim,
+        k=args.k,
+        num_queries=args.queries,
+        index_types=[t.strip() for t in args.types.split(',') if t.strip()],
+        compressions=[c.strip() for c in args.compressions.split(',') if c.strip()],
+        rerank_factor=args.rerank_factor,
+        params=params
+    )
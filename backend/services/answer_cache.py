@@ -0,0 +1,180 @@
+"""
+Answer Cache - Semantic cache of chat answers keyed by query-embedding similarity.
+A question whose embedding is close enough to one already answered (in the
+same answer mode, with the same search filters and over the same indexed
+content) gets the stored answer and sources back without retrieval or an LLM
+call. Entries are persisted next to the ChatMessage they point at, so worker
+processes and restarts share them; when the corpus version changes, the
+cache starts over from the entries recorded for the new version.
+"""
+import logging
+import hashlib
+import json
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 64
+
+def answer_scope(mode, filters):
+    """Cache scope of a chat request: its answer mode plus a hash of its search filters"""
+    filters_json = json.dumps(filters or {}, sort_keys=True, default=str)
+    return f"{mode}:{hashlib.blake2b(filters_json.encode('utf-8'), digest_size=8).hexdigest()}"
+
+class SemanticAnswerCache:
+    """Brute-force cosine index over the query embeddings of past answers for one corpus version"""
+    
+    def __init__(self, threshold=0.95, max_entries=5000, sync_seconds=30):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.sync_seconds = sync_seconds
+        self.corpus_version = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._reset(None)
+    
+    def _reset(self, corpus_version):
+        """Drop every entry and switch to a corpus version (caller holds the lock or is __init__)"""
+        self.corpus_version = corpus_version
+        self._vectors = None  # float32 (capacity, dim), unit rows
+        self._scopes = []
+        self._answers = []  # (response, sources, message_id) per row
+        self._count = 0
+        self._last_row_id = 0  # newest AnswerCacheEntry loaded
+        self._synced_at = 0.0
+    
+    def lookup(self, query_vector, scope, corpus_version):
+        """
+        Find a past answer to a question similar enough to this one.
+        Requires a Flask app context (entries are loaded from the database).
+        
+        Args:
+            query_vector: Embedding of the question
+            scope: answer_scope() of the request
+            corpus_version: RAGEngine.corpus_version at the time of the request
+        
+        Returns:
+            Dict with response, sources, message_id and similarity, or None
+        """
+        query = self._unit(query_vector)
+        with self._lock:
+            self._sync(corpus_version)
+            best_row, best_similarity = None, -1.0
+            if self._count:
+                similarities = self._vectors[:self._count] @ query
+                for row in np.argsort(-similarities):
+                    if similarities[row] < self.threshold:
+                        break
+                    if self._scopes[row] == scope:
+                        best_row, best_similarity = int(row), float(similarities[row])
+                        break
+            if best_row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            response, sources, message_id = self._answers[best_row]
+        return {'response': response, 'sources': sources, 'message_id': message_id, 'similarity': best_similarity}
+    
+    def add(self, query_vector, scope, corpus_version, chat_message, sources):
+        """
+        Record a freshly generated answer (its ChatMessage must already be saved).
+        Answers produced against an older corpus version are not recorded.
+        """
+        from backend.models import db
+        from backend.models.chat import AnswerCacheEntry
+        
+        query = self._unit(query_vector)
+        try:
+            entry = AnswerCacheEntry(
+                message_id=chat_message.id,
+                corpus_version=corpus_version,
+                scope=scope,
+                embedding=query.tobytes()
+            )
+            db.session.add(entry)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to save answer cache entry: {e}")
+            return
+        with self._lock:
+            if corpus_version == self.corpus_version:
+                self._append(query, scope, (chat_message.ai_response, sources, chat_message.id))
+                self._last_row_id = max(self._last_row_id, entry.id)
+    
+    def _sync(self, corpus_version):
+        """
+        Start over when the corpus version changed, and pick up entries other
+        workers recorded since the last sync (caller holds the lock).
+        """
+        from backend.models.chat import AnswerCacheEntry, ChatMessage
+        
+        now = time.monotonic()
+        if corpus_version != self.corpus_version:
+            if self.corpus_version is not None:
+                logger.info(f"Corpus changed ({self.corpus_version} -> {corpus_version}), resetting answer cache")
+            self._reset(corpus_version)
+        elif now - self._synced_at < self.sync_seconds:
+            return
+        self._synced_at = now
+        try:
+            rows = (AnswerCacheEntry.query
+                    .join(ChatMessage, AnswerCacheEntry.message_id == ChatMessage.id)
+                    .add_columns(ChatMessage.ai_response, ChatMessage.sources)
+                    .filter(AnswerCacheEntry.corpus_version == corpus_version,
+                            AnswerCacheEntry.id > self._last_row_id)
+                    .order_by(AnswerCacheEntry.id.desc())
+                    .limit(self.max_entries)
+                    .all())
+        except Exception as e:
+            logger.warning(f"Could not load answer cache entries: {e}")
+            return
+        for entry, response, sources in reversed(rows):
+            vector = np.frombuffer(entry.embedding, dtype=np.float32)
+            if self._vectors is not None and len(vector) != self._vectors.shape[1]:
+                continue
+            self._append(vector, entry.scope, (response, ChatMessage.decode_sources(sources), entry.message_id))
+            self._last_row_id = max(self._last_row_id, entry.id)
+        if rows:
+            logger.info(f"Loaded {len(rows)} answer cache entries for corpus {corpus_version}")
+    
+    def _append(self, vector, scope, answer):
+        """Add a row, growing the matrix and evicting the oldest entries past max_entries (caller holds the lock)"""
+        if self._vectors is None:
+            self._vectors = np.zeros((INITIAL_CAPACITY, len(vector)), dtype=np.float32)
+        elif len(vector) != self._vectors.shape[1]:
+            return
+        if self._count >= self.max_entries:
+            # Drop the oldest tenth in one go rather than shifting on every add
+            drop = max(1, self.max_entries // 10)
+            self._vectors[:self._count - drop] = self._vectors[drop:self._count]
+            del self._scopes[:drop]
+            del self._answers[:drop]
+            self._count -= drop
+        if self._count == len(self._vectors):
+            grown = np.zeros((min(len(self._vectors) * 2, max(self.max_entries, 1)), self._vectors.shape[1]), dtype=np.float32)
+            grown[:self._count] = self._vectors[:self._count]
+            self._vectors = grown
+        self._vectors[self._count] = vector
+        self._scopes.append(scope)
+        self._answers.append(answer)
+        self._count += 1
+    
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': self._count,
+            'corpus_version': self.corpus_version,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
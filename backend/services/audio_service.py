@@ -5,19 +5,29 @@ Manages turn-based conversation flow and audio file generation.
 import logging
 import os
 import uuid
-from openai import OpenAI
 from backend.config import Config
 from backend.services.llm_service import LLMService
+from backend.services.provider_clients import get_provider_registry
+from backend.services.single_flight import SingleFlight, request_fingerprint
 
 logger = logging.getLogger(__name__)
 
+TTS_MODEL = 'tts-1'
+
 class AudioService:
     """Service for generating audio dialogues"""
     
-    def __init__(self):
-        self.llm_service = LLMService()
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY) if Config.OPENAI_API_KEY else None
+    def __init__(self, llm_service=None, providers=None):
+        """
+        Args:
+            llm_service: Shared LLMService (a new one is created if omitted)
+            providers: ProviderRegistry supplying the TTS client (defaults to the process-wide one)
+        """
+        providers = providers or get_provider_registry()
+        self.llm_service = llm_service or LLMService(providers)
+        self.client = providers.openai_client() if Config.OPENAI_API_KEY else None
         self.dialogues = {}  # In-memory storage for dialogues
+        self.tts_flights = SingleFlight('tts')  # identical concurrent TTS requests share one call
         self.audio_dir = Config.AUDIO_OUTPUT_DIR
         os.makedirs(self.audio_dir, exist_ok=True)
     
@@ -128,17 +138,17 @@ class AudioService:
         
         try:
             # Generate speech
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
+            audio = self.tts_flights.do(
+                request_fingerprint(TTS_MODEL, voice, text),
+                lambda: self._synthesize(voice, text)
             )
             
             # Save audio file
             audio_filename = f"{dialogue_id}_{speaker}_{len(self.dialogues.get(dialogue_id, {}).get('turns', []))}.mp3"
             audio_path = os.path.join(self.audio_dir, audio_filename)
             
-            response.stream_to_file(audio_path)
+            with open(audio_path, 'wb') as f:
+                f.write(audio)
             
             audio_url = f"/api/audio/{audio_filename}"
             logger.info(f"Generated audio: {audio_url}")
@@ -149,6 +159,15 @@ class AudioService:
             logger.error(f"Failed to generate audio: {e}")
             return None
     
+    def _synthesize(self, voice, text):
+        """Call the TTS provider and return the MP3 bytes"""
+        response = self.client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=text
+        )
+        return response.content
+    
     def _build_context(self, dialogue):
         """Build context string from dialogue history"""
         # Get last few turns for context
@@ -0,0 +1,306 @@
+"""
+Chunk Dedup - Exact and near-duplicate detection for ingested chunks.
+Exact duplicates are found by a hash of the normalized text; near duplicates
+by MinHash signatures over word shingles, with LSH band tables so a new chunk
+is only compared against candidates sharing a band. Duplicates are not
+embedded or indexed; their citations are merged into the chunk kept.
+"""
+import logging
+import hashlib
+import os
+import re
+import numpy as np
+from backend.config import Config
+from backend.services.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+MINHASH_PERMUTATIONS = 32
+MINHASH_BAND_ROWS = 4  # 8 bands of 4 rows: Jaccard 0.8 pairs collide in a band ~98% of the time
+SHINGLE_SIZE = 3
+# Chunk fields that describe where a chunk came from, copied into its citations
+CITATION_EXCLUDED_FIELDS = ('text', 'chunk_id', 'chunk_index', 'total_chunks', 'token_count', 'citations')
+
+# Multiply-shift hash functions, one per permutation (fixed seed so signatures are stable)
+_rng = np.random.default_rng(0x5EED)
+_HASH_MULTIPLIERS = _rng.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_HASH_OFFSETS = _rng.integers(0, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def content_hash(text):
+    """64-bit hash of whitespace- and case-normalized text"""
+    normalized = re.sub(r'\s+', ' ', text.strip()).casefold()
+    return int.from_bytes(hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def minhash(tokens):
+    """MinHash signature (uint32 array) of a token list's word shingles"""
+    count = max(1, len(tokens) - SHINGLE_SIZE + 1)
+    shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(count)}
+    digests = b''.join(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest() for s in shingles)
+    values = np.frombuffer(digests, dtype=np.uint64)
+    hashed = (values[:, None] * _HASH_MULTIPLIERS + _HASH_OFFSETS) >> np.uint64(32)
+    return hashed.min(axis=0).astype(np.uint32)
+
+def citation_of(chunk):
+    """Where a chunk came from: its source key plus source/page/video fields"""
+    return {key: value for key, value in chunk.items() if key not in CITATION_EXCLUDED_FIELDS}
+
+def merge_citation(canonical, duplicate):
+    """Record a duplicate's origin on the chunk kept in its place (mutates canonical)"""
+    citations = canonical.get('citations') or [citation_of(canonical)]
+    citation = citation_of(duplicate)
+    if citation not in citations:
+        citations.append(citation)
+    canonical['citations'] = citations
+
+def drop_citations(chunk, source_key):
+    """
+    Remove a source's citations from a merged chunk (mutates chunk).
+    If the chunk's own origin was that source, the next citation takes its place.
+    
+    Returns:
+        True if the chunk is still cited by another source
+    """
+    citations = [c for c in chunk.get('citations') or [] if c.get('source_key') != source_key]
+    if not citations:
+        return False
+    if chunk.get('source_key') == source_key:
+        for key in [key for key in chunk if key not in CITATION_EXCLUDED_FIELDS]:
+            del chunk[key]
+        chunk.update(citations[0])
+    if len(citations) > 1:
+        chunk['citations'] = citations
+    else:
+        chunk.pop('citations', None)
+    return True
+
+class ChunkDeduplicator:
+    """
+    Content hash table + MinHash LSH tables over indexed chunks.
+    Tables are split into a read-only base, shared between copies, and a
+    delta of the chunks added since (plus the base chunks removed since).
+    """
+    
+    def __init__(self, threshold=0.8, min_tokens=8):
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        # Read-only base tables, shared with copies
+        self._base_exact = {}
+        self._base_hashes = {}
+        self._base_tables = [{} for _ in range(MINHASH_PERMUTATIONS // MINHASH_BAND_ROWS)]
+        self._removed = set()  # base chunk IDs removed since
+        # Delta tables
+        self._exact = {}  # content hash -> chunk_id
+        self._hashes = {}  # chunk_id -> (content hash, MinHash signature or None)
+        self._tables = [{} for _ in range(MINHASH_PERMUTATIONS // MINHASH_BAND_ROWS)]  # band bytes -> chunk_ids
+    
+    def __len__(self):
+        return len(self._base_hashes) - len(self._removed) + len(self._hashes)
+    
+    def copy(self):
+        """
+        Independent copy, for copy-on-write updates. The base tables are shared
+        and only the delta is copied; a delta that has outgrown its share of
+        the base (RAG_DELTA_MAX_FRACTION) is folded into new base tables in the
+        copy, so later copies stay cheap.
+        """
+        clone = ChunkDeduplicator(self.threshold, self.min_tokens)
+        clone._base_exact = self._base_exact
+        clone._base_hashes = self._base_hashes
+        clone._base_tables = self._base_tables
+        clone._removed = set(self._removed)
+        clone._exact = dict(self._exact)
+        clone._hashes = dict(self._hashes)
+        clone._tables = [{key: list(bucket) for key, bucket in table.items()} for table in self._tables]
+        delta = len(self._hashes) + len(self._removed)
+        if delta > max(Config.RAG_DELTA_MIN_ROWS, Config.RAG_DELTA_MAX_FRACTION * len(self._base_hashes)):
+            clone.compact()
+        return clone
+    
+    def compact(self):
+        """
+        Fold the delta into new base tables. Only for a deduplicator no reader
+        shares, e.g. one in an unpublished generation.
+        """
+        if self._base_hashes:
+            merged = ChunkDeduplicator(self.threshold, self.min_tokens)
+            for chunk_id, hashes in self._live_hashes():
+                merged.add(chunk_id, hashes)
+            exact, hashes, tables = merged._exact, merged._hashes, merged._tables
+        else:
+            exact, hashes, tables = self._exact, self._hashes, self._tables
+        self._base_exact, self._base_hashes, self._base_tables = exact, hashes, tables
+        self._removed = set()
+        self._exact = {}
+        self._hashes = {}
+        self._tables = [{} for _ in range(MINHASH_PERMUTATIONS // MINHASH_BAND_ROWS)]
+    
+    def _live_hashes(self):
+        """(chunk_id, hashes) of every indexed chunk, base first"""
+        for chunk_id, hashes in self._base_hashes.items():
+            if chunk_id not in self._removed:
+                yield chunk_id, hashes
+        yield from self._hashes.items()
+    
+    def _chunk_hashes(self, chunk_id):
+        """Fingerprint of an indexed chunk, or None"""
+        hashes = self._hashes.get(chunk_id)
+        if hashes is None and chunk_id not in self._removed:
+            hashes = self._base_hashes.get(chunk_id)
+        return hashes
+    
+    def _band_keys(self, signature):
+        return [signature[band * MINHASH_BAND_ROWS:(band + 1) * MINHASH_BAND_ROWS].tobytes()
+                for band in range(len(self._tables))]
+    
+    def fingerprint(self, text):
+        """(content hash, MinHash signature) of a text; the signature is None for texts too short to compare"""
+        tokens = tokenize(text)
+        return content_hash(text), minhash(tokens) if len(tokens) >= self.min_tokens else None
+    
+    def match(self, hashes, exclude=()):
+        """
+        Find an indexed chunk duplicating a fingerprint.
+        
+        Args:
+            hashes: (content hash, signature) from fingerprint()
+            exclude: Chunk IDs to ignore (e.g. ones about to be replaced)
+        
+        Returns:
+            (chunk_id, 'exact' | 'near'), or (None, None)
+        """
+        exact_hash, signature = hashes
+        for chunk_id in (self._exact.get(exact_hash), self._base_exact.get(exact_hash)):
+            if chunk_id is not None and chunk_id not in exclude and self._chunk_hashes(chunk_id) is not None:
+                return chunk_id, 'exact'
+        if signature is None:
+            return None, None
+        checked = set()
+        keys = self._band_keys(signature)
+        for tables in (self._tables, self._base_tables):
+            for table, key in zip(tables, keys):
+                for candidate in table.get(key, ()):
+                    if candidate in exclude or candidate in checked:
+                        continue
+                    checked.add(candidate)
+                    candidate_hashes = self._chunk_hashes(candidate)
+                    # Fraction of agreeing MinHash rows estimates the shingle Jaccard similarity
+                    if candidate_hashes is not None and np.mean(candidate_hashes[1] == signature) >= self.threshold:
+                        return candidate, 'near'
+        return None, None
+    
+    def add(self, chunk_id, hashes):
+        """Index a kept chunk's fingerprint"""
+        chunk_id = int(chunk_id)
+        self.remove([chunk_id])
+        exact_hash, signature = hashes
+        self._hashes[chunk_id] = (exact_hash, signature)
+        self._exact.setdefault(exact_hash, chunk_id)
+        if signature is not None:
+            for table, key in zip(self._tables, self._band_keys(signature)):
+                table.setdefault(key, []).append(chunk_id)
+    
+    def remove(self, chunk_ids):
+        """Forget chunks (unknown IDs are ignored)"""
+        for chunk_id in chunk_ids:
+            chunk_id = int(chunk_id)
+            hashes = self._hashes.pop(chunk_id, None)
+            if hashes is None:
+                if chunk_id in self._base_hashes:
+                    self._removed.add(chunk_id)
+                continue
+            exact_hash, signature = hashes
+            if self._exact.get(exact_hash) == chunk_id:
+                del self._exact[exact_hash]
+            if signature is not None:
+                for table, key in zip(self._tables, self._band_keys(signature)):
+                    bucket = table[key]
+                    bucket.remove(chunk_id)
+                    if not bucket:
+                        del table[key]
+    
+    def deduplicate(self, chunks, exclude=()):
+        """
+        Split a batch of chunks (with chunk_id set) into unique chunks and
+        duplicates, checking both the indexed chunks and earlier chunks of
+        the batch. Nothing is added to the tables; call add() for the chunks
+        that get indexed.
+        
+        Returns:
+            (unique, duplicates): unique is a list of (chunk, hashes) and
+            duplicates a list of (chunk, canonical chunk_id, 'exact' | 'near')
+        """
+        batch = ChunkDeduplicator(self.threshold, self.min_tokens)
+        unique = []
+        duplicates = []
+        for chunk in chunks:
+            hashes = self.fingerprint(chunk['text'])
+            canonical_id, kind = self.match(hashes, exclude)
+            if canonical_id is None:
+                canonical_id, kind = batch.match(hashes)
+            if canonical_id is None:
+                batch.add(chunk['chunk_id'], hashes)
+                unique.append((chunk, hashes))
+            else:
+                duplicates.append((chunk, canonical_id, kind))
+        return unique, duplicates
+    
+    def save(self, directory):
+        """
+        Write the chunk fingerprints as .npy arrays.
+        
+        Returns:
+            Dict of dedup state to store in the snapshot manifest
+        """
+        live = list(self._live_hashes())
+        chunk_ids = np.array([chunk_id for chunk_id, _ in live], dtype=np.int64)
+        exact_hashes = np.array([exact_hash for _, (exact_hash, _) in live], dtype=np.uint64)
+        signatures = np.zeros((len(chunk_ids), MINHASH_PERMUTATIONS), dtype=np.uint32)
+        has_signature = np.zeros(len(chunk_ids), dtype=bool)
+        for row, (_, (_, signature)) in enumerate(live):
+            if signature is not None:
+                signatures[row] = signature
+                has_signature[row] = True
+        np.save(os.path.join(directory, 'dedup_chunk_ids.npy'), chunk_ids)
+        np.save(os.path.join(directory, 'dedup_exact_hashes.npy'), exact_hashes)
+        np.save(os.path.join(directory, 'dedup_signatures.npy'), signatures)
+        np.save(os.path.join(directory, 'dedup_has_signature.npy'), has_signature)
+        return {'threshold': self.threshold, 'min_tokens': self.min_tokens, 'chunks': len(chunk_ids)}
+    
+    @classmethod
+    def load(cls, directory, state):
+        """Load fingerprints written by save() and rebuild the lookup tables"""
+        dedup = cls(threshold=state['threshold'], min_tokens=state['min_tokens'])
+        chunk_ids = np.load(os.path.join(directory, 'dedup_chunk_ids.npy'))
+        exact_hashes = np.load(os.path.join(directory, 'dedup_exact_hashes.npy'))
+        signatures = np.load(os.path.join(directory, 'dedup_signatures.npy'))
+        has_signature = np.load(os.path.join(directory, 'dedup_has_signature.npy'))
+        for row, chunk_id in enumerate(chunk_ids.tolist()):
+            dedup.add(chunk_id, (int(exact_hashes[row]), signatures[row] if has_signature[row] else None))
+        dedup.compact()
+        return dedup
+
+class DedupStats:
+    """Counts of unique and duplicate chunks seen during an ingest"""
+    
+    def __init__(self):
+        self.chunks = 0
+        self.exact = 0
+        self.near = 0
+    
+    def record(self, unique, duplicates):
+        self.chunks += len(unique) + len(duplicates)
+        for _, _, kind in duplicates:
+            if kind == 'exact':
+                self.exact += 1
+            else:
+                self.near += 1
+    
+    def to_dict(self):
+        removed = self.exact + self.near
+        return {
+            'chunks': self.chunks,
+            'indexed': self.chunks - removed,
+            'exact_duplicates': self.exact,
+            'near_duplicates': self.near,
+            'dedup_ratio': round(removed / self.chunks, 4) if self.chunks else 0.0
+        }
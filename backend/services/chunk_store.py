@@ -0,0 +1,284 @@
+"""
+Chunk Store - Compact columnar storage for RAG chunk metadata.
+Chunk texts live in one UTF-8 blob addressed by an offsets array, repeated
+strings (source labels and per-source metadata) are interned once, and the
+numeric fields are integer columns. Chunk dicts are only built for the rows a
+caller actually reads, e.g. the top-k hits of a search.
+"""
+import logging
+import json
+import mmap
+import os
+from array import array
+from collections.abc import MutableMapping
+import numpy as np
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Integer fields stored as columns; -1 means the field is absent
+INT_FIELDS = ('page', 'chunk_index', 'total_chunks', 'token_count')
+MISSING = -1
+
+class ChunkStore(MutableMapping):
+    """
+    Mapping of chunk_id -> chunk dict backed by columns.
+    A store loaded from disk keeps its rows in read-only (optionally
+    memory-mapped) base arrays sorted by chunk ID; chunks written afterwards
+    are appended to in-memory tail columns until the next save or compact().
+    """
+    
+    def __init__(self):
+        self._strings = []  # interned source labels and metadata JSON
+        self._string_ids = {}
+        # Base rows (from a saved store), sorted by chunk ID
+        self._base_ids = np.zeros(0, dtype=np.int64)
+        self._base_text_offsets = np.zeros(1, dtype=np.int64)
+        self._base_text = b''
+        self._base_columns = {name: np.zeros(0, dtype=np.int32) for name in ('source', 'meta') + INT_FIELDS}
+        self._base_alive = np.zeros(0, dtype=bool)
+        self._base_live = 0
+        # Tail rows appended since the store was created or loaded
+        self._tail_rows = {}  # chunk_id -> tail row
+        self._tail_text = bytearray()
+        self._tail_text_offsets = array('q', [0])
+        self._tail_columns = {name: array('i') for name in ('source', 'meta') + INT_FIELDS}
+    
+    def copy(self):
+        """
+        Independent copy, for copy-on-write updates. The read-only base columns
+        are shared and only the tail is copied; a tail that has outgrown its
+        share of the base (RAG_DELTA_MAX_FRACTION) is folded into new base
+        columns in the copy, so later copies stay cheap.
+        """
+        clone = ChunkStore()
+        clone.__dict__.update(self.__dict__)
+        clone._strings = list(self._strings)
+        clone._string_ids = dict(self._string_ids)
+        clone._base_alive = self._base_alive.copy()
+        clone._tail_rows = dict(self._tail_rows)
+        clone._tail_text = bytearray(self._tail_text)
+        clone._tail_text_offsets = array('q', self._tail_text_offsets)
+        clone._tail_columns = {name: array('i', column) for name, column in self._tail_columns.items()}
+        if len(self._tail_rows) > max(Config.RAG_DELTA_MIN_ROWS, Config.RAG_DELTA_MAX_FRACTION * self._base_live):
+            clone.compact()
+        return clone
+    
+    def compact(self):
+        """
+        Fold the tail rows (and deletes) into new in-memory base columns. Only
+        for a store no reader shares, e.g. one in an unpublished generation.
+        """
+        ids, from_tail, rows = self._live_rows()
+        columns = {name: self._merged_column(name, from_tail, rows) for name in ('source', 'meta') + INT_FIELDS}
+        texts = list(self._row_texts(from_tail, rows))
+        text_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in texts], out=text_offsets[1:])
+        
+        self._base_ids = ids
+        self._base_text_offsets = text_offsets
+        self._base_text = b''.join(texts)
+        self._base_columns = columns
+        self._base_alive = np.ones(len(ids), dtype=bool)
+        self._base_live = len(ids)
+        self._tail_rows = {}
+        self._tail_text = bytearray()
+        self._tail_text_offsets = array('q', [0])
+        self._tail_columns = {name: array('i') for name in ('source', 'meta') + INT_FIELDS}
+    
+    def _intern(self, value):
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+    
+    def _base_row(self, chunk_id):
+        """Row of a live base chunk, or None"""
+        if not len(self._base_ids):
+            return None
+        row = int(np.searchsorted(self._base_ids, chunk_id))
+        if row < len(self._base_ids) and self._base_ids[row] == chunk_id and self._base_alive[row]:
+            return row
+        return None
+    
+    def _build(self, text, source, meta, ints):
+        """Materialize a chunk dict from stored fields"""
+        chunk = json.loads(self._strings[meta]) if meta >= 0 else {}
+        chunk['text'] = text
+        chunk['source'] = self._strings[source] if source >= 0 else None
+        for name, value in zip(INT_FIELDS, ints):
+            if value != MISSING:
+                chunk[name] = int(value)
+        return chunk
+    
+    def __getitem__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        row = self._tail_rows.get(chunk_id)
+        if row is not None:
+            columns = self._tail_columns
+            text = self._tail_text[self._tail_text_offsets[row]:self._tail_text_offsets[row + 1]].decode('utf-8')
+        else:
+            row = self._base_row(chunk_id)
+            if row is None:
+                raise KeyError(chunk_id)
+            columns = self._base_columns
+            text = bytes(self._base_text[self._base_text_offsets[row]:self._base_text_offsets[row + 1]]).decode('utf-8')
+        chunk = self._build(text, int(columns['source'][row]), int(columns['meta'][row]),
+                            [columns[name][row] for name in INT_FIELDS])
+        chunk['chunk_id'] = chunk_id
+        return chunk
+    
+    def text(self, chunk_id):
+        """Text of a chunk, without building the rest of its dict"""
+        chunk_id = int(chunk_id)
+        row = self._tail_rows.get(chunk_id)
+        if row is not None:
+            return self._tail_text[self._tail_text_offsets[row]:self._tail_text_offsets[row + 1]].decode('utf-8')
+        row = self._base_row(chunk_id)
+        if row is None:
+            raise KeyError(chunk_id)
+        return bytes(self._base_text[self._base_text_offsets[row]:self._base_text_offsets[row + 1]]).decode('utf-8')
+    
+    def __contains__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        return chunk_id in self._tail_rows or self._base_row(chunk_id) is not None
+    
+    def __setitem__(self, chunk_id, chunk):
+        chunk_id = int(chunk_id)
+        if chunk_id in self:
+            del self[chunk_id]
+        
+        meta = {}
+        ints = []
+        for name in INT_FIELDS:
+            value = chunk.get(name)
+            if isinstance(value, int) and value >= 0:
+                ints.append(value)
+            else:
+                ints.append(MISSING)
+                if value is not None:
+                    meta[name] = value
+        meta.update((key, value) for key, value in chunk.items()
+                    if key not in ('text', 'source', 'chunk_id') + INT_FIELDS)
+        
+        source = chunk.get('source')
+        self._tail_columns['source'].append(self._intern(source) if source is not None else -1)
+        self._tail_columns['meta'].append(
+            self._intern(json.dumps(meta, sort_keys=True, separators=(',', ':'), default=str)) if meta else -1
+        )
+        for name, value in zip(INT_FIELDS, ints):
+            self._tail_columns[name].append(value)
+        self._tail_text.extend(chunk.get('text', '').encode('utf-8'))
+        self._tail_text_offsets.append(len(self._tail_text))
+        self._tail_rows[chunk_id] = len(self._tail_text_offsets) - 2
+    
+    def __delitem__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        # Tail rows stay in the columns as garbage until the next save
+        if self._tail_rows.pop(chunk_id, None) is not None:
+            return
+        row = self._base_row(chunk_id)
+        if row is None:
+            raise KeyError(chunk_id)
+        self._base_alive[row] = False
+        self._base_live -= 1
+    
+    def __iter__(self):
+        for row in np.flatnonzero(self._base_alive):
+            yield int(self._base_ids[row])
+        yield from list(self._tail_rows)
+    
+    def __len__(self):
+        return self._base_live + len(self._tail_rows)
+    
+    def memory_bytes(self):
+        """Approximate resident size of the store's columns and text"""
+        base = sum(column.nbytes for column in self._base_columns.values())
+        base += self._base_ids.nbytes + self._base_text_offsets.nbytes + len(self._base_text)
+        tail = sum(column.itemsize * len(column) for column in self._tail_columns.values())
+        tail += len(self._tail_text) + self._tail_text_offsets.itemsize * len(self._tail_text_offsets)
+        return int(base + tail + sum(len(s) for s in self._strings))
+    
+    def _live_rows(self):
+        """
+        Every live chunk, sorted by chunk ID.
+        
+        Returns:
+            (chunk IDs, whether each row is in the tail, row in the base or tail columns)
+        """
+        base_rows = np.flatnonzero(self._base_alive)
+        tail_ids = np.fromiter(self._tail_rows.keys(), dtype=np.int64, count=len(self._tail_rows))
+        tail_rows = np.fromiter(self._tail_rows.values(), dtype=np.int64, count=len(self._tail_rows))
+        ids = np.concatenate([self._base_ids[base_rows], tail_ids])
+        from_tail = np.concatenate([np.zeros(len(base_rows), dtype=bool), np.ones(len(tail_rows), dtype=bool)])
+        rows = np.concatenate([base_rows, tail_rows])
+        order = np.argsort(ids, kind='stable')
+        return ids[order], from_tail[order], rows[order]
+    
+    def _merged_column(self, name, from_tail, rows):
+        """One column for the rows from _live_rows(), gathered from the base and tail"""
+        column = np.empty(len(rows), dtype=np.int32)
+        column[~from_tail] = self._base_columns[name][rows[~from_tail]]
+        column[from_tail] = np.frombuffer(self._tail_columns[name], dtype=np.int32)[rows[from_tail]] if len(self._tail_columns[name]) else []
+        return column
+    
+    def _row_texts(self, from_tail, rows):
+        """UTF-8 text of each row from _live_rows(), in order"""
+        tail_offsets = np.frombuffer(self._tail_text_offsets, dtype=np.int64)
+        for is_tail, row in zip(from_tail, rows):
+            if is_tail:
+                yield bytes(self._tail_text[tail_offsets[row]:tail_offsets[row + 1]])
+            else:
+                yield bytes(self._base_text[self._base_text_offsets[row]:self._base_text_offsets[row + 1]])
+    
+    def save(self, directory):
+        """
+        Write live rows, sorted by chunk ID, as .npy columns plus a text blob.
+        
+        Returns:
+            Dict of store state to store in the snapshot manifest
+        """
+        ids, from_tail, rows = self._live_rows()
+        for name in ('source', 'meta') + INT_FIELDS:
+            np.save(os.path.join(directory, f'chunk_{name}.npy'), self._merged_column(name, from_tail, rows))
+        
+        text_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        with open(os.path.join(directory, 'chunk_text.bin'), 'wb') as f:
+            for i, data in enumerate(self._row_texts(from_tail, rows)):
+                f.write(data)
+                text_offsets[i + 1] = text_offsets[i] + len(data)
+        np.save(os.path.join(directory, 'chunk_ids.npy'), ids)
+        np.save(os.path.join(directory, 'chunk_text_offsets.npy'), text_offsets)
+        with open(os.path.join(directory, 'chunk_strings.json'), 'w') as f:
+            json.dump(self._strings, f)
+        return {'chunks': len(ids), 'strings': len(self._strings), 'text_bytes': int(text_offsets[-1])}
+    
+    @classmethod
+    def load(cls, directory, mmap_text=True):
+        """Load a store written by save(); the text blob and columns are memory-mapped"""
+        store = cls()
+        mmap_mode = 'r' if mmap_text else None
+        store._base_ids = np.load(os.path.join(directory, 'chunk_ids.npy'), mmap_mode=mmap_mode)
+        store._base_text_offsets = np.load(os.path.join(directory, 'chunk_text_offsets.npy'), mmap_mode=mmap_mode)
+        for name in ('source', 'meta') + INT_FIELDS:
+            path = os.path.join(directory, f'chunk_{name}.npy')
+            if os.path.exists(path):
+                store._base_columns[name] = np.load(path, mmap_mode=mmap_mode)
+            else:
+                # Column added after the store was written
+                store._base_columns[name] = np.full(len(store._base_ids), MISSING, dtype=np.int32)
+        text_path = os.path.join(directory, 'chunk_text.bin')
+        if os.path.getsize(text_path):
+            with open(text_path, 'rb') as f:
+                if mmap_text:
+                    store._base_text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    store._base_text = f.read()
+        with open(os.path.join(directory, 'chunk_strings.json')) as f:
+            store._strings = json.load(f)
+        store._string_ids = {value: string_id for string_id, value in enumerate(store._strings)}
+        store._base_alive = np.ones(len(store._base_ids), dtype=bool)
+        store._base_live = len(store._base_ids)
+        return store
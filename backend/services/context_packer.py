@@ -0,0 +1,136 @@
+"""
+Context Packer - Assembles retrieved chunks into a bounded LLM prompt context.
+Adjacent chunks from the same source and page are stitched back together
+(dropping the CHUNK_OVERLAP text they share), passages are ordered by
+retrieval score and packed greedily into a token budget using the token
+counts stored with each chunk at ingest time.
+"""
+import logging
+from backend.services.llm_service import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Search result fields holding a relevance score, in order of preference
+SCORE_FIELDS = ('fusion_score', 'similarity', 'lexical_score')
+# Characters searched when aligning the start of a chunk inside its predecessor
+OVERLAP_PROBE_CHARS = 64
+
+def chunk_score(chunk):
+    """Retrieval score of a search result (0 if it has none)"""
+    for field in SCORE_FIELDS:
+        if chunk.get(field) is not None:
+            return chunk[field]
+    return 0.0
+
+def chunk_tokens(chunk):
+    """Token count stored at ingest, counted on the fly for older chunks"""
+    token_count = chunk.get('token_count')
+    return token_count if token_count is not None else estimate_tokens(chunk['text'])
+
+def merge_overlap(left, right):
+    """
+    Join two consecutive chunk texts, dropping the text the right one repeats
+    from the end of the left one.
+    """
+    probe = right[:OVERLAP_PROBE_CHARS]
+    if probe:
+        position = left.rfind(probe)
+        while position >= 0:
+            if right.startswith(left[position:]):
+                return left[:position] + right
+            position = left.rfind(probe, 0, position)
+    return f"{left}\n{right}"
+
+def _passage_key(chunk):
+    """Chunks with the same key come from one contiguous text (a PDF page or a transcript)"""
+    return chunk.get('source_key', chunk.get('source')), chunk.get('page')
+
+def merge_neighbours(chunks):
+    """
+    Merge runs of consecutive chunks (by chunk_index) from the same source and page.
+    
+    Returns:
+        List of passage dicts: text, score (best member score), tokens and
+        chunks (the members, in reading order)
+    """
+    groups = {}
+    for chunk in chunks:
+        groups.setdefault(_passage_key(chunk), []).append(chunk)
+    
+    passages = []
+    for members in groups.values():
+        members.sort(key=lambda chunk: chunk.get('chunk_index', -1))
+        run = [members[0]]
+        for chunk in members[1:]:
+            previous = run[-1]
+            if (chunk.get('chunk_index') is not None and previous.get('chunk_index') is not None
+                    and chunk['chunk_index'] == previous['chunk_index'] + 1):
+                run.append(chunk)
+            else:
+                passages.append(_make_passage(run))
+                run = [chunk]
+        passages.append(_make_passage(run))
+    return passages
+
+def _make_passage(run):
+    text = run[0]['text']
+    for chunk in run[1:]:
+        text = merge_overlap(text, chunk['text'])
+    tokens = sum(chunk_tokens(chunk) for chunk in run)
+    total_chars = sum(len(chunk['text']) for chunk in run)
+    if len(run) > 1 and total_chars:
+        # Scale the stored counts by how much text survived the overlap merge
+        tokens = max(1, round(tokens * len(text) / total_chars))
+    return {
+        'text': text,
+        'score': max(chunk_score(chunk) for chunk in run),
+        'tokens': tokens,
+        'chunks': run
+    }
+
+def context_sources(chunks):
+    """Distinct source labels of chunks, including sources merged in by deduplication"""
+    sources = []
+    for chunk in chunks:
+        for citation in chunk.get('citations') or [chunk]:
+            source = citation.get('source')
+            if source and source not in sources:
+                sources.append(source)
+    return sources
+
+def pack_context(chunks, max_tokens, with_sources=True):
+    """
+    Build a prompt context from search results within a token budget.
+    
+    Args:
+        chunks: Search results (chunk dicts with scores)
+        max_tokens: Token budget for the whole context
+        with_sources: Prefix each passage with a [Source: ...] line
+    
+    Returns:
+        (context text, list of chunks included in it)
+    """
+    if not chunks:
+        return "", []
+    passages = sorted(merge_neighbours(chunks), key=lambda passage: passage['score'], reverse=True)
+    
+    parts = []
+    included = []
+    used_tokens = 0
+    for passage in passages:
+        header = f"[Source: {', '.join(context_sources(passage['chunks']))}]\n" if with_sources else ""
+        cost = passage['tokens'] + (estimate_tokens(header) if header else 0) + 1
+        if used_tokens + cost > max_tokens:
+            if parts:
+                # Skip it; a shorter, lower-scored passage may still fit
+                continue
+            # Always keep (a prefix of) the best passage
+            keep_chars = int(len(passage['text']) * max(0, max_tokens - (cost - passage['tokens'])) / max(passage['tokens'], 1))
+            passage = dict(passage, text=passage['text'][:keep_chars])
+            cost = max_tokens
+        parts.append(f"{header}{passage['text']}")
+        included.extend(passage['chunks'])
+        used_tokens += cost
+    
+    logger.debug(f"Packed {len(included)} of {len(chunks)} chunks into ~{used_tokens} tokens")
+    return "\n\n".join(parts), included
@@ -0,0 +1,236 @@
+"""
+Embedding Cache - Persistent, content-addressed store for embedding vectors.
+Vectors live in a float32 memory-mapped matrix next to a memory-mapped table
+of text hashes, so re-ingestion and restarts only embed new or changed text.
+The key table is the persisted index: worker processes sharing the files
+take a file lock (exclusive to write, shared to read) and rescan the table
+whenever another process has written since they last looked (before
+writing, and on a lookup miss), so they never hand out the same slot twice,
+return a vector stored under another key, or miss a vector another process
+stored.
+"""
+import logging
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from backend.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+INITIAL_CAPACITY = 1024
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(cache_dir, model, max_mb):
+    """Return the process-wide cache for an embedding model, creating it on first use"""
+    with _caches_lock:
+        key = (os.path.abspath(cache_dir), model)
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(cache_dir, model, max_mb)
+        return _caches[key]
+
+class EmbeddingCache:
+    """Disk-backed cache of embeddings keyed by (model, text hash)"""
+    
+    def __init__(self, cache_dir, model, max_mb=1024):
+        self.model = model
+        self.cache_dir = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', model))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # key -> slot, least recently used first
+        self._free_slots = []
+        self._dim = None
+        self._capacity = 0
+        self._keys = None
+        self._vectors = None
+        self._seen_epoch = 0  # write counter value the in-process slot table reflects
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(self.cache_dir, 'cache.lock'))
+        self._epoch = self._open_epoch()
+        with self._file_lock.shared():
+            self._load()
+            self._seen_epoch = int(self._epoch[0])
+        if self._slots:
+            logger.info(f"Loaded embedding cache for {self.model}: {len(self._slots)} vectors")
+    
+    @property
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, 'meta.json')
+    
+    @property
+    def _keys_path(self):
+        return os.path.join(self.cache_dir, 'keys.bin')
+    
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.cache_dir, 'vectors.f32')
+    
+    def _open_epoch(self):
+        """Map the shared write counter, bumped by every process after it writes"""
+        path = os.path.join(self.cache_dir, 'epoch.bin')
+        with open(path, 'ab') as f:
+            if f.tell() < 8:
+                f.truncate(8)
+        return np.memmap(path, dtype=np.int64, mode='r+', shape=(1,))
+    
+    def _key(self, text):
+        """Content address for a text under this cache's model"""
+        return hashlib.blake2b(f"{self.model}\0{text}".encode('utf-8'), digest_size=KEY_BYTES).digest()
+    
+    def _load(self):
+        """
+        Open the cache files and rebuild the slot table from the key table
+        (caller holds the file lock). Entries this process already knew keep
+        their LRU position; entries written by other processes count as the
+        most recently used.
+        """
+        if not os.path.exists(self._meta_path):
+            return
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            self._dim = int(meta['dim'])
+            if int(meta['capacity']) != self._capacity:
+                self._map(int(meta['capacity']))
+            keys = np.asarray(self._keys)
+            used = keys.any(axis=1)
+            stored = {keys[slot].tobytes(): int(slot) for slot in np.flatnonzero(used)}
+            slots = OrderedDict((key, slot) for key, slot in self._slots.items() if stored.get(key) == slot)
+            for key, slot in stored.items():
+                slots.setdefault(key, slot)
+            self._slots = slots
+            self._free_slots = [int(slot) for slot in np.flatnonzero(~used)[::-1]]
+        except Exception as e:
+            logger.warning(f"Could not load embedding cache at {self.cache_dir}, starting empty: {e}")
+            self._dim = None
+            self._capacity = 0
+            self._keys = None
+            self._vectors = None
+            self._slots.clear()
+            self._free_slots = []
+    
+    def _map(self, capacity):
+        """Map the key and vector files at the given capacity"""
+        self._keys = np.memmap(self._keys_path, dtype=np.uint8, mode='r+', shape=(capacity, KEY_BYTES))
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self._dim))
+        self._capacity = capacity
+    
+    def _open(self, capacity):
+        """Grow the key and vector files to the given capacity and remap them (caller holds the file lock exclusively)"""
+        for path, row_bytes in ((self._keys_path, KEY_BYTES), (self._vectors_path, self._dim * 4)):
+            size = capacity * row_bytes
+            with open(path, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self._free_slots = list(range(capacity - 1, self._capacity - 1, -1)) + self._free_slots
+        self._map(capacity)
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'model': self.model, 'dim': self._dim, 'capacity': capacity}, f)
+        os.replace(tmp_path, self._meta_path)
+    
+    def _max_entries(self):
+        return max(1, self.max_bytes // (self._dim * 4 + KEY_BYTES))
+    
+    def _allocate_slot(self):
+        """Get a free slot, growing the files or evicting the least recently used entry"""
+        if not self._free_slots:
+            max_entries = self._max_entries()
+            if self._capacity < max_entries:
+                self._open(min(max(self._capacity * 2, INITIAL_CAPACITY), max_entries))
+            else:
+                _, slot = self._slots.popitem(last=False)
+                self._keys[slot] = 0
+                self.evictions += 1
+                return slot
+        return self._free_slots.pop()
+    
+    def get_many(self, texts):
+        """
+        Look up cached embeddings.
+        
+        Returns:
+            List aligned with texts holding a float32 vector, or None on a miss
+        """
+        results = []
+        keys = [self._key(text) for text in texts]
+        with self._lock, self._file_lock.shared():
+            if any(key not in self._slots for key in keys):
+                # Another process may have stored it since this one last looked
+                self._refresh()
+            for key in keys:
+                slot = self._slots.get(key)
+                # Another process may have evicted and reused the slot; only trust it if the key still matches
+                if slot is not None and self._keys[slot].tobytes() == key:
+                    self._slots.move_to_end(key)
+                    results.append(np.array(self._vectors[slot]))
+                    self.hits += 1
+                else:
+                    if slot is not None:
+                        del self._slots[key]
+                    results.append(None)
+                    self.misses += 1
+        return results
+    
+    def _refresh(self):
+        """Pick up writes made by other processes since the last look (caller holds the file lock)"""
+        epoch = int(self._epoch[0])
+        if epoch != self._seen_epoch:
+            self._load()
+            self._seen_epoch = epoch
+    
+    def put_many(self, texts, vectors):
+        """Store embeddings for texts, evicting old entries when the size limit is reached"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock, self._file_lock.exclusive():
+            # Slots must be allocated from the current on-disk table, not a stale copy
+            self._refresh()
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._open(min(INITIAL_CAPACITY, self._max_entries()))
+            elif vectors.shape[1] != self._dim:
+                logger.warning(f"Embedding dimension changed for {self.model} ({self._dim} -> {vectors.shape[1]}), not caching")
+                return
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._allocate_slot()
+                # Write the vector before the key so readers never match a half-written row
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+            self._epoch[0] += 1
+            self._seen_epoch = int(self._epoch[0])
+    
+    def flush(self):
+        """Flush memory-mapped pages to disk"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._keys.flush()
+    
+    def stats(self):
+        """Hit/miss counters and size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model,
+            'entries': len(self._slots),
+            'capacity': self._capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
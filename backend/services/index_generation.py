@@ -0,0 +1,150 @@
+"""
+Index Generation - Versioned, reference-counted RAG index state.
+A published generation is never modified. A full rebuild assembles a new
+generation off to the side, and a per-source update applies its change to a
+copy of the current one; either is published with a single reference swap,
+so searches read whole generations without locking. Copies share each
+structure's read-only base and copy only the small delta written since, so
+an update costs time proportional to the change, not to the corpus. Searches pin the
+generation they start on; a replaced generation is released once its last
+reader unpins it.
+"""
+import logging
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from backend.services.chunk_store import ChunkStore
+
+logger = logging.getLogger(__name__)
+
+class IndexGeneration:
+    """One version of the searchable index: vectors, BM25 postings, chunks and source bookkeeping"""
+    
+    def __init__(self, index=None, lexical_index=None, chunks=None, sources=None,
+                 source_versions=None, source_types=None, embedding_model=None, dedup=None, ingest_stats=None):
+        self.index = index
+        self.lexical_index = lexical_index
+        self.chunks = chunks if chunks is not None else ChunkStore()
+        self.sources = sources if sources is not None else {}  # source key -> list of chunk_ids
+        self.source_versions = source_versions if source_versions is not None else {}
+        self.source_types = source_types if source_types is not None else {}
+        self.embedding_model = embedding_model  # fitted local embedding model, if any
+        self.dedup = dedup  # ChunkDeduplicator over the indexed chunks, if dedup is enabled
+        self.ingest_stats = ingest_stats  # dedup counts from the rebuild that produced this generation
+        self.version = None  # assigned when published
+        self.revision = 0  # bumped by each source update applied before publishing
+        self.created_at = time.time()
+        self._corpus_version = None  # (revision, fingerprint)
+        self.refs = 0
+        self.retired = False
+    
+    def corpus_version(self):
+        """
+        Fingerprint of the indexed content: the sources with their versions and
+        chunk counts, plus the embedding model. Unlike version it is stable
+        across restarts and rebuilds of unchanged content, and it changes
+        whenever a source is added, updated or removed.
+        """
+        cached = self._corpus_version
+        if cached is not None and cached[0] == self.revision:
+            return cached[1]
+        revision = self.revision
+        digest = hashlib.blake2b(digest_size=8)
+        for source_key in sorted(self.sources, key=str):
+            digest.update(f"{source_key}\0{self.source_versions.get(source_key)}\0{len(self.sources[source_key])}\n".encode('utf-8'))
+        if self.embedding_model is not None:
+            digest.update(self.embedding_model.model_id.encode('utf-8'))
+        fingerprint = digest.hexdigest()
+        self._corpus_version = (revision, fingerprint)
+        return fingerprint
+    
+    def copy(self):
+        """Unpublished copy of this generation for an update to be applied to"""
+        generation = IndexGeneration(
+            index=self.index.copy() if self.index is not None else None,
+            lexical_index=self.lexical_index.copy() if self.lexical_index is not None else None,
+            chunks=self.chunks.copy(),
+            sources=dict(self.sources),
+            source_versions=dict(self.source_versions),
+            source_types=dict(self.source_types),
+            embedding_model=self.embedding_model,
+            dedup=self.dedup.copy() if self.dedup is not None else None,
+            ingest_stats=self.ingest_stats
+        )
+        generation.revision = self.revision
+        return generation
+    
+    def compact(self):
+        """Fold the deltas of an unpublished generation's structures into their bases"""
+        for part in (self.index, self.lexical_index, self.chunks, self.dedup):
+            if part is not None:
+                part.compact()
+    
+    def release(self):
+        """Drop references to the index structures so memory (and mmaps) can be reclaimed"""
+        self.index = None
+        self.lexical_index = None
+        self.dedup = None
+        self.chunks = ChunkStore()
+        logger.info(f"Released index generation {self.version}")
+
+class GenerationRegistry:
+    """Holds the current IndexGeneration and tracks readers of older ones"""
+    
+    def __init__(self, generation=None):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._retiring = []  # replaced generations still pinned by readers
+        self._current = None
+        self.publish(generation or IndexGeneration())
+    
+    @property
+    def current(self):
+        return self._current
+    
+    def publish(self, generation):
+        """
+        Atomically make a generation current.
+        
+        Returns:
+            The version number assigned to the generation
+        """
+        with self._lock:
+            self._version += 1
+            generation.version = self._version
+            previous, self._current = self._current, generation
+            if previous is not None:
+                previous.retired = True
+                if previous.refs:
+                    self._retiring.append(previous)
+                else:
+                    previous.release()
+        if previous is not None:
+            logger.info(f"Published index generation {generation.version} (replaced {previous.version})")
+        return generation.version
+    
+    @contextmanager
+    def pin(self):
+        """Pin the current generation for the duration of a read"""
+        with self._lock:
+            generation = self._current
+            generation.refs += 1
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.refs -= 1
+                release = generation.retired and not generation.refs
+                if release:
+                    self._retiring.remove(generation)
+            if release:
+                generation.release()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._current.version,
+                'readers': self._current.refs,
+                'retiring': [{'version': g.version, 'readers': g.refs} for g in self._retiring]
+            }
@@ -0,0 +1,222 @@
+"""
+Index Snapshots - Versioned, memory-mappable on-disk format for the RAG index.
+Each snapshot is a directory holding the native FAISS index, the raw vectors,
+the BM25 postings, the columnar chunk store and a manifest with a format
+version and checksums. Snapshots are written to a temporary directory and
+published by renaming it and updating a LATEST pointer, so readers never see
+partial data. With several worker processes, only the one holding the writer
+lock writes and prunes snapshots; the others load what it publishes and ask
+it (through request files) to reconcile or rebuild the index.
+"""
+import logging
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from backend.config import Config
+from backend.services.vector_index import VectorIndex
+from backend.services.lexical_index import LexicalIndex
+from backend.services.chunk_store import ChunkStore
+from backend.services.chunk_dedup import ChunkDeduplicator
+from backend.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+LATEST_FILE = 'LATEST'
+WRITER_LOCK_FILE = 'writer.lock'
+SNAPSHOTS_LOCK_FILE = 'snapshots.lock'
+RECONCILE_REQUEST_FILE = 'RECONCILE'
+REBUILD_REQUEST_FILE = 'REBUILD'
+
+def _file_digest(path):
+    """SHA-256 of a file, streamed"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_snapshot(vector_index, chunks, sources, root=None, metadata=None, lexical_index=None, embedding_model=None, dedup=None):
+    """
+    Write a new snapshot and publish it as the latest one.
+    
+    Args:
+        vector_index: VectorIndex (or None for an empty corpus)
+        chunks: ChunkStore (or any mapping of chunk_id -> chunk dict)
+        sources: Dict of source key -> list of chunk_ids
+        root: Snapshot root directory (defaults to Config.RAG_SNAPSHOT_DIR)
+        metadata: Optional extra fields for the manifest
+        lexical_index: Optional LexicalIndex to store alongside the vectors
+        embedding_model: Optional fitted LocalEmbeddingModel the vectors came from
+        dedup: Optional ChunkDeduplicator holding the chunks' fingerprints
+    
+    Returns:
+        Path of the published snapshot directory
+    """
+    root = root or Config.RAG_SNAPSHOT_DIR
+    os.makedirs(root, exist_ok=True)
+    # Microseconds keep names in write order, which pruning relies on
+    name = f"snapshot-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = os.path.join(root, f".tmp-{name}")
+    os.makedirs(tmp_dir)
+    
+    try:
+        index_state = vector_index.save(tmp_dir) if vector_index is not None else None
+        lexical_state = lexical_index.save(tmp_dir) if lexical_index is not None else None
+        embedding_state = embedding_model.save(tmp_dir) if embedding_model is not None else None
+        dedup_state = dedup.save(tmp_dir) if dedup is not None else None
+        if not isinstance(chunks, ChunkStore):
+            store = ChunkStore()
+            store.update(chunks)
+            chunks = store
+        chunk_state = chunks.save(tmp_dir)
+        with open(os.path.join(tmp_dir, 'sources.json'), 'w') as f:
+            json.dump({key: [int(chunk_id) for chunk_id in chunk_ids] for key, chunk_ids in sources.items()}, f)
+        
+        files = {}
+        for filename in sorted(os.listdir(tmp_dir)):
+            file_path = os.path.join(tmp_dir, filename)
+            files[filename] = {'size': os.path.getsize(file_path), 'sha256': _file_digest(file_path)}
+        
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'created_at': datetime.utcnow().isoformat(),
+            'chunk_count': len(chunks),
+            'index': index_state,
+            'lexical': lexical_state,
+            'chunks': chunk_state,
+            'embedding_model': embedding_state,
+            'dedup': dedup_state,
+            'files': files
+        }
+        manifest.update(metadata or {})
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        path = os.path.join(root, name)
+        os.rename(tmp_dir, path)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    
+    with snapshots_lock(root).exclusive():
+        latest_tmp = os.path.join(root, f".{LATEST_FILE}.{uuid.uuid4().hex[:8]}")
+        with open(latest_tmp, 'w') as f:
+            f.write(name)
+        os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+        prune_snapshots(root, keep=Config.RAG_SNAPSHOT_KEEP)
+    logger.info(f"Wrote RAG snapshot {path} ({len(chunks)} chunks)")
+    return path
+
+def latest_snapshot(root=None):
+    """Path of the most recently published snapshot, or None"""
+    root = root or Config.RAG_SNAPSHOT_DIR
+    try:
+        with open(os.path.join(root, LATEST_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(root, name)
+    return path if os.path.isdir(path) else None
+
+def prune_snapshots(root, keep):
+    """Delete all but the newest `keep` snapshots (never the one LATEST points to; caller holds snapshots_lock exclusively)"""
+    latest = latest_snapshot(root)
+    names = sorted(n for n in os.listdir(root) if n.startswith('snapshot-'))
+    for name in names[:-keep] if keep > 0 else []:
+        path = os.path.join(root, name)
+        if path != latest:
+            # Processes that still map these files keep them alive until they unmap
+            shutil.rmtree(path, ignore_errors=True)
+
+def snapshots_lock(root=None):
+    """
+    Lock that publishing and pruning take exclusively and loading takes
+    shared, so no snapshot is pruned while a process is opening it.
+    """
+    root = root or Config.RAG_SNAPSHOT_DIR
+    os.makedirs(root, exist_ok=True)
+    return FileLock(os.path.join(root, SNAPSHOTS_LOCK_FILE))
+
+def acquire_writer_role(root=None):
+    """
+    Try to become the one process that writes and prunes snapshots. The role
+    is held until the process exits, then another process can take it over.
+    
+    Returns:
+        The held FileLock, or None if another process is the writer
+    """
+    root = root or Config.RAG_SNAPSHOT_DIR
+    os.makedirs(root, exist_ok=True)
+    lock = FileLock(os.path.join(root, WRITER_LOCK_FILE))
+    return lock if lock.try_acquire() else None
+
+def request_index_update(rebuild=False, root=None):
+    """Ask the writer process to reconcile (or fully rebuild) the index and publish a snapshot"""
+    root = root or Config.RAG_SNAPSHOT_DIR
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, REBUILD_REQUEST_FILE if rebuild else RECONCILE_REQUEST_FILE)
+    with open(path, 'a'):
+        os.utime(path)
+
+def index_update_requests(root=None):
+    """
+    Times of the latest reconcile and rebuild requests, as a tuple the writer
+    compares with the last one it handled (None where none was made).
+    """
+    root = root or Config.RAG_SNAPSHOT_DIR
+    times = []
+    for name in (RECONCILE_REQUEST_FILE, REBUILD_REQUEST_FILE):
+        try:
+            times.append(os.stat(os.path.join(root, name)).st_mtime_ns)
+        except FileNotFoundError:
+            times.append(None)
+    return tuple(times)
+
+def read_snapshot(path, verify_checksums=None, memory_map=True):
+    """
+    Load a snapshot directory.
+    
+    Args:
+        path: Snapshot directory
+        verify_checksums: Recompute SHA-256 of every file (defaults to
+            Config.RAG_SNAPSHOT_VERIFY_CHECKSUMS); sizes are always checked
+        memory_map: Memory-map the index and vectors instead of reading them
+    
+    Returns:
+        (vector_index, lexical_index, chunks, sources, dedup, manifest) tuple;
+        lexical_index and dedup are None for snapshots written without them
+    """
+    if verify_checksums is None:
+        verify_checksums = Config.RAG_SNAPSHOT_VERIFY_CHECKSUMS
+    
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')} in {path}")
+    
+    for filename, info in manifest['files'].items():
+        file_path = os.path.join(path, filename)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != info['size']:
+            raise ValueError(f"Snapshot file {filename} is missing or truncated in {path}")
+        if verify_checksums and _file_digest(file_path) != info['sha256']:
+            raise ValueError(f"Checksum mismatch for snapshot file {filename} in {path}")
+    
+    vector_index = None
+    if manifest['index'] is not None:
+        vector_index = VectorIndex.load(path, manifest['index'], mmap=memory_map)
+    lexical_index = None
+    if manifest.get('lexical') is not None:
+        lexical_index = LexicalIndex.load(path, manifest['lexical'], mmap=memory_map)
+    dedup = None
+    if manifest.get('dedup') is not None:
+        dedup = ChunkDeduplicator.load(path, manifest['dedup'])
+    chunks = ChunkStore.load(path, mmap_text=memory_map)
+    with open(os.path.join(path, 'sources.json')) as f:
+        sources = json.load(f)
+    
+    logger.info(f"Loaded RAG snapshot {path} ({manifest['chunk_count']} chunks)")
+    return vector_index, lexical_index, chunks, sources, dedup, manifest
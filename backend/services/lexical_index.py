@@ -0,0 +1,303 @@
+"""
+Lexical Index - In-process BM25 inverted index over chunk texts.
+Answers keyword queries with no network round trip, so retrieval can fall
+back to it (or fuse with it) when the embedding API is slow. Snapshots store
+postings in CSR arrays that are memory-mapped on load; later edits are kept
+in an in-memory delta on top of them.
+"""
+import logging
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our
+she so than that the their them then there these they this to was we were what when where which who why
+will with you your
+""".split())
+
+def tokenize(text):
+    """Lower-cased word tokens with common English stopwords removed"""
+    return [token for token in TOKEN_PATTERN.findall(text.casefold()) if token not in STOPWORDS]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several ranked lists of IDs with reciprocal rank fusion.
+    
+    Args:
+        rankings: Iterable of ID lists, best first
+        k: RRF damping constant
+    
+    Returns:
+        List of (id, fused_score) sorted by descending score
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class LexicalIndex:
+    """BM25 inverted index keyed by chunk ID"""
+    
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # Immutable base postings (loaded from a snapshot), rows index the doc arrays
+        self._base_terms = {}  # term -> row in _base_term_offsets
+        self._base_term_offsets = np.zeros(1, dtype=np.int64)
+        self._base_postings = np.zeros(0, dtype=np.int32)
+        self._base_tfs = np.zeros(0, dtype=np.int32)
+        self._base_ids = np.zeros(0, dtype=np.int64)  # sorted chunk IDs
+        self._base_lengths = np.zeros(0, dtype=np.int32)
+        self._base_alive = np.zeros(0, dtype=bool)
+        # In-memory delta for chunks added since the snapshot
+        self._postings = {}  # term -> {chunk_id: term frequency}
+        self._lengths = {}  # chunk_id -> token count
+        self._doc_terms = {}  # chunk_id -> distinct terms, for removal
+        self._doc_count = 0
+        self._total_length = 0
+    
+    def __len__(self):
+        return self._doc_count
+    
+    def _base_row(self, chunk_id):
+        """Row of a live chunk in the base arrays, or None"""
+        if not len(self._base_ids):
+            return None
+        row = int(np.searchsorted(self._base_ids, chunk_id))
+        if row < len(self._base_ids) and self._base_ids[row] == chunk_id and self._base_alive[row]:
+            return row
+        return None
+    
+    def copy(self):
+        """
+        Independent copy, for copy-on-write updates. The read-only base
+        postings are shared and only the delta is copied; a delta that has
+        outgrown its share of the base (RAG_DELTA_MAX_FRACTION) is folded into
+        new base postings in the copy, so later copies stay cheap.
+        """
+        clone = LexicalIndex(k1=self.k1, b=self.b)
+        clone.__dict__.update(self.__dict__)
+        clone._base_alive = self._base_alive.copy()
+        clone._postings = {term: dict(postings) for term, postings in self._postings.items()}
+        clone._lengths = dict(self._lengths)
+        clone._doc_terms = dict(self._doc_terms)
+        base_live = self._doc_count - len(self._lengths)
+        if len(self._lengths) > max(Config.RAG_DELTA_MIN_ROWS, Config.RAG_DELTA_MAX_FRACTION * base_live):
+            clone.compact()
+        return clone
+    
+    def compact(self):
+        """
+        Fold the delta (and removals) into new in-memory base postings. Only
+        for an index no reader shares, e.g. one in an unpublished generation.
+        """
+        terms, offsets, postings, tfs, doc_ids, doc_lengths = self._merged()
+        self._base_terms = {term: row for row, term in enumerate(terms)}
+        self._base_term_offsets = offsets
+        self._base_postings = postings
+        self._base_tfs = tfs
+        self._base_ids = doc_ids
+        self._base_lengths = doc_lengths
+        self._base_alive = np.ones(len(doc_ids), dtype=bool)
+        self._postings = {}
+        self._lengths = {}
+        self._doc_terms = {}
+    
+    def add(self, chunk_ids, texts):
+        """Index texts under chunk IDs, replacing any existing entries for those IDs"""
+        for chunk_id, text in zip(chunk_ids, texts):
+            chunk_id = int(chunk_id)
+            self._remove_one(chunk_id)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[chunk_id] = tf
+            length = sum(counts.values())
+            self._lengths[chunk_id] = length
+            self._doc_terms[chunk_id] = tuple(counts)
+            self._doc_count += 1
+            self._total_length += length
+    
+    def remove(self, chunk_ids):
+        """Drop chunk IDs from the index (unknown IDs are ignored)"""
+        for chunk_id in chunk_ids:
+            self._remove_one(int(chunk_id))
+    
+    def _remove_one(self, chunk_id):
+        length = self._lengths.pop(chunk_id, None)
+        if length is not None:
+            for term in self._doc_terms.pop(chunk_id):
+                postings = self._postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+        else:
+            row = self._base_row(chunk_id)
+            if row is None:
+                return
+            self._base_alive[row] = False
+            length = int(self._base_lengths[row])
+        self._doc_count -= 1
+        self._total_length -= length
+    
+    def search(self, query, k, subset=None):
+        """
+        Score chunks against a query with BM25.
+        
+        Args:
+            query: Query text
+            k: Number of results
+            subset: Optional set of chunk IDs to restrict results to
+        
+        Returns:
+            List of (chunk_id, score) for the top k matching chunks, best first
+        """
+        terms = set(tokenize(query))
+        if not terms or not self._doc_count:
+            return []
+        
+        avg_length = self._total_length / self._doc_count
+        base_scores = np.zeros(len(self._base_ids), dtype=np.float32) if len(self._base_ids) else None
+        delta_scores = {}
+        
+        for term in terms:
+            rows = tfs = None
+            term_row = self._base_terms.get(term)
+            if term_row is not None:
+                start, end = self._base_term_offsets[term_row], self._base_term_offsets[term_row + 1]
+                rows = np.asarray(self._base_postings[start:end])
+                tfs = np.asarray(self._base_tfs[start:end])
+                alive = self._base_alive[rows]
+                rows, tfs = rows[alive], tfs[alive].astype(np.float32)
+            delta = self._postings.get(term, {})
+            df = (len(rows) if rows is not None else 0) + len(delta)
+            if not df:
+                continue
+            
+            idf = math.log(1 + (self._doc_count - df + 0.5) / (df + 0.5))
+            if rows is not None and len(rows):
+                norm = self.k1 * (1 - self.b + self.b * self._base_lengths[rows] / avg_length)
+                base_scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+            for chunk_id, tf in delta.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / avg_length)
+                delta_scores[chunk_id] = delta_scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        
+        candidates = list(delta_scores.items())
+        if subset is not None:
+            candidates = [item for item in candidates if item[0] in subset]
+        if base_scores is not None:
+            if subset is not None:
+                base_scores *= self._base_mask(subset)
+            matched = np.flatnonzero(base_scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-base_scores[matched], k - 1)[:k]]
+            candidates.extend((int(self._base_ids[row]), float(base_scores[row])) for row in matched)
+        return heapq.nlargest(k, candidates, key=lambda item: item[1])
+    
+    def _base_mask(self, subset):
+        """Boolean mask over base rows that belong to the given chunk IDs"""
+        mask = np.zeros(len(self._base_ids), dtype=bool)
+        subset_ids = np.fromiter(subset, dtype=np.int64, count=len(subset))
+        rows = np.searchsorted(self._base_ids, subset_ids)
+        valid = rows < len(self._base_ids)
+        rows, subset_ids = rows[valid], subset_ids[valid]
+        mask[rows[self._base_ids[rows] == subset_ids]] = True
+        return mask
+    
+    def _merged(self):
+        """
+        The base and delta merged into CSR arrays, with documents sorted by chunk ID.
+        
+        Returns:
+            (terms, term offsets, posting rows, term frequencies, doc IDs, doc lengths)
+        """
+        live_rows = np.flatnonzero(self._base_alive)
+        delta_ids = np.array(sorted(self._lengths), dtype=np.int64)
+        doc_ids = np.concatenate([self._base_ids[live_rows], delta_ids])
+        doc_lengths = np.concatenate([
+            self._base_lengths[live_rows],
+            np.array([self._lengths[int(chunk_id)] for chunk_id in delta_ids], dtype=np.int32)
+        ])
+        order = np.argsort(doc_ids, kind='stable')
+        doc_ids, doc_lengths = doc_ids[order], doc_lengths[order]
+        
+        # Old base row -> new row (-1 for removed docs)
+        base_row_map = np.full(len(self._base_ids), -1, dtype=np.int64)
+        base_row_map[live_rows] = np.searchsorted(doc_ids, self._base_ids[live_rows])
+        
+        terms = []
+        offsets = [0]
+        postings, tfs = [], []
+        for term in sorted(set(self._base_terms) | set(self._postings)):
+            term_rows, term_tfs = [], []
+            term_row = self._base_terms.get(term)
+            if term_row is not None:
+                start, end = self._base_term_offsets[term_row], self._base_term_offsets[term_row + 1]
+                rows = base_row_map[np.asarray(self._base_postings[start:end])]
+                keep = rows >= 0
+                term_rows.append(rows[keep])
+                term_tfs.append(np.asarray(self._base_tfs[start:end])[keep])
+            delta = self._postings.get(term)
+            if delta:
+                term_rows.append(np.searchsorted(doc_ids, np.fromiter(delta.keys(), dtype=np.int64, count=len(delta))))
+                term_tfs.append(np.fromiter(delta.values(), dtype=np.int32, count=len(delta)))
+            count = sum(len(rows) for rows in term_rows)
+            if not count:
+                # Every document with the term was removed
+                continue
+            terms.append(term)
+            offsets.append(offsets[-1] + count)
+            postings.extend(term_rows)
+            tfs.extend(term_tfs)
+        
+        return (
+            terms,
+            np.array(offsets, dtype=np.int64),
+            np.concatenate(postings).astype(np.int32) if postings else np.zeros(0, dtype=np.int32),
+            np.concatenate(tfs).astype(np.int32) if tfs else np.zeros(0, dtype=np.int32),
+            doc_ids,
+            doc_lengths.astype(np.int32)
+        )
+    
+    def save(self, directory):
+        """
+        Write the index (base and delta merged) as CSR .npy arrays.
+        
+        Returns:
+            Dict of index state to store in the snapshot manifest
+        """
+        terms, offsets, postings, tfs, doc_ids, doc_lengths = self._merged()
+        np.save(os.path.join(directory, 'lexical_postings.npy'), postings)
+        np.save(os.path.join(directory, 'lexical_tfs.npy'), tfs)
+        np.save(os.path.join(directory, 'lexical_term_offsets.npy'), offsets)
+        np.save(os.path.join(directory, 'lexical_doc_ids.npy'), doc_ids)
+        np.save(os.path.join(directory, 'lexical_doc_lengths.npy'), doc_lengths)
+        with open(os.path.join(directory, 'lexical_terms.json'), 'w') as f:
+            json.dump(terms, f)
+        return {'k1': self.k1, 'b': self.b, 'terms': len(terms), 'docs': len(doc_ids)}
+    
+    @classmethod
+    def load(cls, directory, state, mmap=True):
+        """Load an index written by save(), memory-mapping the posting arrays"""
+        lexical_index = cls(k1=state['k1'], b=state['b'])
+        mmap_mode = 'r' if mmap else None
+        lexical_index._base_postings = np.load(os.path.join(directory, 'lexical_postings.npy'), mmap_mode=mmap_mode)
+        lexical_index._base_tfs = np.load(os.path.join(directory, 'lexical_tfs.npy'), mmap_mode=mmap_mode)
+        lexical_index._base_term_offsets = np.load(os.path.join(directory, 'lexical_term_offsets.npy'))
+        lexical_index._base_ids = np.load(os.path.join(directory, 'lexical_doc_ids.npy'))
+        lexical_index._base_lengths = np.load(os.path.join(directory, 'lexical_doc_lengths.npy'))
+        lexical_index._base_alive = np.ones(len(lexical_index._base_ids), dtype=bool)
+        with open(os.path.join(directory, 'lexical_terms.json')) as f:
+            lexical_index._base_terms = {term: row for row, term in enumerate(json.load(f))}
+        lexical_index._doc_count = len(lexical_index._base_ids)
+        lexical_index._total_length = int(lexical_index._base_lengths.sum())
+        return lexical_index
@@ -1,32 +1,194 @@
 """
 LLM Service - Abstracts OpenAI and Gemini APIs.
-Provides unified interface for text generation.
+Provides unified interface for text generation and embeddings (OpenAI or an
+offline local model). Provider calls are asyncio-native (agenerate_response,
+agenerate_embeddings) so independent calls can be gathered; the synchronous
+methods are thin wrappers that run them on the provider registry's loop.
 """
 import logging
-from openai import OpenAI
-import google.generativeai as genai
+import asyncio
+import random
+import time
+from functools import partial
+from urllib.parse import urlparse
+import numpy as np
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
 from backend.config import Config
+from backend.services.embedding_cache import get_embedding_cache
+from backend.services.provider_clients import get_provider_registry
+from backend.services.provider_router import ProviderRouter
+from backend.services.local_embeddings import LocalEmbeddingModel
+from backend.services.response_cache import ResponseCache, MemoryResponseTier, SQLiteResponseTier, response_cache_key
+from backend.services.single_flight import AsyncSingleFlight, request_fingerprint
 
 logger = logging.getLogger(__name__)
 
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+_token_encoding = None
+
+# Native output sizes of OpenAI embedding models
+OPENAI_EMBEDDING_DIMS = {
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'text-embedding-ada-002': 1536
+}
+LOCAL_EMBEDDING_DEFAULT_DIM = 256
+GENERATION_TEMPERATURE = 0.7
+
+def estimate_tokens(text):
+    """Count tokens with tiktoken when available, otherwise estimate ~4 chars per token"""
+    global _token_encoding
+    if tiktoken is not None:
+        if _token_encoding is None:
+            _token_encoding = tiktoken.get_encoding('cl100k_base')
+        return len(_token_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def split_into_batches(texts, max_items, max_tokens):
+    """
+    Split texts into contiguous batches bounded by item count and token count.
+    
+    Returns:
+        List of (start, end) index ranges into texts
+    """
+    batches = []
+    start = 0
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if i > start and (i - start >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append((start, i))
+            start = i
+            batch_tokens = 0
+        batch_tokens += tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+def router_options():
+    """ProviderRouter settings shared by the generation and embedding routers"""
+    return {
+        'hedge_enabled': Config.ROUTER_HEDGE_ENABLED,
+        'hedge_percentile': Config.ROUTER_HEDGE_PERCENTILE,
+        'hedge_min_seconds': Config.ROUTER_HEDGE_MIN_MS / 1000,
+        'window': Config.ROUTER_LATENCY_WINDOW,
+        'failure_threshold': Config.ROUTER_FAILURE_THRESHOLD,
+        'cooldown_seconds': Config.ROUTER_COOLDOWN_SECONDS
+    }
+
+def is_retryable_error(error):
+    """Rate limits, provider 5xx responses and transport failures are worth retrying"""
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
 class LLMService:
     """Service for interacting with LLM providers"""
     
-    def __init__(self):
-        self.provider = Config.LLM_PROVIDER
+    def __init__(self, providers=None):
+        """
+        Args:
+            providers: ProviderRegistry supplying clients (defaults to the process-wide one)
+        """
+        self.providers = providers or get_provider_registry()
+        self.provider = Config.LLM_PROVIDER  # preferred provider; others with keys join the routing
         
         if self.provider == 'openai':
-            if not Config.OPENAI_API_KEY:
-                raise ValueError("OPENAI_API_KEY not set")
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+            self.client = self.providers.openai_client()
             self.model = Config.OPENAI_MODEL
+            self.model_name = Config.OPENAI_MODEL
         elif self.provider == 'gemini':
-            if not Config.GEMINI_API_KEY:
-                raise ValueError("GEMINI_API_KEY not set")
-            genai.configure(api_key=Config.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+            self.model = self.providers.gemini_model(Config.GEMINI_MODEL)
+            self.model_name = Config.GEMINI_MODEL
         else:
             raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        
+        generation_providers = [self.provider]
+        if Config.LLM_ROUTING_ENABLED:
+            if self.provider != 'openai' and Config.OPENAI_API_KEY:
+                self.client = self.providers.openai_client()
+                generation_providers.append('openai')
+            if self.provider != 'gemini' and Config.GEMINI_API_KEY:
+                generation_providers.append('gemini')
+        self.gemini_model = self.providers.gemini_model(Config.GEMINI_MODEL) if 'gemini' in generation_providers else None
+        # Provider -> model of every provider that may answer a generation request
+        self._generation_models = {
+            name: Config.OPENAI_MODEL if name == 'openai' else Config.GEMINI_MODEL
+            for name in generation_providers
+        }
+        self._generators = {'openai': self._agenerate_openai, 'gemini': self._agenerate_gemini}
+        self._streamers = {'openai': self._stream_openai, 'gemini': self._stream_gemini}
+        self.router = ProviderRouter(
+            generation_providers,
+            hedge_default_seconds=Config.LLM_HEDGE_DEFAULT_MS / 1000,
+            **router_options()
+        )
+        
+        self.embedding_provider = Config.EMBEDDING_PROVIDER
+        self.local_embedding_model = None
+        if self.embedding_provider == 'local':
+            self.local_embedding_model = LocalEmbeddingModel(
+                dim=Config.EMBEDDING_DIM or LOCAL_EMBEDDING_DEFAULT_DIM,
+                n_features=Config.LOCAL_EMBEDDING_FEATURES
+            )
+        elif self.embedding_provider != 'openai':
+            raise ValueError(f"Unsupported embedding provider: {self.embedding_provider}")
+        
+        self.embedding_cache = None
+        # Local embeddings are computed in-process, so only remote ones are cached
+        if Config.EMBEDDING_CACHE_ENABLED and self.embedding_provider == 'openai':
+            try:
+                self.embedding_cache = get_embedding_cache(
+                    Config.EMBEDDING_CACHE_DIR,
+                    self.embedding_model_id,
+                    Config.EMBEDDING_CACHE_MAX_MB
+                )
+            except Exception as e:
+                logger.warning(f"Embedding cache unavailable, embedding without it: {e}")
+        
+        # Embeddings only route between endpoints serving the same model, so vectors stay comparable
+        self.embedding_router = None
+        self._embedding_endpoints = {}
+        if self.embedding_provider == 'openai' and Config.OPENAI_API_KEY:
+            self._embedding_endpoints = {'openai': None}
+            for base_url in Config.OPENAI_EMBEDDING_FALLBACK_URLS:
+                self._embedding_endpoints[f"openai@{urlparse(base_url).netloc or base_url}"] = base_url
+            self.embedding_router = ProviderRouter(
+                list(self._embedding_endpoints),
+                hedge_default_seconds=Config.EMBEDDING_HEDGE_DEFAULT_MS / 1000,
+                **router_options()
+            )
+        
+        self.response_cache = None
+        if Config.RESPONSE_CACHE_ENABLED:
+            tiers = [MemoryResponseTier(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)]
+            if Config.RESPONSE_CACHE_PATH:
+                try:
+                    tiers.append(SQLiteResponseTier(
+                        Config.RESPONSE_CACHE_PATH,
+                        Config.RESPONSE_CACHE_MAX_MB,
+                        Config.RESPONSE_CACHE_TTL
+                    ))
+                except Exception as e:
+                    logger.warning(f"Persistent response cache unavailable, caching in memory only: {e}")
+            self.response_cache = ResponseCache(tiers)
+        
+        self._semaphores = {}  # created on the provider loop, which they belong to
+        # Identical concurrent requests share one provider call
+        self.generation_flights = AsyncSingleFlight('generation')
+        self.embedding_flights = AsyncSingleFlight('embedding')
+    
+    def _semaphore(self, kind):
+        """Process-wide cap on concurrent provider calls of a kind ('generation' or 'embedding')"""
+        semaphore = self._semaphores.get(kind)
+        if semaphore is None:
+            limit = Config.LLM_MAX_CONCURRENCY if kind == 'generation' else Config.EMBEDDING_MAX_CONCURRENCY
+            semaphore = self._semaphores[kind] = asyncio.Semaphore(limit)
+        return semaphore
     
     def generate_response(self, system_prompt, user_message, context=None, max_tokens=1000):
         """
@@ -41,17 +203,126 @@ class LLMService:
         Returns:
             Generated response text
         """
+        return self.providers.run(self.agenerate_response(system_prompt, user_message, context, max_tokens))
+    
+    def generate_responses(self, requests):
+        """
+        Run several independent generations concurrently.
+        
+        Args:
+            requests: List of generate_response keyword-argument dicts
+        
+        Returns:
+            List of response texts, in request order
+        """
+        async def gather():
+            return await asyncio.gather(*(self.agenerate_response(**request) for request in requests))
+        return self.providers.run(gather())
+    
+    async def agenerate_response(self, system_prompt, user_message, context=None, max_tokens=1000):
+        """
+        Async generate_response; must be awaited on the provider loop
+        (providers.loop), which owns the async clients. Response cache reads
+        and writes (SQLite) run in worker threads, so a busy database never
+        stalls the other calls on the loop.
+        """
+        cache_key = self._request_key(system_prompt, user_message, context, max_tokens)
+        if self.response_cache is not None:
+            cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if cached is not None:
+                return cached
+        
+        return await self.generation_flights.do(
+            cache_key, partial(self._agenerate, cache_key, system_prompt, user_message, context, max_tokens)
+        )
+    
+    async def _agenerate(self, cache_key, system_prompt, user_message, context, max_tokens):
+        """Make (and cache) one generation call; shared by identical concurrent requests"""
+        start = time.perf_counter()
         try:
-            if self.provider == 'openai':
-                return self._generate_openai(system_prompt, user_message, context, max_tokens)
-            elif self.provider == 'gemini':
-                return self._generate_gemini(system_prompt, user_message, context, max_tokens)
+            async with self._semaphore('generation'):
+                # Fastest healthy provider first, hedged to the next one if it runs past its p95
+                response = await self.router.acall({
+                    name: partial(generate, system_prompt, user_message, context, max_tokens)
+                    for name, generate in self._generators.items()
+                })
         except Exception as e:
             logger.error(f"LLM generation error: {e}")
             raise
+        
+        if self.response_cache is not None and response:
+            await asyncio.to_thread(self.response_cache.put, cache_key, response,
+                                    generation_seconds=time.perf_counter() - start)
+        return response
     
-    def _generate_openai(self, system_prompt, user_message, context, max_tokens):
-        """Generate response using OpenAI"""
+    def generate_response_stream(self, system_prompt, user_message, context=None, max_tokens=1000):
+        """
+        Generate a response from the LLM, yielding text as it is produced.
+        
+        Args:
+            system_prompt: System prompt defining the AI's role
+            user_message: User's message/question
+            context: Optional context to include
+            max_tokens: Maximum tokens in response
+        
+        Yields:
+            Pieces of the response text, in order (a cached response is yielded whole)
+        """
+        cache_key = self._response_cache_key(system_prompt, user_message, context, max_tokens)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        start = time.perf_counter()
+        parts = []
+        last_error = None
+        # Streams are not hedged, but fail over to the next provider until the first token arrives
+        for name in self.router.order():
+            provider_start = time.monotonic()
+            try:
+                for text in self._streamers[name](system_prompt, user_message, context, max_tokens):
+                    parts.append(text)
+                    yield text
+            except Exception as e:
+                self.router.record(name, error=e)
+                if parts:
+                    logger.error(f"LLM streaming error: {e}")
+                    raise
+                logger.warning(f"LLM streaming error from {name}, failing over: {e}")
+                last_error = e
+                continue
+            self.router.record(name, seconds=time.monotonic() - provider_start)
+            break
+        else:
+            logger.error(f"LLM streaming error: {last_error}")
+            raise last_error
+        
+        # Only complete answers are cached; a consumer that stops early never gets here
+        if cache_key is not None and parts:
+            self.response_cache.put(cache_key, ''.join(parts), generation_seconds=time.perf_counter() - start)
+    
+    def _response_cache_key(self, system_prompt, user_message, context, max_tokens):
+        """Response cache key for a request, or None when caching is off"""
+        if self.response_cache is None:
+            return None
+        return self._request_key(system_prompt, user_message, context, max_tokens)
+    
+    def _request_key(self, system_prompt, user_message, context, max_tokens):
+        """
+        Fingerprint of a generation request (response cache and single-flight key).
+        It is computed before the router picks a provider, so it covers the
+        whole routing pool rather than the provider that answers: a cached
+        answer from any provider in the pool serves the same request, and
+        changing the pool or a model starts a fresh cache.
+        """
+        names = sorted(self._generation_models)
+        return response_cache_key(','.join(names), ','.join(self._generation_models[name] for name in names),
+                                  GENERATION_TEMPERATURE, max_tokens, system_prompt, context, user_message)
+    
+    def _openai_messages(self, system_prompt, user_message, context):
+        """Chat messages for an OpenAI request"""
         messages = [
             {'role': 'system', 'content': system_prompt}
         ]
@@ -62,55 +333,244 @@ class LLMService:
             user_content = user_message
         
         messages.append({'role': 'user', 'content': user_content})
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            max_tokens=max_tokens,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
+        return messages
     
-    def _generate_gemini(self, system_prompt, user_message, context, max_tokens):
-        """Generate response using Gemini"""
+    def _gemini_prompt(self, system_prompt, user_message, context):
+        """Single prompt string for a Gemini request"""
         prompt = f"{system_prompt}\n\n"
         
         if context:
             prompt += f"Context:\n{context}\n\n"
         
         prompt += f"Question: {user_message}"
+        return prompt
+    
+    async def _agenerate_openai(self, system_prompt, user_message, context, max_tokens):
+        """Generate response using OpenAI"""
+        response = await self.providers.async_openai_client().chat.completions.create(
+            model=Config.OPENAI_MODEL,
+            messages=self._openai_messages(system_prompt, user_message, context),
+            max_tokens=max_tokens,
+            temperature=GENERATION_TEMPERATURE
+        )
         
-        response = self.model.generate_content(
-            prompt,
+        return response.choices[0].message.content
+    
+    def _stream_openai(self, system_prompt, user_message, context, max_tokens):
+        """Stream response deltas from OpenAI"""
+        stream = self.client.chat.completions.create(
+            model=Config.OPENAI_MODEL,
+            messages=self._openai_messages(system_prompt, user_message, context),
+            max_tokens=max_tokens,
+            temperature=GENERATION_TEMPERATURE,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Closes the HTTP response if the consumer stops early
+            stream.close()
+    
+    async def _agenerate_gemini(self, system_prompt, user_message, context, max_tokens):
+        """Generate response using Gemini"""
+        response = await self.gemini_model.generate_content_async(
+            self._gemini_prompt(system_prompt, user_message, context),
             generation_config={
                 'max_output_tokens': max_tokens,
-                'temperature': 0.7
+                'temperature': GENERATION_TEMPERATURE
             }
         )
         
         return response.text
     
-    def generate_embeddings(self, texts):
+    def _stream_gemini(self, system_prompt, user_message, context, max_tokens):
+        """Stream response chunks from Gemini"""
+        response = self.gemini_model.generate_content(
+            self._gemini_prompt(system_prompt, user_message, context),
+            generation_config={
+                'max_output_tokens': max_tokens,
+                'temperature': GENERATION_TEMPERATURE
+            },
+            stream=True
+        )
+        for chunk in response:
+            # Chunks without text parts (e.g. a final safety/finish chunk) raise on .text
+            if chunk.parts:
+                yield chunk.text
+    
+    @property
+    def embedding_dim(self):
+        """Dimension of the vectors generate_embeddings returns"""
+        if self.embedding_provider == 'local':
+            return self.local_embedding_model.dim
+        return Config.EMBEDDING_DIM or OPENAI_EMBEDDING_DIMS.get(Config.OPENAI_EMBEDDING_MODEL, 1536)
+    
+    @property
+    def embedding_model_id(self):
+        """Identifies the embedding model (and dimension), so vectors from different models never mix"""
+        if self.embedding_provider == 'local':
+            return self.local_embedding_model.model_id
+        if Config.EMBEDDING_DIM:
+            return f"{Config.OPENAI_EMBEDDING_MODEL}-{Config.EMBEDDING_DIM}"
+        return Config.OPENAI_EMBEDDING_MODEL
+    
+    @property
+    def embeddings_need_fit(self):
+        """Whether the embedding model must be fit on the corpus before use"""
+        return self.embedding_provider == 'local' and not self.local_embedding_model.is_fitted
+    
+    def fit_embeddings(self, texts):
+        """
+        Fit a new local embedding model on corpus texts. The model is not put
+        into use until use_embedding_model() is called, so callers can swap it
+        in together with an index built from its vectors.
+        
+        Returns:
+            Fitted LocalEmbeddingModel, or None for providers that need no fitting
+        """
+        if self.embedding_provider != 'local':
+            return None
+        model = LocalEmbeddingModel(dim=self.local_embedding_model.dim, n_features=self.local_embedding_model.n_features)
+        model.fit(texts, sample_size=Config.LOCAL_EMBEDDING_FIT_SAMPLE)
+        return model
+    
+    def use_embedding_model(self, model):
+        """Put a fitted local embedding model into use"""
+        if self.embedding_provider != 'local':
+            raise ValueError(f"Embedding provider {self.embedding_provider} does not use a local model")
+        self.local_embedding_model = model
+    
+    def generate_embeddings(self, texts, use_cache=True):
         """
         Generate embeddings for texts.
-        Currently only supports OpenAI embeddings.
+        Uses OpenAI embeddings, or the local model when EMBEDDING_PROVIDER=local.
+        Texts already in the embedding cache are not sent to the provider.
+        
+        Args:
+            texts: List of texts to embed
+            use_cache: Read and populate the persistent embedding cache
+        
+        Returns:
+            float32 NumPy array of shape (len(texts), dim), in input order
         """
-        if self.provider == 'openai':
-            response = self.client.embeddings.create(
-                model=Config.OPENAI_EMBEDDING_MODEL,
-                input=texts
-            )
-            return [item.embedding for item in response.data]
-        else:
+        if self.embedding_provider == 'local':
+            return self.local_embedding_model.transform(list(texts))
+        return self.providers.run(self.agenerate_embeddings(texts, use_cache))
+    
+    async def agenerate_embeddings(self, texts, use_cache=True):
+        """
+        Async generate_embeddings; must be awaited on the provider loop
+        (providers.loop). Embedding cache lookups and stores (file locks and
+        mmap I/O) run in worker threads so they never block the loop.
+        """
+        if self.embedding_provider == 'local':
+            return self.local_embedding_model.transform(list(texts))
+        if self.embedding_cache is None or not use_cache:
+            return await self._aembed_texts_once(texts)
+        
+        embeddings = await asyncio.to_thread(self.embedding_cache.get_many, texts)
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(texts[i], []).append(i)
+        
+        if missing:
+            missing_texts = list(missing.keys())
+            new_embeddings = await self._aembed_texts_once(missing_texts)
+            await asyncio.to_thread(self.embedding_cache.put_many, missing_texts, new_embeddings)
+            for text, embedding in zip(missing_texts, new_embeddings):
+                for i in missing[text]:
+                    embeddings[i] = embedding
+            logger.info(f"Embedding cache: {len(texts) - sum(len(v) for v in missing.values())}/{len(texts)} hits")
+        
+        if not embeddings:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(embeddings).astype(np.float32, copy=False)
+    
+    async def _aembed_texts_once(self, texts):
+        """_aembed_texts, shared with any identical request already in flight"""
+        key = request_fingerprint(self.embedding_model_id, *texts)
+        embeddings = await self.embedding_flights.do(key, partial(self._aembed_texts, texts))
+        # Callers may normalize their vectors in place, so each gets its own copy
+        return embeddings.copy()
+    
+    async def _aembed_texts(self, texts):
+        """
+        Call the embedding provider for texts.
+        Inputs are split into batches bounded by item and token count, which
+        run concurrently (at most EMBEDDING_MAX_WORKERS per call, and
+        EMBEDDING_MAX_CONCURRENCY across the process) with retries.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        clients = self._embedding_clients()
+        batches = split_into_batches(
+            texts,
+            max_items=Config.EMBEDDING_BATCH_MAX_ITEMS,
+            max_tokens=Config.EMBEDDING_BATCH_MAX_TOKENS
+        )
+        if len(batches) > 1:
+            logger.info(f"Embedding {len(texts)} texts in {len(batches)} batches")
+        
+        per_call = asyncio.Semaphore(Config.EMBEDDING_MAX_WORKERS)
+        
+        async def embed_batch(batch):
+            start, end = batch
+            async with per_call, self._semaphore('embedding'):
+                return start, await self._aembed_batch_with_retry(clients, texts[start:end])
+        
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+        
+        embeddings = None
+        for start, batch_embeddings in results:
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+        return embeddings
+    
+    def _embedding_clients(self):
+        """Async OpenAI-compatible clients for embeddings, by endpoint name (see embedding_router)"""
+        if self.embedding_router is None:
             # For Gemini, would need to use a different embedding model
-            # For now, fallback to OpenAI embeddings
-            if not Config.OPENAI_API_KEY:
-                raise ValueError("Embeddings require OpenAI API key")
-            client = OpenAI(api_key=Config.OPENAI_API_KEY)
-            response = client.embeddings.create(
+            # For now, embeddings always come from OpenAI
+            raise ValueError("Embeddings require OpenAI API key")
+        # Retries are handled per batch below
+        return {
+            name: self.providers.async_openai_client(base_url).with_options(max_retries=0)
+            for name, base_url in self._embedding_endpoints.items()
+        }
+    
+    async def _aembed_batch_with_retry(self, clients, texts):
+        """
+        Embed one batch, backing off exponentially on rate limits and 5xx errors.
+        Each attempt is routed (and hedged) across the embedding endpoints.
+        """
+        async def request(client):
+            return await client.embeddings.create(
                 model=Config.OPENAI_EMBEDDING_MODEL,
-                input=texts
+                input=texts,
+                # Shortened text-embedding-3 vectors when a dimension is configured
+                extra_body={'dimensions': Config.EMBEDDING_DIM} if Config.EMBEDDING_DIM else None
             )
-            return [item.embedding for item in response.data]
-
+        
+        for attempt in range(Config.EMBEDDING_MAX_RETRIES + 1):
+            try:
+                response = await self.embedding_router.acall({name: partial(request, client) for name, client in clients.items()})
+                data = sorted(response.data, key=lambda item: item.index)
+                return np.array([item.embedding for item in data], dtype=np.float32)
+            except Exception as e:
+                if attempt >= Config.EMBEDDING_MAX_RETRIES or not is_retryable_error(e):
+                    raise
+                delay = Config.EMBEDDING_RETRY_BASE_DELAY * (2 ** attempt)
+                retry_after = getattr(getattr(e, 'response', None), 'headers', {}).get('retry-after')
+                if retry_after:
+                    try:
+                        delay = max(delay, float(retry_after))
+                    except ValueError:
+                        pass
+                delay += random.uniform(0, delay / 2)
+                logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
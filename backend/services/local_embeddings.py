@@ -0,0 +1,191 @@
+"""
+Local Embeddings - Offline CPU embedding model for RAG.
+Texts are hashed into a fixed sparse feature space (word unigrams and
+bigrams), weighted with TF-IDF and projected onto a truncated SVD basis fit
+on the corpus. Needs only NumPy, makes no network calls and is deterministic,
+so it suits air-gapped installs and reproducible benchmarks.
+"""
+import logging
+import hashlib
+import os
+import zlib
+import numpy as np
+from backend.services.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Non-zeros processed per block in sparse products, bounding peak memory
+SPARSE_BLOCK_NNZ = 1 << 20
+SVD_OVERSAMPLES = 10
+SVD_POWER_ITERATIONS = 2
+
+def hash_features(text, n_features, feature_ids=None):
+    """
+    Hashed unigram + bigram counts of a text as {feature: count}.
+    
+    Args:
+        feature_ids: Optional dict memoizing term -> feature across calls
+    """
+    tokens = tokenize(text)
+    if feature_ids is None:
+        feature_ids = {}
+    counts = {}
+    for i, token in enumerate(tokens):
+        for term in (token, f"{tokens[i - 1]} {token}" if i else None):
+            if term is None:
+                continue
+            feature = feature_ids.get(term)
+            if feature is None:
+                feature = feature_ids[term] = zlib.crc32(term.encode('utf-8')) % n_features
+            counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+def _sparse_dot(indptr, indices, data, dense):
+    """(sparse CSR matrix) @ dense, processed in blocks of rows"""
+    n_rows = len(indptr) - 1
+    out = np.zeros((n_rows, dense.shape[1]), dtype=np.float32)
+    row = 0
+    while row < n_rows:
+        end = int(np.searchsorted(indptr, indptr[row] + SPARSE_BLOCK_NNZ, side='right')) - 1
+        end = min(max(end, row + 1), n_rows)
+        lo, hi = indptr[row], indptr[end]
+        if hi > lo:
+            contrib = data[lo:hi, None] * dense[indices[lo:hi]]
+            starts = indptr[row:end] - lo
+            nonempty = indptr[row + 1:end + 1] > indptr[row:end]
+            out[row:end][nonempty] = np.add.reduceat(contrib, starts[nonempty], axis=0)
+        row = end
+    return out
+
+def _transpose(indptr, indices, data, n_cols):
+    """Transpose a CSR matrix (i.e. convert it to CSC)"""
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    t_indptr = np.zeros(n_cols + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_cols), out=t_indptr[1:])
+    return t_indptr, rows[order], data[order]
+
+class LocalEmbeddingModel:
+    """Hashing + TF-IDF + truncated SVD text embedder"""
+    
+    def __init__(self, dim=256, n_features=32768):
+        self.dim = dim
+        self.n_features = n_features
+        self.idf = None  # float32 (n_features,)
+        self.components = None  # float32 (rank, n_features), rank <= dim
+        self.fingerprint = None
+    
+    @property
+    def is_fitted(self):
+        return self.components is not None
+    
+    @property
+    def model_id(self):
+        """Identifies the fitted model, e.g. for cache keys and snapshot checks"""
+        return f"local-{self.n_features}-{self.dim}-{self.fingerprint}"
+    
+    def _term_frequencies(self, texts):
+        """Sublinear term frequencies of hashed features, as CSR arrays"""
+        feature_ids = {}
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            counts = hash_features(text, self.n_features, feature_ids)
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        data = 1.0 + np.log(np.array(data, dtype=np.float32))
+        return np.array(indptr, dtype=np.int64), np.array(indices, dtype=np.int64), data
+    
+    @staticmethod
+    def _weight(indptr, indices, tf, idf):
+        """Apply IDF weights and L2-normalize each row"""
+        data = tf * idf[indices]
+        row_ids = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=data ** 2, minlength=len(indptr) - 1))
+        data /= np.maximum(norms, 1e-12)[row_ids].astype(np.float32)
+        return data
+    
+    def fit(self, texts, sample_size=None, seed=0):
+        """
+        Fit IDF weights and the SVD projection on a corpus.
+        
+        Args:
+            texts: Corpus texts
+            sample_size: Fit on at most this many texts (chosen deterministically)
+            seed: Random seed for sampling and the randomized SVD
+        """
+        rng = np.random.default_rng(seed)
+        texts = list(texts)
+        if sample_size and len(texts) > sample_size:
+            texts = [texts[i] for i in np.sort(rng.choice(len(texts), size=sample_size, replace=False))]
+        if not texts:
+            raise ValueError("Cannot fit local embeddings on an empty corpus")
+        
+        indptr, indices, tf = self._term_frequencies(texts)
+        df = np.bincount(indices, minlength=self.n_features)
+        idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        data = self._weight(indptr, indices, tf, idf)
+        t_indptr, t_indices, t_data = _transpose(indptr, indices, data, self.n_features)
+        
+        # Randomized range finder (Halko et al.) with power iterations
+        rank = max(1, min(self.dim, len(texts), self.n_features))
+        width = min(rank + SVD_OVERSAMPLES, len(texts), self.n_features)
+        omega = rng.standard_normal((self.n_features, width)).astype(np.float32)
+        q, _ = np.linalg.qr(_sparse_dot(indptr, indices, data, omega))
+        for _ in range(SVD_POWER_ITERATIONS):
+            z, _ = np.linalg.qr(_sparse_dot(t_indptr, t_indices, t_data, q))
+            q, _ = np.linalg.qr(_sparse_dot(indptr, indices, data, z))
+        b = _sparse_dot(t_indptr, t_indices, t_data, q).T  # q.T @ X
+        _, _, vt = np.linalg.svd(b, full_matrices=False)
+        
+        self.idf = idf
+        self.components = np.ascontiguousarray(vt[:rank], dtype=np.float32)
+        self.fingerprint = self._fingerprint()
+        logger.info(f"Fit local embedding model on {len(texts)} texts (rank {rank}, dim {self.dim})")
+    
+    def transform(self, texts):
+        """
+        Embed texts with the fitted model.
+        
+        Returns:
+            float32 array of shape (len(texts), dim) with unit-norm rows
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Local embedding model has not been fit")
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return embeddings
+        indptr, indices, tf = self._term_frequencies(texts)
+        data = self._weight(indptr, indices, tf, self.idf)
+        projected = _sparse_dot(indptr, indices, data, np.asarray(self.components).T)
+        embeddings[:, :projected.shape[1]] = projected
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+    
+    def _fingerprint(self):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(np.ascontiguousarray(self.idf).tobytes())
+        digest.update(np.ascontiguousarray(self.components).tobytes())
+        return digest.hexdigest()
+    
+    def save(self, directory):
+        """
+        Write the fitted model as .npy files.
+        
+        Returns:
+            Dict of model state to store in the snapshot manifest
+        """
+        np.save(os.path.join(directory, 'embedding_idf.npy'), self.idf)
+        np.save(os.path.join(directory, 'embedding_components.npy'), self.components)
+        return {'dim': self.dim, 'n_features': self.n_features, 'fingerprint': self.fingerprint}
+    
+    @classmethod
+    def load(cls, directory, state, mmap=True):
+        """Load a model written by save()"""
+        model = cls(dim=state['dim'], n_features=state['n_features'])
+        model.idf = np.load(os.path.join(directory, 'embedding_idf.npy'))
+        model.components = np.load(os.path.join(directory, 'embedding_components.npy'), mmap_mode='r' if mmap else None)
+        model.fingerprint = state['fingerprint']
+        return model
@@ -0,0 +1,150 @@
+"""
+Provider Clients - Process-wide registry of LLM provider clients.
+Every service gets its OpenAI client and Gemini models from here instead of
+building its own, so the process keeps a single keep-alive connection pool
+per provider (sized and timed out from Config) rather than one per service
+or per call. Async clients live on one background event loop owned by the
+registry; synchronous code submits coroutines to it with run().
+"""
+import logging
+import asyncio
+import threading
+import httpx
+from openai import AsyncOpenAI, OpenAI
+import google.generativeai as genai
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_provider_registry():
+    """Return the process-wide provider registry, creating it on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProviderRegistry()
+        return _registry
+
+class ProviderRegistry:
+    """Lazily built, shared and thread-safe provider clients"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._openai_clients = {}  # base URL (None = api.openai.com) -> client
+        self._async_http_client = None
+        self._async_openai_clients = {}
+        self._gemini_configured = False
+        self._gemini_models = {}
+        self._loop = None
+        self._loop_thread = None
+    
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=Config.PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.PROVIDER_MAX_KEEPALIVE,
+            keepalive_expiry=Config.PROVIDER_KEEPALIVE_EXPIRY
+        )
+    
+    def _timeout(self):
+        return httpx.Timeout(Config.PROVIDER_TIMEOUT, connect=Config.PROVIDER_CONNECT_TIMEOUT)
+    
+    def http_client(self):
+        """Pooled keep-alive HTTP client shared by the OpenAI client"""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(limits=self._limits(), timeout=self._timeout())
+            return self._http_client
+    
+    def openai_client(self, base_url=None):
+        """
+        Shared OpenAI client (chat, embeddings and TTS).
+        Per-call settings such as retries should use client.with_options(),
+        which returns a copy on the same connection pool.
+        
+        Args:
+            base_url: Optional OpenAI-compatible endpoint to use instead of api.openai.com
+        """
+        if not Config.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set")
+        http_client = self.http_client()
+        with self._lock:
+            client = self._openai_clients.get(base_url)
+            if client is None:
+                client = self._openai_clients[base_url] = OpenAI(
+                    api_key=Config.OPENAI_API_KEY,
+                    base_url=base_url,
+                    http_client=http_client,
+                    timeout=Config.PROVIDER_TIMEOUT
+                )
+                logger.info(f"Created shared OpenAI client for {base_url or 'api.openai.com'} "
+                            f"(pool of {Config.PROVIDER_MAX_CONNECTIONS} connections)")
+            return client
+    
+    def async_openai_client(self, base_url=None):
+        """
+        Shared AsyncOpenAI client on its own keep-alive pool. Only await it on
+        the registry's event loop (see run()), which its connections belong to.
+        """
+        if not Config.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set")
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+            client = self._async_openai_clients.get(base_url)
+            if client is None:
+                client = self._async_openai_clients[base_url] = AsyncOpenAI(
+                    api_key=Config.OPENAI_API_KEY,
+                    base_url=base_url,
+                    http_client=self._async_http_client,
+                    timeout=Config.PROVIDER_TIMEOUT
+                )
+            return client
+    
+    @property
+    def loop(self):
+        """Background event loop that runs async provider calls, started on first use"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name='provider-loop', daemon=True)
+                self._loop_thread.start()
+            return self._loop
+    
+    def run(self, coroutine, timeout=None):
+        """
+        Run a coroutine on the background loop and wait for its result (the
+        sync wrapper around the async provider API).
+        """
+        loop = self.loop
+        if threading.current_thread() is self._loop_thread:
+            coroutine.close()
+            raise RuntimeError("ProviderRegistry.run() called from the provider loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result(timeout)
+    
+    def gemini_model(self, model_name):
+        """Shared Gemini model handle (the SDK is configured once per process)"""
+        if not Config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY not set")
+        with self._lock:
+            if not self._gemini_configured:
+                genai.configure(api_key=Config.GEMINI_API_KEY)
+                self._gemini_configured = True
+            model = self._gemini_models.get(model_name)
+            if model is None:
+                model = self._gemini_models[model_name] = genai.GenerativeModel(model_name)
+            return model
+    
+    def close(self):
+        """Close pooled connections (clients are rebuilt on next use)"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._openai_clients = {}
+            async_http_client, self._async_http_client = self._async_http_client, None
+            self._async_openai_clients = {}
+        if async_http_client is not None and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(async_http_client.aclose(), self._loop)
@@ -0,0 +1,247 @@
+"""
+Provider Router - Latency-aware routing across interchangeable providers.
+Each call goes to the healthy provider with the lowest observed latency.
+If it has not answered by its own p95 latency, a hedged duplicate is sent
+to the next provider; whichever answers first wins and the other request is
+cancelled; the loser's elapsed time is kept as a censored sample, a lower
+bound on its latency, so hedging does not hide a provider's slow tail from
+its own p95. A provider that fails is failed over immediately, and providers
+that fail repeatedly are taken out of rotation for a cooldown period.
+"""
+import logging
+import asyncio
+import threading
+import time
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Latency samples needed before a provider's percentiles are trusted
+MIN_SAMPLES = 10
+# Weight of the newest outcome in the error rate average
+ERROR_RATE_ALPHA = 0.1
+
+class ProviderStats:
+    """Rolling latency window, error rate and circuit state of one provider"""
+    
+    def __init__(self, name, window=200):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.censored = deque(maxlen=window)  # per latency: True if the call was cancelled first
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.backup_wins = 0
+        self.open_until = 0.0  # circuit open (provider skipped) until this monotonic time
+    
+    def record_success(self, seconds):
+        self.latencies.append(seconds)
+        self.censored.append(False)
+        self.error_rate *= 1 - ERROR_RATE_ALPHA
+        self.consecutive_failures = 0
+        self.calls += 1
+    
+    def record_cancelled(self, seconds):
+        """A call cancelled after seconds (a hedge loser): its latency is only known to be longer"""
+        self.latencies.append(seconds)
+        self.censored.append(True)
+    
+    def record_failure(self, failure_threshold, cooldown_seconds):
+        self.error_rate = self.error_rate * (1 - ERROR_RATE_ALPHA) + ERROR_RATE_ALPHA
+        self.consecutive_failures += 1
+        self.calls += 1
+        self.failures += 1
+        if self.consecutive_failures >= failure_threshold:
+            self.open_until = time.monotonic() + cooldown_seconds
+            logger.warning(f"Provider {self.name} failed {self.consecutive_failures} times in a row, "
+                           f"skipping it for {cooldown_seconds:.0f}s")
+    
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.open_until
+    
+    def percentile(self, q):
+        """
+        Latency percentile in seconds, or None until there are enough samples.
+        Cancelled calls are right-censored, so with any in the window this is a
+        Kaplan-Meier estimate: a cancelled call counts as still running at its
+        cancellation time rather than as finished. When the percentile lies past
+        every completed call, the longest sample is returned as a lower bound.
+        """
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        if not any(self.censored):
+            return float(np.percentile(self.latencies, q))
+        latencies = np.array(self.latencies)
+        censored = np.array(self.censored)
+        # Completions before cancellations at the same time
+        order = np.lexsort((censored, latencies))
+        survival = 1.0
+        at_risk = len(order)
+        for i in order:
+            if not censored[i]:
+                survival *= 1 - 1 / at_risk
+                if 1 - survival >= q / 100 - 1e-9:
+                    return float(latencies[i])
+            at_risk -= 1
+        return float(latencies.max())
+    
+    def expected_latency(self):
+        """Median latency inflated by the error rate (failed calls cost a failover)"""
+        median = self.percentile(50)
+        return None if median is None else median * (1 + 4 * self.error_rate)
+    
+    def to_dict(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            'healthy': self.healthy,
+            'calls': self.calls,
+            'failures': self.failures,
+            'error_rate': round(self.error_rate, 4),
+            'p50_ms': p50 * 1000 if p50 is not None else None,
+            'p95_ms': p95 * 1000 if p95 is not None else None,
+            'backup_wins': self.backup_wins
+        }
+
+class ProviderRouter:
+    """Routes calls to the fastest healthy provider, hedging slow calls and failing over errors"""
+    
+    def __init__(self, names, hedge_default_seconds, hedge_enabled=True, hedge_percentile=95,
+                 hedge_min_seconds=0.2, window=200, failure_threshold=3, cooldown_seconds=30):
+        """
+        Args:
+            names: Provider names, in order of preference while there is no latency data
+            hedge_default_seconds: Hedge delay used until a provider has enough samples
+        """
+        self.names = list(names)
+        self.hedge_default_seconds = hedge_default_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_seconds = hedge_min_seconds
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.providers = {name: ProviderStats(name, window) for name in self.names}
+        self.hedged_calls = 0
+        self._lock = threading.Lock()
+    
+    def order(self):
+        """
+        Providers to try, best first: healthy ones with latency data by
+        expected latency, then healthy ones without data in preference order,
+        then providers whose circuit is open (as a last resort).
+        """
+        with self._lock:
+            def rank(item):
+                position, name = item
+                stats = self.providers[name]
+                expected = stats.expected_latency()
+                return (not stats.healthy, expected is None, expected or 0.0, position)
+            return [name for _, name in sorted(enumerate(self.names), key=rank)]
+    
+    def hedge_delay(self, name):
+        """Seconds to wait on a provider before hedging: its p95 latency, or the default"""
+        with self._lock:
+            latency = self.providers[name].percentile(self.hedge_percentile)
+        if latency is None:
+            return self.hedge_default_seconds
+        return max(self.hedge_min_seconds, latency)
+    
+    def record(self, name, seconds=None, error=None):
+        """Record the outcome of a call made outside acall() (e.g. a stream)"""
+        with self._lock:
+            if error is None:
+                self.providers[name].record_success(seconds)
+            else:
+                self.providers[name].record_failure(self.failure_threshold, self.cooldown_seconds)
+    
+    async def acall(self, calls):
+        """
+        Run a request on the best provider, hedging and failing over as needed.
+        The losing request of a hedge is cancelled.
+        
+        Args:
+            calls: Dict of provider name -> zero-argument coroutine function making the request
+        
+        Returns:
+            Result of the first provider to succeed
+        
+        Raises:
+            The last provider error if every provider failed
+        """
+        order = [name for name in self.order() if name in calls]
+        if not order:
+            raise ValueError("No provider available for this call")
+        if len(order) == 1:
+            return await self._acall_one(order[0], calls[order[0]])
+        
+        pending = {}  # task -> provider name
+        remaining = list(order)
+        last_error = None
+        
+        def launch():
+            name = remaining.pop(0)
+            pending[asyncio.ensure_future(self._acall_one(name, calls[name]))] = name
+            return name
+        
+        primary = launch()
+        hedge_at = time.monotonic() + self.hedge_delay(primary) if self.hedge_enabled else None
+        try:
+            while pending:
+                timeout = None
+                if hedge_at is not None and remaining:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slower than its p95: send a duplicate to the next provider
+                    hedged = launch()
+                    hedge_at = None
+                    with self._lock:
+                        self.hedged_calls += 1
+                    logger.info(f"Hedging slow {primary} call to {hedged}")
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"Provider {name} failed: {e}")
+                        continue
+                    if name != primary:
+                        with self._lock:
+                            self.providers[name].backup_wins += 1
+                    return result
+                # Everything in flight failed: fail over to the next provider right away
+                if not pending and remaining:
+                    launch()
+                    hedge_at = None
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error
+    
+    async def _acall_one(self, name, fn):
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Lost a hedge (or the caller gave up): it would have taken at least this long
+            with self._lock:
+                self.providers[name].record_cancelled(time.monotonic() - start)
+            raise
+        except Exception as e:
+            self.record(name, error=e)
+            raise
+        self.record(name, seconds=time.monotonic() - start)
+        return result
+    
+    def stats(self):
+        order = self.order()
+        with self._lock:
+            return {
+                'order': order,
+                'hedged_calls': self.hedged_calls,
+                'providers': {name: stats.to_dict() for name, stats in self.providers.items()}
+            }
@@ -0,0 +1,105 @@
+"""
+Query Cache - Bounded LRU/TTL cache of query embeddings for RAG search.
+Repeated questions and topics skip the embedding round trip entirely. An
+optional on-disk tier (an EmbeddingCache namespace) shares vectors between
+worker processes.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query):
+    """Cache key form of a query: trimmed, case-folded, single-spaced"""
+    return re.sub(r'\s+', ' ', query.strip()).casefold()
+
+class QueryEmbeddingCache:
+    """In-memory LRU/TTL cache of normalized query -> embedding vector"""
+    
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_cache=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_cache = disk_cache
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._avg_embedding_seconds = 0.0
+        self._entries = OrderedDict()  # normalized query -> (vector, stored_at)
+        self._lock = threading.Lock()
+    
+    def get(self, query):
+        """
+        Look up a query embedding.
+        
+        Returns:
+            float32 vector, or None on a miss
+        """
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vector, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+        
+        if self.disk_cache is not None:
+            vector = self.disk_cache.get_many([key])[0]
+            if vector is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store(key, vector, now)
+                return vector
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, query, vector, embedding_seconds=None):
+        """
+        Store a query embedding.
+        
+        Args:
+            query: Raw query text
+            vector: Embedding of the query text
+            embedding_seconds: How long the provider call took, for savings stats
+        """
+        key = normalize_query(query)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._store(key, vector, time.monotonic())
+            if embedding_seconds is not None:
+                # Exponentially weighted average of the round trip a hit avoids
+                if self._avg_embedding_seconds:
+                    self._avg_embedding_seconds = 0.9 * self._avg_embedding_seconds + 0.1 * embedding_seconds
+                else:
+                    self._avg_embedding_seconds = embedding_seconds
+        if self.disk_cache is not None:
+            self.disk_cache.put_many([key], vector.reshape(1, -1))
+    
+    def _store(self, key, vector, now):
+        self._entries[key] = (vector, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def stats(self):
+        """Hit rate and estimated embedding latency saved"""
+        lookups = self.hits + self.disk_hits + self.misses
+        saved = (self.hits + self.disk_hits) * self._avg_embedding_seconds
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            'avg_embedding_ms': self._avg_embedding_seconds * 1000,
+            'estimated_saved_ms': saved * 1000
+        }
@@ -1,36 +1,202 @@
 """
 RAG Engine - Retrieval Augmented Generation pipeline.
 Handles content ingestion, vectorization, and semantic search.
+Semantic results are fused with an in-process BM25 index, which also serves
+queries on its own when the embedding API misses its deadline.
 """
 import logging
+import copy
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
-import faiss
 import os
-import pickle
 from backend.config import Config
-from backend.services.llm_service import LLMService
-from backend.utils.pdf_extractor import extract_pdf_from_url, extract_text_from_pdf
+from backend.services.llm_service import LLMService, estimate_tokens
+from backend.services.vector_index import VectorIndex
+from backend.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from backend.services.chunk_store import ChunkStore
+from backend.services.index_generation import IndexGeneration, GenerationRegistry
+from backend.services.chunk_dedup import ChunkDeduplicator, DedupStats, merge_citation, drop_citations
+from backend.services.local_embeddings import LocalEmbeddingModel
+from backend.services.index_snapshot import write_snapshot, read_snapshot, latest_snapshot, snapshots_lock
+from backend.services.embedding_cache import get_embedding_cache
+from backend.services.query_cache import QueryEmbeddingCache, normalize_query
+from backend.utils.pdf_extractor import fetch_pdf_bytes, extract_text_from_pdf_bytes
 from backend.utils.youtube_extractor import get_transcript, format_transcript_as_text
 from backend.utils.text_chunker import chunk_with_metadata
-import io
 
 logger = logging.getLogger(__name__)
 
+def make_chunk_id(source_key, position):
+    """
+    Build a stable 63-bit chunk ID from the owning source and the chunk's
+    position within that source. The same source always yields the same IDs,
+    so its vectors can be removed from the index without touching others.
+    """
+    digest = hashlib.blake2b(f"{source_key}:{position}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & 0x7FFFFFFFFFFFFFFF
+
+def source_version(source):
+    """Version marker for a ContentSource, used to detect edits since it was indexed"""
+    return source.updated_at.isoformat() if source.updated_at else None
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+def get_parse_pool():
+    """
+    Process pool that parses PDFs, shared by every ingest in this process, or
+    None when INGEST_PARSE_WORKERS is 0. It is created on first use and kept:
+    spawned workers start a fresh interpreter and re-import the main module,
+    which is too slow to repeat for each ingest.
+    """
+    global _parse_pool
+    if Config.INGEST_PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # Spawned (not forked) workers, as this process runs other threads
+            _parse_pool = ProcessPoolExecutor(max_workers=Config.INGEST_PARSE_WORKERS,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return _parse_pool
+
+def discard_parse_pool(pool):
+    """Drop a broken parse pool so the next ingest starts a new one"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+SOURCE_TYPES = ('pdf_url', 'pdf_file', 'youtube')
+# Filter shorthands that expand to several source types
+SOURCE_TYPE_ALIASES = {'pdf': ('pdf_url', 'pdf_file'), 'video': ('youtube',)}
+
+def env_source_type(source_key):
+    """Source type of an environment-configured source key (None for DB sources)"""
+    if str(source_key).startswith('env:pdf:'):
+        return 'pdf_url'
+    if str(source_key).startswith('env:youtube:'):
+        return 'youtube'
+    return None
+
+def parse_search_filters(filters):
+    """
+    Validate and normalize search filters.
+    
+    Args:
+        filters: None or dict with optional 'source_id' and 'source_type' keys,
+            each a string or a list of strings
+    
+    Returns:
+        None (no filtering) or dict of filter key -> set of allowed values
+    
+    Raises:
+        ValueError: If the filters are malformed
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError('filters must be an object')
+    unknown = set(filters) - {'source_id', 'source_type'}
+    if unknown:
+        raise ValueError(f"Unsupported filter keys: {', '.join(sorted(unknown))}")
+    
+    parsed = {}
+    for key, value in filters.items():
+        values = [value] if isinstance(value, str) else value
+        if not isinstance(values, list) or not all(isinstance(v, str) and v for v in values):
+            raise ValueError(f'{key} filter must be a string or a list of strings')
+        parsed[key] = set(values)
+    
+    if 'source_type' in parsed:
+        types = set()
+        for value in parsed['source_type']:
+            if value in SOURCE_TYPE_ALIASES:
+                types.update(SOURCE_TYPE_ALIASES[value])
+            elif value in SOURCE_TYPES:
+                types.add(value)
+            else:
+                raise ValueError(f'Unknown source_type: {value}')
+        parsed['source_type'] = types
+    return parsed
+
 class RAGEngine:
     """RAG engine for semantic search over ingested content"""
     
-    def __init__(self):
-        self.llm_service = LLMService()
-        self.chunks = []
-        self.index = None
+    def __init__(self, llm_service=None):
+        """
+        Args:
+            llm_service: Shared LLMService (a new one is created if omitted)
+        """
+        self.llm_service = llm_service or LLMService()
+        # Searchable state lives in versioned generations that rebuilds swap atomically
+        self.generations = GenerationRegistry(IndexGeneration(
+            lexical_index=self._new_lexical_index(),
+            dedup=self._new_deduplicator()
+        ))
         self.is_initialized = False
-        self.vector_dim = 1536  # OpenAI embedding dimension
+        self.vector_dim = self.llm_service.embedding_dim
+        self.query_cache = self._create_query_cache()
+        # Only one process writes snapshots; app workers that are not the writer just load them
+        self.is_snapshot_writer = True
+        self._write_lock = threading.RLock()  # serializes publishing of new generations
+        self._rebuild_lock = threading.Lock()  # one full rebuild at a time
+        self._journal = None  # per-source updates made while a rebuild runs
+        self._query_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='rag-query')
     
     def initialize(self):
-        """Initialize RAG engine by ingesting all content sources"""
-        logger.info("Initializing RAG engine...")
+        """
+        Ingest all content sources into a new index generation.
+        The previous generation keeps serving searches until the new one is
+        published, so a rebuild never takes search offline.
         
-        all_chunks = []
+        Returns:
+            Version of the published generation
+        """
+        version = self._rebuild(self._build_generation)
+        logger.info(f"RAG engine initialized successfully (generation {version})")
+        return version
+    
+    def _rebuild(self, build):
+        """
+        Build a generation with build() and publish it. Per-source updates are
+        not blocked while it builds: the ones made meanwhile are journaled and
+        replayed onto the built generation before it is published.
+        """
+        with self._rebuild_lock:
+            with self._write_lock:
+                self._journal = []
+            try:
+                generation = build()
+            except BaseException:
+                with self._write_lock:
+                    self._journal = None
+                raise
+            with self._write_lock:
+                for update in self._journal:
+                    self._replay(generation, update)
+                self._journal = None
+                return self._publish(generation)
+    
+    def _replay(self, generation, update):
+        """Apply a per-source update journaled during a rebuild to the rebuilt generation"""
+        try:
+            if update[0] == 'remove':
+                self._remove_source_from(generation, update[1])
+            else:
+                _, source_key, chunks, version, source_type = update
+                self._add_source_to(generation, source_key, chunks, version, source_type)
+        except Exception as e:
+            logger.error(f"Failed to replay update of source {update[1]} onto the rebuilt index: {e}")
+    
+    def _build_generation(self):
+        """Load, embed and index every content source into a new, unpublished IndexGeneration"""
+        logger.info("Initializing RAG engine...")
         
         # Import here to avoid circular imports
         from flask import current_app
@@ -44,87 +210,557 @@ class RAGEngine:
             logger.warning(f"Could not query database for content sources (may need app context): {e}")
             db_sources = []
         
-        # Also check environment variables for backward compatibility
-        pdf_urls = Config.PDF_URLS if hasattr(Config, 'PDF_URLS') and Config.PDF_URLS else []
-        if not pdf_urls and hasattr(Config, 'PDF_URL') and Config.PDF_URL:
-            pdf_urls = [Config.PDF_URL]
+        # Database sources first (user-uploaded), then environment variable sources (backward compatibility)
+        loaders = {
+            source.id: lambda parse_pool, source=source: self._load_source_chunks(source, parse_pool)
+            for source in db_sources
+        }
+        loaders.update(self._env_source_loaders(db_sources))
+        source_chunks = self._load_sources_parallel(loaders)
         
-        video_urls = Config.YOUTUBE_VIDEOS if hasattr(Config, 'YOUTUBE_VIDEOS') and Config.YOUTUBE_VIDEOS else []
+        all_chunks = {}
+        sources = {}
+        source_versions = {source.id: source_version(source) for source in db_sources if source.id in source_chunks}
+        source_types = {source.id: source.source_type for source in db_sources if source.id in source_chunks}
+        source_types.update((key, env_source_type(key)) for key in source_chunks if env_source_type(key))
+        dedup = self._new_deduplicator()
+        stats = DedupStats()
+        for source_key, chunks in source_chunks.items():
+            sources[source_key] = self._assign_chunk_ids(source_key, chunks)
+            if dedup is None:
+                all_chunks.update((chunk['chunk_id'], chunk) for chunk in chunks)
+                continue
+            # Duplicates of chunks already kept are dropped before embedding
+            unique, duplicates = dedup.deduplicate(chunks)
+            stats.record(unique, duplicates)
+            for chunk, hashes in unique:
+                dedup.add(chunk['chunk_id'], hashes)
+                all_chunks[chunk['chunk_id']] = chunk
+            self._merge_duplicates(unique, duplicates, all_chunks.__getitem__)
+            sources[source_key] = self._source_chunk_ids(sources[source_key], duplicates)
+        ingest_stats = stats.to_dict() if dedup is not None else None
+        if ingest_stats:
+            logger.info(f"Deduplicated chunks: {ingest_stats}")
         
-        # Process database sources first (user-uploaded)
-        for source in db_sources:
-            try:
-                if source.source_type == 'pdf_url':
-                    logger.info(f"Ingesting PDF URL: {source.source_url}")
-                    pdf_pages = extract_pdf_from_url(source.source_url)
-                    for page in pdf_pages:
-                        page_chunks = chunk_with_metadata(
-                            page['text'],
-                            source=f'PDF: {source.title or source.source_url[:50]}',
-                            metadata={'page': page['page'], 'source_id': source.id},
-                            chunk_size=Config.CHUNK_SIZE,
-                            chunk_overlap=Config.CHUNK_OVERLAP
+        if not all_chunks:
+            logger.warning("No content was successfully ingested. RAG engine will be initialized but search will return empty results.")
+            # Publish an empty generation to prevent errors
+            return IndexGeneration(
+                lexical_index=self._new_lexical_index(),
+                sources=sources,
+                source_versions=source_versions,
+                source_types=source_types,
+                dedup=self._new_deduplicator(),
+                ingest_stats=ingest_stats
+            )
+        
+        logger.info(f"Total chunks: {len(all_chunks)}")
+        
+        # Generate embeddings
+        logger.info("Generating embeddings...")
+        chunk_ids = list(all_chunks.keys())
+        texts = [all_chunks[chunk_id]['text'] for chunk_id in chunk_ids]
+        # A local embedding model is refit on the whole corpus on every full rebuild
+        embedding_model = self.llm_service.fit_embeddings(texts)
+        if embedding_model is not None:
+            embeddings = embedding_model.transform(texts)
+        else:
+            embeddings = self._embed_chunks([all_chunks[chunk_id] for chunk_id in chunk_ids])
+        
+        # Build FAISS index
+        logger.info("Building vector index...")
+        index = VectorIndex(embeddings.shape[1])
+        index.add(chunk_ids, embeddings)
+        lexical_index = self._new_lexical_index()
+        lexical_index.add(chunk_ids, texts)
+        chunk_store = ChunkStore()
+        chunk_store.update(all_chunks)
+        
+        generation = IndexGeneration(
+            index=index,
+            lexical_index=lexical_index,
+            chunks=chunk_store,
+            sources=sources,
+            source_versions=source_versions,
+            source_types=source_types,
+            embedding_model=embedding_model,
+            dedup=dedup,
+            ingest_stats=ingest_stats
+        )
+        # Built into the structures' deltas; as bases they are shared by the copies later updates make
+        generation.compact()
+        return generation
+    
+    def _publish(self, generation):
+        """
+        Swap in a fully built generation; searches already running finish on
+        the old one (caller holds the write lock).
+        """
+        if generation.embedding_model is not None and generation.embedding_model is not self.llm_service.local_embedding_model:
+            self._use_embedding_model(generation.embedding_model)
+        version = self.generations.publish(generation)
+        self.is_initialized = True
+        return version
+    
+    def reconcile(self):
+        """
+        Bring the index in line with the ContentSource table (and env sources):
+        ingest sources that are missing or were updated since they were indexed,
+        and drop sources that were deleted. All changes are applied to one copy
+        of the current generation and published together. Requires a Flask app
+        context.
+        
+        Returns:
+            True if the index changed
+        """
+        from backend.models.content import ContentSource
+        
+        db_sources = ContentSource.query.filter_by(is_active=True).all()
+        current = self.generations.current
+        stale = [
+            source for source in db_sources
+            if source.id not in current.sources or current.source_versions.get(source.id) != source_version(source)
+        ]
+        loaders = {
+            source.id: lambda parse_pool, source=source: self._load_source_chunks(source, parse_pool)
+            for source in stale
+        }
+        env_loaders = list(self._env_source_loaders(db_sources))
+        loaders.update((source_key, loader) for source_key, loader in env_loaders if source_key not in current.sources)
+        wanted = {source.id for source in db_sources} | {source_key for source_key, _ in env_loaders}
+        removed = [source_key for source_key in current.sources if source_key not in wanted]
+        # Snapshots from before source types were tracked lack them
+        untyped = {source.id: source.source_type for source in db_sources if source.id not in current.source_types}
+        
+        changed = bool(loaders or removed)
+        if changed or untyped:
+            def build():
+                # Pinned so a concurrent update cannot release it while it is copied
+                with self.generations.pin() as current:
+                    generation = current.copy()
+                for source_key, chunks in self._load_sources_parallel(loaders).items():
+                    source = next((source for source in stale if source.id == source_key), None)
+                    try:
+                        self._assign_chunk_ids(source_key, chunks)
+                        self._add_source_to(
+                            generation, source_key, chunks,
+                            version=source_version(source) if source else None,
+                            source_type=source.source_type if source else None
                         )
-                        all_chunks.extend(page_chunks)
-                    logger.info(f"Ingested {len(pdf_pages)} pages from PDF")
-                
-                elif source.source_type == 'pdf_file':
-                    logger.info(f"Ingesting PDF file: {source.file_path}")
-                    if os.path.exists(source.file_path):
-                        with open(source.file_path, 'rb') as f:
-                            pdf_pages = extract_text_from_pdf(io.BytesIO(f.read()))
-                        for page in pdf_pages:
-                            page_chunks = chunk_with_metadata(
-                                page['text'],
-                                source=f'PDF: {source.title or os.path.basename(source.file_path)}',
-                                metadata={'page': page['page'], 'source_id': source.id},
-                                chunk_size=Config.CHUNK_SIZE,
-                                chunk_overlap=Config.CHUNK_OVERLAP
-                            )
-                            all_chunks.extend(page_chunks)
-                        logger.info(f"Ingested {len(pdf_pages)} pages from PDF file")
-                    else:
-                        logger.warning(f"PDF file not found: {source.file_path}")
+                    except Exception as e:
+                        logger.error(f"Failed to ingest {source_key}: {e}")
+                for source_key in removed:
+                    self._remove_source_from(generation, source_key)
+                for source_key, source_type in untyped.items():
+                    if source_key in generation.sources:
+                        generation.source_types.setdefault(source_key, source_type)
+                return generation
+            self._rebuild(build)
+        else:
+            self.is_initialized = True
+        logger.info(f"Reconciled RAG index with content sources (changed: {changed})")
+        return changed
+    
+    def add_source(self, source):
+        """
+        Ingest a single ContentSource and publish an index generation with its
+        chunks. If the source is already indexed, its chunks are replaced.
+        
+        Args:
+            source: ContentSource model instance
+        
+        Returns:
+            Number of chunks indexed for the source
+        """
+        chunks = self._load_source_chunks(source)
+        return self._index_source_chunks(source.id, chunks, version=source_version(source), source_type=source.source_type)
+    
+    def remove_source(self, source_id):
+        """
+        Publish an index generation without a source's chunks.
+        
+        Args:
+            source_id: ContentSource ID (or env source key)
+        
+        Returns:
+            Number of chunks removed
+        """
+        with self._write_lock:
+            if self._journal is not None:
+                self._journal.append(('remove', source_id))
+            if source_id not in self.generations.current.sources:
+                return 0
+            generation = self.generations.current.copy()
+            removed = self._remove_source_from(generation, source_id)
+            self._publish(generation)
+        return removed
+    
+    def _remove_source_from(self, generation, source_key):
+        """Drop a source's chunks from an unpublished generation"""
+        removed, rewritten = self._plan_source_removal(generation, source_key, generation.sources.get(source_key, []))
+        generation.sources.pop(source_key, None)
+        generation.source_versions.pop(source_key, None)
+        generation.source_types.pop(source_key, None)
+        self._apply_source_removal(generation, removed, rewritten)
+        generation.revision += 1
+        if removed or rewritten:
+            logger.info(f"Removed source {source_key}: {len(removed)} chunks (kept {len(rewritten)} shared with other sources)")
+        return len(removed)
+    
+    def _plan_source_removal(self, generation, source_key, chunk_ids):
+        """
+        Work out what dropping a source's chunks means: chunks only it cites are
+        deleted, merged chunks other sources also cite just lose its citations.
+        
+        Returns:
+            (chunk IDs to delete, dict of chunk_id -> chunk rewritten without the source)
+        """
+        removed = []
+        rewritten = {}
+        for chunk_id in chunk_ids:
+            chunk = generation.chunks.get(chunk_id)
+            if chunk is not None and chunk.get('citations') and drop_citations(chunk, source_key):
+                rewritten[chunk_id] = chunk
+            else:
+                removed.append(chunk_id)
+        return removed, rewritten
+    
+    def _apply_source_removal(self, generation, removed, rewritten):
+        """Delete and rewrite chunks as planned by _plan_source_removal"""
+        if removed and generation.index is not None:
+            generation.index.remove(removed)
+        generation.lexical_index.remove(removed)
+        if generation.dedup is not None:
+            generation.dedup.remove(removed)
+        for chunk_id in removed:
+            generation.chunks.pop(chunk_id, None)
+        generation.chunks.update(rewritten)
+    
+    def _merge_duplicates(self, unique, duplicates, indexed_chunk):
+        """
+        Fold duplicate chunks' citations into the chunks kept in their place.
+        
+        Args:
+            unique: (chunk, hashes) pairs kept from the same batch
+            duplicates: (chunk, canonical_id, kind) from ChunkDeduplicator.deduplicate
+            indexed_chunk: Callable returning an already indexed chunk by ID
+        
+        Returns:
+            Dict of chunk_id -> updated chunk for indexed chunks that gained citations
+        """
+        batch = {chunk['chunk_id']: chunk for chunk, _ in unique}
+        updated = {}
+        for chunk, canonical_id, _ in duplicates:
+            canonical = batch.get(canonical_id) or updated.get(canonical_id)
+            if canonical is None:
+                canonical = updated[canonical_id] = indexed_chunk(canonical_id)
+            merge_citation(canonical, chunk)
+        return updated
+    
+    def _source_chunk_ids(self, chunk_ids, duplicates):
+        """A source's chunk IDs with duplicates replaced by the chunks kept in their place"""
+        canonical_ids = {chunk['chunk_id']: canonical_id for chunk, canonical_id, _ in duplicates}
+        return list(dict.fromkeys(canonical_ids.get(chunk_id, chunk_id) for chunk_id in chunk_ids))
+    
+    def _index_source_chunks(self, source_key, chunks, version=None, source_type=None):
+        """
+        Embed one source's chunks and publish a new generation with them in
+        place of any old ones. The change is applied to a copy of the current
+        generation, so searches never see it half done. If a rebuild is
+        running, the update is also replayed onto the generation it publishes.
+        """
+        self._assign_chunk_ids(source_key, chunks)
+        with self._write_lock:
+            journaled = copy.deepcopy(chunks) if self._journal is not None else None
+            generation = self.generations.current.copy()
+            count = self._add_source_to(generation, source_key, chunks, version, source_type)
+            self._publish(generation)
+            if journaled is not None:
+                self._journal.append(('index', source_key, journaled, version, source_type))
+        return count
+    
+    def _add_source_to(self, generation, source_key, chunks, version=None, source_type=None):
+        """
+        Embed a source's chunks (with IDs assigned) into an unpublished
+        generation, replacing any it already has there. Chunks duplicating ones
+        already indexed are not embedded; their citations are merged into the
+        existing chunks.
+        """
+        chunk_ids = [chunk['chunk_id'] for chunk in chunks]
+        removed, rewritten = self._plan_source_removal(generation, source_key, generation.sources.get(source_key, []))
+        
+        new_chunks = chunks
+        unique = []
+        updated = {}
+        source_ids = chunk_ids
+        if generation.dedup is not None and chunks:
+            # The chunks being replaced don't count as originals
+            unique, duplicates = generation.dedup.deduplicate(chunks, exclude=set(removed))
+            new_chunks = [chunk for chunk, _ in unique]
+            updated = self._merge_duplicates(
+                unique, duplicates, lambda chunk_id: rewritten.get(chunk_id) or generation.chunks[chunk_id]
+            )
+            source_ids = self._source_chunk_ids(chunk_ids, duplicates)
+            if duplicates:
+                stats = DedupStats()
+                stats.record(unique, duplicates)
+                logger.info(f"Deduplicated source {source_key}: {stats.to_dict()}")
+        
+        texts = [chunk['text'] for chunk in new_chunks]
+        embeddings = self._embed_for(generation, new_chunks) if new_chunks else None
+        self._apply_source_removal(generation, removed, rewritten)
+        
+        if new_chunks:
+            new_ids = [chunk['chunk_id'] for chunk in new_chunks]
+            if generation.index is None:
+                generation.index = VectorIndex(embeddings.shape[1])
+            generation.index.add(new_ids, embeddings)
+            generation.lexical_index.add(new_ids, texts)
+            generation.chunks.update(zip(new_ids, new_chunks))
+            for chunk, hashes in unique:
+                generation.dedup.add(chunk['chunk_id'], hashes)
+        generation.chunks.update(updated)
+        generation.sources[source_key] = source_ids
+        generation.source_versions[source_key] = version
+        generation.source_types[source_key] = source_type or env_source_type(source_key)
+        generation.revision += 1
+        
+        logger.info(f"Indexed source {source_key}: {len(new_chunks)} chunks (replaced {len(removed)})")
+        return len(new_chunks)
+    
+    def _embed_for(self, generation, chunks):
+        """
+        Embed chunks being added to a generation, with the generation's own
+        local embedding model if it has one. A local provider's first content
+        fits that model.
+        """
+        if generation.embedding_model is None and self.llm_service.embedding_provider == 'local':
+            generation.embedding_model = self.llm_service.fit_embeddings([chunk['text'] for chunk in chunks])
+        if generation.embedding_model is not None:
+            return generation.embedding_model.transform([chunk['text'] for chunk in chunks])
+        return self._embed_chunks(chunks)
+    
+    def _use_embedding_model(self, embedding_model):
+        """Switch to a newly fit local embedding model (caller holds the write lock)"""
+        self.llm_service.use_embedding_model(embedding_model)
+        self.vector_dim = embedding_model.dim
+        # Cached query vectors came from the previous model
+        self.query_cache = self._create_query_cache()
+    
+    def _create_query_cache(self):
+        """Query embedding cache, with a disk tier shared across workers if enabled"""
+        disk_cache = None
+        # Local query embeddings are cheap to recompute, so they stay in memory only
+        if Config.QUERY_CACHE_SHARED and Config.EMBEDDING_CACHE_ENABLED and self.llm_service.embedding_provider != 'local':
+            try:
+                disk_cache = get_embedding_cache(
+                    Config.EMBEDDING_CACHE_DIR,
+                    f"query-{self.llm_service.embedding_model_id}",
+                    Config.EMBEDDING_CACHE_MAX_MB
+                )
+            except Exception as e:
+                logger.warning(f"Shared query cache unavailable: {e}")
+        return QueryEmbeddingCache(
+            max_entries=Config.QUERY_CACHE_SIZE,
+            ttl_seconds=Config.QUERY_CACHE_TTL,
+            disk_cache=disk_cache
+        )
+    
+    def _new_lexical_index(self):
+        return LexicalIndex(k1=Config.RAG_BM25_K1, b=Config.RAG_BM25_B)
+    
+    def _new_deduplicator(self):
+        """Chunk deduplicator for a new generation, or None when dedup is disabled"""
+        if not Config.DEDUP_ENABLED:
+            return None
+        return ChunkDeduplicator(threshold=Config.DEDUP_SIMILARITY, min_tokens=Config.DEDUP_MIN_TOKENS)
+    
+    @property
+    def corpus_version(self):
+        """Fingerprint of the content currently searchable (see IndexGeneration.corpus_version)"""
+        return self.generations.current.corpus_version()
+    
+    def embed_query(self, query, timeout=None):
+        """
+        Embed a search query, skipping the provider call for recently seen queries.
+        
+        Args:
+            query: Search query text
+            timeout: Seconds to wait for the provider; on expiry FutureTimeoutError
+                is raised and the embedding still lands in the cache when it arrives
+        """
+        vector = self.query_cache.get(query)
+        if vector is None:
+            if timeout is None:
+                return self._fetch_query_embedding(query)
+            vector = self._query_executor.submit(self._fetch_query_embedding, query).result(timeout=timeout)
+        return vector
+    
+    def _fetch_query_embedding(self, query):
+        start = time.perf_counter()
+        # The normalized form is only the cache key; the provider embeds the query as asked
+        vector = self.llm_service.generate_embeddings([query], use_cache=False)[0]
+        self.query_cache.put(query, vector, embedding_seconds=time.perf_counter() - start)
+        return vector
+    
+    def _assign_chunk_ids(self, source_key, chunks):
+        """
+        Attach stable chunk IDs to a source's chunks, along with the owning
+        source key (for citations) and a token count (for context packing).
+        """
+        chunk_ids = []
+        for position, chunk in enumerate(chunks):
+            chunk['chunk_id'] = make_chunk_id(source_key, position)
+            chunk['source_key'] = source_key
+            chunk['token_count'] = estimate_tokens(chunk['text'])
+            chunk_ids.append(chunk['chunk_id'])
+        return chunk_ids
+    
+    def _embed_chunks(self, chunks):
+        """Generate a float32 embedding matrix for a list of chunks"""
+        texts = [chunk['text'] for chunk in chunks]
+        embeddings = self.llm_service.generate_embeddings(texts)
+        return np.array(embeddings).astype('float32')
+    
+    def _load_sources_parallel(self, loaders):
+        """
+        Run source loaders concurrently: downloads on a thread pool, PDF
+        parsing on the shared process pool (see get_parse_pool). A source that fails or runs longer than
+        INGEST_SOURCE_TIMEOUT (counted from when it starts) is logged and
+        skipped without affecting the others.
+        
+        Args:
+            loaders: Dict of source_key -> loader(parse_pool) returning chunks
+        
+        Returns:
+            Dict of source_key -> chunks for the sources that loaded
+        """
+        if not loaders:
+            return {}
+        timeout = Config.INGEST_SOURCE_TIMEOUT
+        started = {}
+        source_chunks = {}
+        
+        def run(source_key, loader, parse_pool):
+            started[source_key] = time.monotonic()
+            return loader(parse_pool)
+        
+        parse_pool = get_parse_pool()
+        fetch_pool = ThreadPoolExecutor(max_workers=max(1, Config.INGEST_FETCH_WORKERS), thread_name_prefix='rag-ingest')
+        try:
+            futures = {fetch_pool.submit(run, source_key, loader, parse_pool): source_key
+                       for source_key, loader in loaders.items()}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source_key = futures[future]
+                    try:
+                        source_chunks[source_key] = future.result()
+                    except Exception as e:
+                        logger.error(f"Failed to ingest {source_key}: {e}")
                 
-                elif source.source_type == 'youtube':
-                    logger.info(f"Ingesting video: {source.source_url}")
-                    transcript, video_id = get_transcript(source.source_url)
-                    transcript_text = format_transcript_as_text(transcript)
-                    
-                    video_chunks = chunk_with_metadata(
-                        transcript_text,
-                        source=f'Video: {source.title or video_id}',
-                        metadata={'video_url': source.source_url, 'video_id': video_id, 'source_id': source.id},
+                now = time.monotonic()
+                for future in list(pending):
+                    source_key = futures[future]
+                    if timeout > 0 and source_key in started and now - started[source_key] > timeout:
+                        logger.error(f"Ingesting {source_key} timed out after {timeout:.0f}s, skipping it")
+                        pending.discard(future)
+        finally:
+            # Timed-out loaders are abandoned; their threads exit when their I/O does
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
+        
+        logger.info(f"Loaded {len(source_chunks)} of {len(loaders)} sources")
+        return source_chunks
+    
+    def _parse_pdf(self, data, parse_pool=None):
+        """Extract PDF pages from bytes, in a worker process when a pool is given"""
+        if parse_pool is None:
+            return extract_text_from_pdf_bytes(data)
+        try:
+            return parse_pool.submit(extract_text_from_pdf_bytes, data).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. on a malformed PDF), which breaks the whole pool
+            discard_parse_pool(parse_pool)
+            raise
+    
+    def _load_source_chunks(self, source, parse_pool=None):
+        """
+        Download and chunk a single ContentSource.
+        
+        Args:
+            source: ContentSource model instance
+            parse_pool: Optional process pool to parse PDFs in
+        
+        Returns:
+            List of chunk dicts for the source
+        """
+        chunks = []
+        if source.source_type == 'pdf_url':
+            logger.info(f"Ingesting PDF URL: {source.source_url}")
+            pdf_pages = self._parse_pdf(fetch_pdf_bytes(source.source_url), parse_pool)
+            for page in pdf_pages:
+                chunks.extend(chunk_with_metadata(
+                    page['text'],
+                    source=f'PDF: {source.title or source.source_url[:50]}',
+                    metadata={'page': page['page'], 'source_id': source.id},
+                    chunk_size=Config.CHUNK_SIZE,
+                    chunk_overlap=Config.CHUNK_OVERLAP
+                ))
+            logger.info(f"Ingested {len(pdf_pages)} pages from PDF")
+        
+        elif source.source_type == 'pdf_file':
+            logger.info(f"Ingesting PDF file: {source.file_path}")
+            if os.path.exists(source.file_path):
+                with open(source.file_path, 'rb') as f:
+                    pdf_pages = self._parse_pdf(f.read(), parse_pool)
+                for page in pdf_pages:
+                    chunks.extend(chunk_with_metadata(
+                        page['text'],
+                        source=f'PDF: {source.title or os.path.basename(source.file_path)}',
+                        metadata={'page': page['page'], 'source_id': source.id},
                         chunk_size=Config.CHUNK_SIZE,
                         chunk_overlap=Config.CHUNK_OVERLAP
-                    )
-                    all_chunks.extend(video_chunks)
-                    logger.info(f"Ingested video {video_id}: {len(video_chunks)} chunks")
-            except Exception as e:
-                logger.error(f"Failed to ingest source {source.id}: {e}")
+                    ))
+                logger.info(f"Ingested {len(pdf_pages)} pages from PDF file")
+            else:
+                logger.warning(f"PDF file not found: {source.file_path}")
+        
+        elif source.source_type == 'youtube':
+            logger.info(f"Ingesting video: {source.source_url}")
+            transcript, video_id = get_transcript(source.source_url)
+            transcript_text = format_transcript_as_text(transcript)
+            
+            chunks = chunk_with_metadata(
+                transcript_text,
+                source=f'Video: {source.title or video_id}',
+                metadata={'video_url': source.source_url, 'video_id': video_id, 'source_id': source.id},
+                chunk_size=Config.CHUNK_SIZE,
+                chunk_overlap=Config.CHUNK_OVERLAP
+            )
+            logger.info(f"Ingested video {video_id}: {len(chunks)} chunks")
+        
+        return chunks
+    
+    def _env_source_loaders(self, db_sources):
+        """
+        Yield (source_key, loader) pairs for sources configured via environment
+        variables (backward compatibility), skipping any already in the database.
+        Loaders take an optional process pool to parse PDFs in.
+        """
+        pdf_urls = Config.PDF_URLS if hasattr(Config, 'PDF_URLS') and Config.PDF_URLS else []
+        if not pdf_urls and hasattr(Config, 'PDF_URL') and Config.PDF_URL:
+            pdf_urls = [Config.PDF_URL]
+        
+        video_urls = Config.YOUTUBE_VIDEOS if hasattr(Config, 'YOUTUBE_VIDEOS') and Config.YOUTUBE_VIDEOS else []
         
-        # Process environment variable sources (backward compatibility)
         for pdf_url in pdf_urls:
             if not pdf_url or not pdf_url.strip():
                 continue
             # Skip if already in database
             if any(s.source_type == 'pdf_url' and s.source_url == pdf_url.strip() for s in db_sources):
                 continue
-            try:
-                logger.info(f"Ingesting PDF from env: {pdf_url}")
-                pdf_pages = extract_pdf_from_url(pdf_url.strip())
-                for page in pdf_pages:
-                    page_chunks = chunk_with_metadata(
-                        page['text'],
-                        source=f'PDF: {pdf_url[:50]}...',
-                        metadata={'page': page['page'], 'pdf_url': pdf_url},
-                        chunk_size=Config.CHUNK_SIZE,
-                        chunk_overlap=Config.CHUNK_OVERLAP
-                    )
-                    all_chunks.extend(page_chunks)
-                logger.info(f"Ingested {len(pdf_pages)} pages from PDF")
-            except Exception as e:
-                logger.error(f"Failed to ingest PDF {pdf_url}: {e}")
+            yield f'env:pdf:{pdf_url.strip()}', lambda parse_pool=None, url=pdf_url: self._load_env_pdf_chunks(url, parse_pool)
         
         for video_url in video_urls:
             if not video_url or not video_url.strip():
@@ -132,57 +768,56 @@ class RAGEngine:
             # Skip if already in database
             if any(s.source_type == 'youtube' and s.source_url == video_url.strip() for s in db_sources):
                 continue
-            try:
-                logger.info(f"Ingesting video from env: {video_url}")
-                transcript, video_id = get_transcript(video_url.strip())
-                transcript_text = format_transcript_as_text(transcript)
-                
-                video_chunks = chunk_with_metadata(
-                    transcript_text,
-                    source=f'Video: {video_id}',
-                    metadata={'video_url': video_url, 'video_id': video_id},
-                    chunk_size=Config.CHUNK_SIZE,
-                    chunk_overlap=Config.CHUNK_OVERLAP
-                )
-                all_chunks.extend(video_chunks)
-                logger.info(f"Ingested video {video_id}: {len(video_chunks)} chunks")
-            except Exception as e:
-                logger.error(f"Failed to ingest video {video_url}: {e}")
-        
-        if not all_chunks:
-            logger.warning("No content was successfully ingested. RAG engine will be initialized but search will return empty results.")
-            # Initialize with empty chunks to prevent errors
-            self.chunks = []
-            self.index = None
-            self.is_initialized = True
-            return
-        
-        self.chunks = all_chunks
-        logger.info(f"Total chunks: {len(self.chunks)}")
-        
-        # Generate embeddings
-        logger.info("Generating embeddings...")
-        texts = [chunk['text'] for chunk in self.chunks]
-        embeddings = self.llm_service.generate_embeddings(texts)
-        
-        # Build FAISS index
-        logger.info("Building vector index...")
-        embeddings_array = np.array(embeddings).astype('float32')
-        
-        # Use L2 distance (Euclidean)
-        self.index = faiss.IndexFlatL2(self.vector_dim)
-        self.index.add(embeddings_array)
+            yield f'env:youtube:{video_url.strip()}', lambda parse_pool=None, url=video_url: self._load_env_video_chunks(url)
+    
+    def _load_env_pdf_chunks(self, pdf_url, parse_pool=None):
+        """Download and chunk a PDF configured via environment variables"""
+        logger.info(f"Ingesting PDF from env: {pdf_url}")
+        chunks = []
+        pdf_pages = self._parse_pdf(fetch_pdf_bytes(pdf_url.strip()), parse_pool)
+        for page in pdf_pages:
+            chunks.extend(chunk_with_metadata(
+                page['text'],
+                source=f'PDF: {pdf_url[:50]}...',
+                metadata={'page': page['page'], 'pdf_url': pdf_url},
+                chunk_size=Config.CHUNK_SIZE,
+                chunk_overlap=Config.CHUNK_OVERLAP
+            ))
+        logger.info(f"Ingested {len(pdf_pages)} pages from PDF")
+        return chunks
+    
+    def _load_env_video_chunks(self, video_url):
+        """Fetch and chunk a YouTube transcript configured via environment variables"""
+        logger.info(f"Ingesting video from env: {video_url}")
+        transcript, video_id = get_transcript(video_url.strip())
+        transcript_text = format_transcript_as_text(transcript)
         
-        self.is_initialized = True
-        logger.info("RAG engine initialized successfully")
+        chunks = chunk_with_metadata(
+            transcript_text,
+            source=f'Video: {video_id}',
+            metadata={'video_url': video_url, 'video_id': video_id},
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP
+        )
+        logger.info(f"Ingested video {video_id}: {len(chunks)} chunks")
+        return chunks
     
-    def search(self, query, top_k=5):
+    def search(self, query, top_k=5, filters=None):
         """
-        Search for relevant chunks using semantic similarity.
+        Search for relevant chunks.
+        In hybrid mode, semantic and BM25 results are fused with reciprocal rank
+        fusion, every result clearing the similarity threshold; if the query
+        embedding misses RAG_EMBEDDING_DEADLINE_MS, the BM25 results are
+        returned on their own. The whole search reads one
+        index generation, even if a rebuild publishes a new one meanwhile.
+        With RAG_VECTOR_SEARCH=range the number of semantic results adapts to
+        how many chunks clear the similarity threshold.
         
         Args:
             query: Search query text
             top_k: Number of results to return
+            filters: Optional {'source_id': ..., 'source_type': ...} restricting
+                the search to matching sources (see parse_search_filters)
         
         Returns:
             List of relevant chunks with similarity scores
@@ -191,56 +826,332 @@ class RAGEngine:
             logger.warning("RAG engine not initialized")
             return []
         
-        # Check if we have any chunks
-        if not self.chunks or self.index is None:
-            logger.warning("No content available for search")
+        with self.generations.pin() as generation:
+            # Check if we have any chunks
+            if not generation.chunks or (generation.index is None and not len(generation.lexical_index)):
+                logger.warning("No content available for search")
+                return []
+            
+            mode = Config.RAG_RETRIEVAL_MODE
+            try:
+                subset = self._filter_chunk_ids(generation, filters)
+                if subset is not None and not subset:
+                    return []
+                if mode == 'lexical' or generation.index is None:
+                    return self._lexical_search(generation, query, top_k, subset)
+                
+                deadline = Config.RAG_EMBEDDING_DEADLINE_MS / 1000 if mode == 'hybrid' and Config.RAG_EMBEDDING_DEADLINE_MS > 0 else None
+                try:
+                    # Generate query embedding (cached for repeated queries)
+                    query_embedding = self.embed_query(query, timeout=deadline)
+                except FutureTimeoutError:
+                    logger.warning(f"Query embedding exceeded {Config.RAG_EMBEDDING_DEADLINE_MS}ms, answering from the lexical index")
+                    return self._lexical_search(generation, query, top_k, subset)
+                query_vector = np.array([query_embedding]).astype('float32')
+                
+                # Search
+                depth = top_k if mode == 'vector' else max(top_k, Config.RAG_FUSION_DEPTH)
+                vector_results = self._vector_search(generation, query_vector, depth, subset)[0]
+                if mode == 'vector':
+                    return vector_results
+                return self._fuse_results(generation, query, query_vector[0], vector_results, top_k, subset)
+            except Exception as e:
+                logger.error(f"Error during RAG search: {e}")
+                return []
+    
+    def search_batch(self, queries, top_k=5, filters=None):
+        """
+        Search for many queries at once.
+        Uncached queries are embedded in one batched call and the index is
+        searched with a single query matrix.
+        
+        Args:
+            queries: List of search query texts
+            top_k: Number of results to return per query
+            filters: Optional source filters applied to every query
+        
+        Returns:
+            List aligned with queries, each a list of chunks with similarity scores
+        """
+        if not queries:
             return []
+        if not self.is_initialized:
+            logger.warning("RAG engine not initialized")
+            return [[] for _ in queries]
         
-        try:
-            # Generate query embedding
-            query_embedding = self.llm_service.generate_embeddings([query])[0]
-            query_vector = np.array([query_embedding]).astype('float32')
-            
-            # Search
-            distances, indices = self.index.search(query_vector, top_k)
+        with self.generations.pin() as generation:
+            if not generation.chunks or (generation.index is None and not len(generation.lexical_index)):
+                logger.warning("No content available for search")
+                return [[] for _ in queries]
             
-            # Format results
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.chunks):
-                    chunk = self.chunks[idx].copy()
-                    # Convert L2 distance to similarity score (lower distance = higher similarity)
-                    similarity = 1 / (1 + distances[0][i])
-                    chunk['similarity'] = float(similarity)
-                    
-                    # Filter by similarity threshold
-                    if similarity >= Config.SIMILARITY_THRESHOLD:
-                        results.append(chunk)
-            
-            return results
-        except Exception as e:
-            logger.error(f"Error during RAG search: {e}")
-            return []
+            mode = Config.RAG_RETRIEVAL_MODE
+            try:
+                subset = self._filter_chunk_ids(generation, filters)
+                if subset is not None and not subset:
+                    return [[] for _ in queries]
+                if mode == 'lexical' or generation.index is None:
+                    return [self._lexical_search(generation, query, top_k, subset) for query in queries]
+                
+                query_vectors = self._embed_queries(queries)
+                depth = top_k if mode == 'vector' else max(top_k, Config.RAG_FUSION_DEPTH)
+                results = self._vector_search(generation, query_vectors, depth, subset)
+                if mode == 'vector':
+                    return results
+                return [self._fuse_results(generation, query, query_vector, vector_results, top_k, subset)
+                        for query, query_vector, vector_results in zip(queries, query_vectors, results)]
+            except Exception as e:
+                logger.error(f"Error during batch RAG search: {e}")
+                return [[] for _ in queries]
+    
+    def _filter_chunk_ids(self, generation, filters):
+        """
+        Chunk IDs allowed by search filters.
+        
+        Returns:
+            None when unfiltered, otherwise a set of chunk IDs (possibly empty)
+        """
+        filters = parse_search_filters(filters)
+        if filters is None:
+            return None
+        source_keys = generation.sources.keys()
+        if 'source_id' in filters:
+            source_keys = filters['source_id']
+        if 'source_type' in filters:
+            source_keys = [key for key in source_keys if generation.source_types.get(key) in filters['source_type']]
+        subset = set()
+        for key in source_keys:
+            subset.update(generation.sources.get(key, []))
+        return subset
+    
+    def _lexical_search(self, generation, query, top_k, subset=None):
+        """BM25-only results, needing no embedding call"""
+        results = []
+        for chunk_id, score in generation.lexical_index.search(query, top_k, subset=subset):
+            if chunk_id not in generation.chunks:
+                continue
+            chunk = generation.chunks[chunk_id]
+            chunk['lexical_score'] = float(score)
+            results.append(chunk)
+        return results
+    
+    def _fuse_results(self, generation, query, query_vector, vector_results, top_k, subset=None):
+        """
+        Merge thresholded semantic results with BM25 results by reciprocal rank
+        fusion. BM25 hits the semantic search did not return are held to the
+        same similarity floor, so keyword overlap alone never brings in an
+        unrelated chunk.
+        """
+        if Config.RAG_VECTOR_SEARCH == 'range':
+            # Keep every semantic match above the threshold, even beyond top_k
+            top_k = max(top_k, len(vector_results))
+        depth = max(top_k, Config.RAG_FUSION_DEPTH)
+        by_id = {chunk['chunk_id']: chunk for chunk in vector_results}
+        lexical_hits, similarities = self._threshold_lexical_hits(
+            generation, query_vector, generation.lexical_index.search(query, depth, subset=subset), by_id
+        )
+        lexical_scores = dict(lexical_hits)
+        
+        fused = reciprocal_rank_fusion(
+            [list(by_id), [chunk_id for chunk_id, _ in lexical_hits]],
+            k=Config.RAG_RRF_K
+        )
+        results = []
+        for chunk_id, score in fused[:top_k]:
+            chunk = by_id.get(chunk_id)
+            if chunk is None:
+                if chunk_id not in generation.chunks:
+                    continue
+                chunk = generation.chunks[chunk_id]
+            if chunk_id in similarities:
+                chunk['similarity'] = similarities[chunk_id]
+            if chunk_id in lexical_scores:
+                chunk['lexical_score'] = float(lexical_scores[chunk_id])
+            chunk['fusion_score'] = score
+            results.append(chunk)
+        return results
     
-    def save_index(self, filepath='backend/data/rag_index.pkl'):
-        """Save the RAG index to disk"""
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'chunks': self.chunks,
-                'index': self.index
-            }, f)
-        logger.info(f"Saved RAG index to {filepath}")
-    
-    def load_index(self, filepath='backend/data/rag_index.pkl'):
-        """Load the RAG index from disk"""
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
-                self.chunks = data['chunks']
-                self.index = data['index']
-                self.is_initialized = True
-            logger.info(f"Loaded RAG index from {filepath}")
+    def _threshold_lexical_hits(self, generation, query_vector, lexical_hits, by_id):
+        """
+        Score BM25 hits missing from the semantic results against the query
+        vector and drop those below the similarity threshold.
+        
+        Returns:
+            (kept lexical hits, dict of chunk_id -> similarity for the kept hits that were scored)
+        """
+        others = [chunk_id for chunk_id, _ in lexical_hits if chunk_id not in by_id]
+        if not others or not np.any(query_vector):
+            # A zero query vector (no known words for a local model) carries no semantic signal
+            return lexical_hits, {}
+        distances = generation.index.distances(query_vector, others)
+        if Config.RAG_VECTOR_SEARCH == 'range':
+            similarities = 1.0 - distances / 2.0
+            threshold = self._range_threshold(generation)
         else:
-            logger.warning(f"Index file not found: {filepath}")
-
+            similarities = 1 / (1 + distances)
+            threshold = Config.SIMILARITY_THRESHOLD
+        scored = {chunk_id: float(similarity) for chunk_id, similarity in zip(others, similarities) if similarity >= threshold}
+        kept = [(chunk_id, score) for chunk_id, score in lexical_hits if chunk_id in by_id or chunk_id in scored]
+        return kept, scored
+    
+    def _range_threshold(self, generation):
+        """Cosine similarity a chunk must reach in range search mode"""
+        return Config.RAG_RANGE_MIN_SIMILARITY or generation.index.calibrated_similarity(
+            Config.RAG_RANGE_CALIBRATION_PERCENTILE
+        )
+    
+    def _embed_queries(self, queries):
+        """Embed several queries, sending only cache misses to the provider in one request"""
+        vectors = [self.query_cache.get(query) for query in queries]
+        # Deduplicate misses by cache key so repeated queries are embedded once (as first written)
+        missing = {}
+        for query, vector in zip(queries, vectors):
+            if vector is None:
+                missing.setdefault(normalize_query(query), query)
+        
+        if missing:
+            start = time.perf_counter()
+            embeddings = self.llm_service.generate_embeddings(list(missing.values()), use_cache=False)
+            per_query_seconds = (time.perf_counter() - start) / len(missing)
+            fresh = {}
+            for (key, query), embedding in zip(missing.items(), embeddings):
+                self.query_cache.put(query, embedding, embedding_seconds=per_query_seconds)
+                fresh[key] = embedding
+            vectors = [fresh[normalize_query(query)] if vector is None else vector
+                       for query, vector in zip(queries, vectors)]
+        
+        return np.array(vectors, dtype=np.float32)
+    
+    def _vector_search(self, generation, query_vectors, depth, subset=None):
+        """
+        Semantic results for each query vector.
+        With RAG_VECTOR_SEARCH=range, every chunk at or above the cosine
+        threshold is returned (at most RAG_RANGE_MAX_RESULTS) instead of a
+        fixed top-k filtered by SIMILARITY_THRESHOLD.
+        """
+        if Config.RAG_VECTOR_SEARCH == 'range':
+            threshold = self._range_threshold(generation)
+            matches = generation.index.range_search(query_vectors, threshold, Config.RAG_RANGE_MAX_RESULTS, subset=subset)
+            return [self._format_range_results(generation, similarities, ids) for similarities, ids in matches]
+        distances, ids = generation.index.search(query_vectors, depth, subset=subset)
+        return [self._format_results(generation, distances[row], ids[row]) for row in range(len(query_vectors))]
+    
+    def _format_range_results(self, generation, similarities, ids):
+        """Turn one query's range search matches into chunk results"""
+        results = []
+        for similarity, chunk_id in zip(similarities, ids):
+            if chunk_id not in generation.chunks:
+                continue
+            chunk = generation.chunks[chunk_id]
+            chunk['similarity'] = float(similarity)
+            results.append(chunk)
+        return results
+    
+    def _format_results(self, generation, distances, ids):
+        """Turn one row of index search output into thresholded chunk results"""
+        results = []
+        for i, chunk_id in enumerate(ids):
+            if chunk_id < 0 or chunk_id not in generation.chunks:
+                continue
+            # Convert L2 distance to similarity score (lower distance = higher similarity)
+            similarity = 1 / (1 + distances[i])
+            
+            # Filter by similarity threshold
+            if similarity >= Config.SIMILARITY_THRESHOLD:
+                # Chunk dicts are built from the store per hit, so they can be annotated in place
+                chunk = generation.chunks[chunk_id]
+                chunk['similarity'] = float(similarity)
+                results.append(chunk)
+        return results
+    
+    def save_index(self, snapshot_dir=None):
+        """
+        Save the RAG index as a new on-disk snapshot.
+        Published generations are never modified, so the snapshot is written
+        from the pinned generation without blocking searches or updates.
+        Does nothing in a process that is not the snapshot writer.
+        
+        Returns:
+            Path of the snapshot directory, or None if not saved
+        """
+        if not self.is_snapshot_writer:
+            logger.debug("Not the snapshot writer, skipping snapshot")
+            return None
+        with self.generations.pin() as generation:
+            return write_snapshot(
+                generation.index,
+                generation.chunks,
+                generation.sources,
+                root=snapshot_dir,
+                metadata={
+                    'vector_dim': self.vector_dim,
+                    'embedding': {
+                        'provider': self.llm_service.embedding_provider,
+                        'model_id': self.llm_service.embedding_model_id
+                    },
+                    'generation': generation.version,
+                    'source_versions': generation.source_versions,
+                    'source_types': generation.source_types
+                },
+                lexical_index=generation.lexical_index,
+                embedding_model=generation.embedding_model,
+                dedup=generation.dedup
+            )
+    
+    def load_index(self, snapshot_path=None):
+        """
+        Load the RAG index from a snapshot (the latest one by default).
+        The index and vectors are memory-mapped and chunk metadata is read
+        lazily, so loading is cheap and processes share page-cache pages.
+        The snapshot is published as a new generation.
+        
+        Returns:
+            True if a snapshot was loaded
+        """
+        snapshot_path = snapshot_path or latest_snapshot()
+        if not snapshot_path:
+            logger.warning("No RAG index snapshot found")
+            return False
+        
+        # Held shared so the writer cannot prune the snapshot while it is opened
+        with snapshots_lock(os.path.dirname(snapshot_path)).shared():
+            index, lexical_index, chunks, sources, dedup, manifest = read_snapshot(snapshot_path)
+            embedding = manifest.get('embedding') or {'provider': 'openai', 'model_id': Config.OPENAI_EMBEDDING_MODEL}
+            if embedding['provider'] != self.llm_service.embedding_provider:
+                raise ValueError(f"Snapshot was built with {embedding['provider']} embeddings, "
+                                 f"but EMBEDDING_PROVIDER is {self.llm_service.embedding_provider}")
+            embedding_model = None
+            if embedding['provider'] == 'local':
+                if manifest.get('embedding_model') is None:
+                    raise ValueError("Snapshot has no local embedding model")
+                embedding_model = LocalEmbeddingModel.load(snapshot_path, manifest['embedding_model'])
+            elif embedding['model_id'] != self.llm_service.embedding_model_id:
+                raise ValueError(f"Snapshot was built with embedding model {embedding['model_id']}, "
+                                 f"not {self.llm_service.embedding_model_id}")
+        
+        if lexical_index is None:
+            logger.info("Snapshot has no lexical index, rebuilding it from chunk texts")
+            lexical_index = self._new_lexical_index()
+            chunk_ids = list(chunks)
+            lexical_index.add(chunk_ids, [chunks.text(chunk_id) for chunk_id in chunk_ids])
+        if dedup is None and Config.DEDUP_ENABLED:
+            logger.info("Snapshot has no dedup fingerprints, rebuilding them from chunk texts")
+            dedup = self._new_deduplicator()
+            for chunk_id in chunks:
+                dedup.add(chunk_id, dedup.fingerprint(chunks.text(chunk_id)))
+        elif not Config.DEDUP_ENABLED:
+            dedup = None
+        generation = IndexGeneration(
+            index=index,
+            lexical_index=lexical_index,
+            chunks=chunks,
+            sources=sources,
+            # Source keys (ContentSource UUIDs and env keys) are strings, so they round-trip through JSON as is
+            source_versions=manifest.get('source_versions', {}),
+            source_types=manifest.get('source_types', {}) or {key: env_source_type(key) for key in sources if env_source_type(key)},
+            embedding_model=embedding_model,
+            dedup=dedup
+        )
+        with self._write_lock:
+            self._publish(generation)
+        logger.info(f"Loaded RAG index from {snapshot_path}")
+        return True
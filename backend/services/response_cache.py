@@ -0,0 +1,198 @@
+"""
+Response Cache - Exact-match cache of LLM responses.
+Responses are keyed by a hash of everything that determines them (provider,
+model, temperature, max_tokens and the full prompt), so repeated questions,
+topics and video scripts are answered without a provider call. Lookups go
+through an in-memory LRU tier first and a persistent SQLite tier second;
+both expire entries after a TTL and evict the least recently used ones when
+they are full.
+"""
+import logging
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def response_cache_key(provider, model, temperature, max_tokens, system_prompt, context, user_message):
+    """Content address of a generation request"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (provider, model, repr(float(temperature)), str(max_tokens), system_prompt, context or '', user_message):
+        encoded = part.encode('utf-8')
+        # Length-prefix each part so different splits of the same text never collide
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+class MemoryResponseTier:
+    """In-process LRU/TTL tier; tiers return (response, stored_at) from get()"""
+    
+    name = 'memory'
+    
+    def __init__(self, max_entries=1024, ttl_seconds=86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (response, stored_at), least recently used first
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, stored_at = entry
+            if self.ttl_seconds and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, response, stored_at=None):
+        with self._lock:
+            self._entries[key] = (response, stored_at or time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        return {'entries': len(self._entries)}
+
+class SQLiteResponseTier:
+    """Persistent tier in a SQLite file, shared by worker processes"""
+    
+    name = 'sqlite'
+    
+    def __init__(self, path, max_mb=256, ttl_seconds=86400):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self._conn.commit()
+    
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return response, created_at
+    
+    def put(self, key, response, stored_at=None):
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, response, size, stored_at or now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+    
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until under max_bytes (caller holds the lock)"""
+        if self.ttl_seconds:
+            self._conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,))
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+    
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {'entries': entries, 'bytes': size}
+
+class ResponseCache:
+    """Tiered LLM response cache; a hit in a slower tier is copied into the faster ones"""
+    
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self.hits = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+        self._avg_generation_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Look up a cached response.
+        
+        Returns:
+            Response text, or None on a miss
+        """
+        for level, tier in enumerate(self.tiers):
+            try:
+                entry = tier.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache {tier.name} lookup failed: {e}")
+                continue
+            if entry is None:
+                continue
+            response, stored_at = entry
+            # Keep the original store time so promoted entries still expire on schedule
+            for faster in self.tiers[:level]:
+                faster.put(key, response, stored_at=stored_at)
+            with self._lock:
+                self.hits[tier.name] += 1
+            return response
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key, response, generation_seconds=None):
+        """Store a response in every tier"""
+        for tier in self.tiers:
+            try:
+                tier.put(key, response)
+            except Exception as e:
+                logger.warning(f"Response cache {tier.name} store failed: {e}")
+        if generation_seconds is not None:
+            with self._lock:
+                # Exponentially weighted average of the provider call a hit avoids
+                if self._avg_generation_seconds:
+                    self._avg_generation_seconds = 0.9 * self._avg_generation_seconds + 0.1 * generation_seconds
+                else:
+                    self._avg_generation_seconds = generation_seconds
+    
+    def stats(self):
+        """Hit rate per tier and estimated generation time saved"""
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            'tiers': {tier.name: tier.stats() for tier in self.tiers},
+            'hits': dict(self.hits),
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'avg_generation_ms': self._avg_generation_seconds * 1000,
+            'estimated_saved_ms': hits * self._avg_generation_seconds * 1000
+        }
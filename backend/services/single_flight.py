@@ -0,0 +1,130 @@
+"""
+Single Flight - Coalescing of identical in-flight provider calls.
+When the same request (by fingerprint) is already running, later callers
+wait for its result instead of issuing their own call, so a burst of
+students opening the same topic costs one LLM, embedding or TTS request.
+Errors are shared too: every waiter of a failed call gets its exception.
+"""
+import logging
+import asyncio
+import hashlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+def request_fingerprint(*parts):
+    """Content address of a request made of string parts"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        encoded = str(part).encode('utf-8')
+        # Length-prefix each part so different splits of the same text never collide
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+class _Call:
+    """A call in flight on another thread"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesces identical concurrent calls from threads"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> _Call
+    
+    def do(self, key, fn):
+        """
+        Run fn() unless a call with this key is already in flight, in which
+        case wait for that call and return its result (or raise its error).
+        
+        Args:
+            key: Request fingerprint
+            fn: Zero-argument callable making the request
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+            else:
+                self.shared += 1
+        
+        if not leader:
+            logger.debug(f"{self.name}: joining in-flight call {key[:12]}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'shared': self.shared,
+                'in_flight': len(self._in_flight)
+            }
+
+class AsyncSingleFlight:
+    """
+    Coalesces identical concurrent calls on one event loop. The shared call
+    runs as its own task, so a waiter being cancelled does not cancel it for
+    the others.
+    """
+    
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}  # key -> task
+    
+    async def do(self, key, fn):
+        """
+        Await fn() unless a call with this key is already in flight, in which
+        case await that call's result (or error) instead.
+        
+        Args:
+            key: Request fingerprint
+            fn: Zero-argument coroutine function making the request
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+            logger.debug(f"{self.name}: joining in-flight call {key[:12]}")
+        return await asyncio.shield(task)
+    
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an error nobody awaited is not logged as lost
+    
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'shared': self.shared,
+            'in_flight': len(self._in_flight)
+        }
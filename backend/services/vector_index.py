@@ -0,0 +1,776 @@
+"""
+Vector Index - ID-addressable FAISS index with pluggable index types.
+Supports exact (Flat), inverted-file (IVF) and graph (HNSW) search, with
+automatic selection based on the number of indexed vectors, and optional
+compressed storage (SQ8 / float16 / PQ) with exact re-ranking.
+"""
+import logging
+import math
+import os
+import tempfile
+import numpy as np
+import faiss
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'ivf', 'hnsw')
+COMPRESSIONS = ('none', 'sq8', 'fp16', 'pq')
+
+# IVF needs roughly this many training points per list for stable centroids
+IVF_MIN_POINTS_PER_LIST = 39
+IVF_MAX_TRAINING_POINTS_PER_LIST = 256
+
+# 8-bit PQ codebooks have 256 centroids per sub-quantizer
+PQ_NBITS = 8
+PQ_MIN_TRAINING_POINTS = 39 * (1 << PQ_NBITS)
+QUANTIZER_MAX_TRAINING_POINTS = 256 * (1 << PQ_NBITS)
+
+# Vectors sampled when calibrating the range search similarity threshold
+CALIBRATION_SAMPLE = 1000
+
+def normalize_rows(vectors):
+    """Scale rows to unit length (zero rows are left as they are)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def resolve_index_type(index_type, count):
+    """
+    Pick the concrete index type for a corpus size.
+    
+    Args:
+        index_type: 'flat', 'ivf', 'hnsw' or 'auto'
+        count: Number of vectors to be indexed
+    
+    Returns:
+        Concrete index type name
+    """
+    if index_type == 'auto':
+        if count <= Config.RAG_AUTO_FLAT_MAX:
+            return 'flat'
+        if count <= Config.RAG_AUTO_HNSW_MAX:
+            return 'hnsw'
+        return 'ivf'
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    return index_type
+
+def resolve_compression(compression, count):
+    """
+    Pick the effective vector compression for a corpus size.
+    PQ codebooks need a few thousand training vectors; smaller corpora stay
+    uncompressed, where the memory saving would be negligible anyway.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported index compression: {compression}")
+    if compression == 'pq' and count < PQ_MIN_TRAINING_POINTS:
+        return 'none'
+    return compression
+
+def pq_subquantizers(dim, target):
+    """Largest number of PQ sub-quantizers <= target that evenly divides dim"""
+    for m in range(max(1, min(target, dim)), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+class VectorIndex:
+    """
+    FAISS index keyed by 64-bit chunk IDs, backed by the raw vectors for rebuilds.
+    Vectors are stored in FAISS under internal labels, so an ID that is removed
+    and re-added never collides with a stale entry left in an HNSW graph.
+    Vectors are normalized to unit length, so squared L2 distance d and cosine
+    similarity s are interchangeable (d = 2 - 2s).
+    Once copied (or when memory-mapped from a snapshot) the FAISS index, raw
+    vectors and ID maps form a read-only base shared with other copies; later
+    changes go to a small delta of exactly searched vectors and a set of
+    hidden base IDs, until compact() folds them into a private base.
+    """
+    
+    def __init__(self, dim, index_type=None, **params):
+        self.dim = dim
+        self.index_type = index_type or Config.RAG_INDEX_TYPE
+        self.params = {
+            'nlist': Config.RAG_IVF_NLIST,
+            'nprobe': Config.RAG_IVF_NPROBE,
+            'hnsw_m': Config.RAG_HNSW_M,
+            'ef_construction': Config.RAG_HNSW_EF_CONSTRUCTION,
+            'ef_search': Config.RAG_HNSW_EF_SEARCH,
+            'compression': Config.RAG_INDEX_COMPRESSION,
+            'pq_m': Config.RAG_PQ_M,
+            'rerank_factor': Config.RAG_RERANK_FACTOR
+        }
+        self.params.update(params)
+        self.index = None
+        self.active_type = None
+        self.active_compression = None
+        self._trained_size = 0
+        self._labels = {}  # chunk_id -> FAISS label
+        self._label_ids = {}  # FAISS label -> chunk_id
+        self._next_label = 0
+        self._tombstones = 0  # removed labels still present in an HNSW graph
+        # Raw vectors, kept compact by moving the last row into removed slots. With
+        # compression they live in a disk-backed map (see _allocate_vectors).
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._count = 0
+        self._rows = {}  # chunk_id -> row
+        self._mapped_index_path = None  # set while serving a read-only, memory-mapped snapshot
+        self._calibration = None  # (percentile, vector count, similarity) of the last calibration
+        self._shared = False  # base shared with a copy, so changes go to the delta
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta_vectors = np.zeros((0, dim), dtype=np.float32)
+        self._delta_rows = {}  # chunk_id -> row in the delta
+        self._hidden = set()  # base IDs removed (or replaced by the delta) since the base was shared
+    
+    def __len__(self):
+        return self._count - len(self._hidden) + len(self._delta_ids)
+    
+    def __contains__(self, chunk_id):
+        return chunk_id in self._delta_rows or (chunk_id in self._rows and chunk_id not in self._hidden)
+    
+    @property
+    def vectors(self):
+        """Raw vectors of the base IDs, row-aligned with ids"""
+        return self._vectors[:self._count]
+    
+    @property
+    def ids(self):
+        return self._ids[:self._count]
+    
+    def _base_is_shared(self):
+        """Whether the base is read-only: shared with a copy or mapped from a snapshot"""
+        return self._shared or self._mapped_index_path is not None
+    
+    def add(self, ids, vectors):
+        """
+        Add vectors under the given IDs. Existing IDs are replaced.
+        
+        Args:
+            ids: Sequence of int64 chunk IDs
+            vectors: float32 array of shape (len(ids), dim)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(normalize_rows(np.asarray(vectors, dtype=np.float32)), dtype=np.float32)
+        if self._base_is_shared():
+            self._add_to_delta(ids, vectors)
+            return
+        replaced = [int(i) for i in ids if int(i) in self._rows]
+        if replaced:
+            self.remove(replaced)
+        
+        self._reserve(self._count + len(ids))
+        start = self._count
+        self._vectors[start:start + len(ids)] = vectors
+        self._ids[start:start + len(ids)] = ids
+        for offset, chunk_id in enumerate(ids):
+            self._rows[int(chunk_id)] = start + offset
+        self._count += len(ids)
+        
+        if self._needs_rebuild():
+            self.rebuild()
+        else:
+            self.index.add_with_ids(vectors, self._assign_labels(ids))
+    
+    def remove(self, ids):
+        """Remove vectors by ID; unknown IDs are ignored"""
+        ids = [int(i) for i in ids if int(i) in self]
+        if not ids:
+            return
+        if self._base_is_shared():
+            self._remove_from_delta([chunk_id for chunk_id in ids if chunk_id in self._delta_rows])
+            self._hidden.update(chunk_id for chunk_id in ids if chunk_id in self._rows)
+            self._compact_if_large()
+            return
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id)
+            last = self._count - 1
+            if row != last:
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = self._ids[last]
+                self._rows[int(self._ids[row])] = row
+            self._count -= 1
+        
+        labels = [self._labels.pop(chunk_id) for chunk_id in ids if chunk_id in self._labels]
+        for label in labels:
+            del self._label_ids[label]
+        if self.index is None or not labels:
+            return
+        if self.active_type == 'hnsw':
+            # HNSW graphs cannot drop nodes; hide them until the next rebuild
+            self._tombstones += len(labels)
+            if self._tombstones > 0.1 * self.index.ntotal:
+                self.rebuild()
+        else:
+            self.index.remove_ids(np.array(labels, dtype=np.int64))
+    
+    def _add_to_delta(self, ids, vectors):
+        """Add normalized vectors to the delta, hiding the base entries they replace"""
+        self._remove_from_delta([int(chunk_id) for chunk_id in ids if int(chunk_id) in self._delta_rows])
+        self._hidden.update(int(chunk_id) for chunk_id in ids if int(chunk_id) in self._rows)
+        start = len(self._delta_ids)
+        self._delta_ids = np.concatenate([self._delta_ids, ids])
+        self._delta_vectors = np.concatenate([self._delta_vectors, vectors])
+        for offset, chunk_id in enumerate(ids):
+            self._delta_rows[int(chunk_id)] = start + offset
+        self._compact_if_large()
+    
+    def _remove_from_delta(self, ids):
+        if not ids:
+            return
+        keep = np.ones(len(self._delta_ids), dtype=bool)
+        keep[[self._delta_rows[chunk_id] for chunk_id in ids]] = False
+        self._delta_ids = self._delta_ids[keep]
+        self._delta_vectors = self._delta_vectors[keep]
+        self._delta_rows = {int(chunk_id): row for row, chunk_id in enumerate(self._delta_ids)}
+    
+    def _compact_if_large(self):
+        """Fold the delta into the base once it outgrows its share of it (RAG_DELTA_MAX_FRACTION)"""
+        delta = len(self._delta_ids) + len(self._hidden)
+        if delta > max(Config.RAG_DELTA_MIN_ROWS, Config.RAG_DELTA_MAX_FRACTION * self._count):
+            self.compact()
+    
+    def compact(self):
+        """
+        Fold the delta and hidden IDs into a private copy of the base, which
+        later changes then modify in place. Only for an index no reader
+        shares, e.g. one in an unpublished generation.
+        """
+        if len(self._delta_ids) or self._hidden:
+            self._fold_delta()
+    
+    def _fold_delta(self):
+        delta_ids, delta_vectors, hidden = self._delta_ids, self._delta_vectors, self._hidden
+        self._own_base()
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta_vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._delta_rows = {}
+        self._hidden = set()
+        self.remove(hidden)
+        self.add(delta_ids, delta_vectors)
+        if len(delta_ids) or hidden:
+            logger.info(f"Folded {len(delta_ids)} added and {len(hidden)} removed vectors into the vector index")
+    
+    def _own_base(self):
+        """Copy a base shared with other copies (or mapped from a snapshot) into private memory"""
+        index_path = self._mapped_index_path
+        self._labels = dict(self._labels)
+        self._label_ids = dict(self._label_ids)
+        self._rows = dict(self._rows)
+        self._own_vectors()
+        self._mapped_index_path = None
+        self._shared = False
+        if index_path is not None:
+            try:
+                self.index = faiss.read_index(index_path)
+            except Exception as e:
+                # The snapshot may have been pruned since it was mapped
+                logger.warning(f"Could not reload snapshot index for writing ({e}), rebuilding")
+                self.rebuild()
+        elif self.index is not None:
+            try:
+                self.index = faiss.clone_index(self.index)
+            except RuntimeError:
+                # Not every index type supports cloning; a serialization round trip always works
+                self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+    
+    def save(self, directory):
+        """
+        Write the index natively plus its raw vectors as .npy files.
+        
+        Returns:
+            Dict of index state to store in the snapshot manifest
+        """
+        if len(self._delta_ids) or self._hidden:
+            # Snapshots hold a single merged index; folding a copy leaves this one untouched for its readers
+            merged = self.copy()
+            merged.compact()
+            return merged.save(directory)
+        np.save(os.path.join(directory, 'vector_ids.npy'), self.ids)
+        np.save(os.path.join(directory, 'vectors.npy'), self.vectors)
+        labels = np.array([self._labels.get(int(chunk_id), -1) for chunk_id in self.ids], dtype=np.int64)
+        np.save(os.path.join(directory, 'labels.npy'), labels)
+        if self.index is not None:
+            faiss.write_index(self.index, os.path.join(directory, 'index.faiss'))
+        return {
+            'dim': self.dim,
+            'index_type': self.index_type,
+            'params': self.params,
+            'active_type': self.active_type,
+            'active_compression': self.active_compression,
+            'trained_size': self._trained_size,
+            'next_label': self._next_label,
+            'tombstones': self._tombstones,
+            'has_index': self.index is not None
+        }
+    
+    @classmethod
+    def load(cls, directory, state, mmap=True):
+        """
+        Load an index written by save(). With mmap, the FAISS index and raw
+        vectors are memory-mapped read-only, so processes loading the same
+        snapshot share page-cache pages; they are copied on first write.
+        """
+        vector_index = cls(state['dim'], index_type=state['index_type'], **state['params'])
+        mmap_mode = 'r' if mmap else None
+        vector_index._ids = np.load(os.path.join(directory, 'vector_ids.npy'), mmap_mode=mmap_mode)
+        vector_index._vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode=mmap_mode)
+        labels = np.load(os.path.join(directory, 'labels.npy'))
+        vector_index._count = len(vector_index._ids)
+        
+        ids = vector_index._ids.tolist()
+        vector_index._rows = dict(zip(ids, range(len(ids))))
+        live = labels >= 0
+        live_ids = np.asarray(vector_index._ids)[live].tolist()
+        live_labels = labels[live].tolist()
+        vector_index._labels = dict(zip(live_ids, live_labels))
+        vector_index._label_ids = dict(zip(live_labels, live_ids))
+        
+        vector_index.active_type = state['active_type']
+        vector_index.active_compression = state['active_compression']
+        vector_index._trained_size = state['trained_size']
+        vector_index._next_label = state['next_label']
+        vector_index._tombstones = state['tombstones']
+        if state['has_index']:
+            index_path = os.path.join(directory, 'index.faiss')
+            if mmap:
+                vector_index.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                vector_index._mapped_index_path = index_path
+            else:
+                vector_index.index = faiss.read_index(index_path)
+        return vector_index
+    
+    def copy(self):
+        """
+        Independent copy, for copy-on-write updates, made in time proportional
+        to the delta rather than the index: both copies share the base
+        read-only from then on, and each sends its changes to its own delta.
+        """
+        clone = VectorIndex.__new__(VectorIndex)
+        clone.__dict__.update(self.__dict__)
+        clone.params = dict(self.params)
+        clone._delta_ids = self._delta_ids.copy()
+        clone._delta_vectors = self._delta_vectors.copy()
+        clone._delta_rows = dict(self._delta_rows)
+        clone._hidden = set(self._hidden)
+        self._shared = clone._shared = True
+        return clone
+    
+    @property
+    def raw_vectors_on_disk(self):
+        """
+        Whether the raw vectors are file-backed rather than held in RAM: compressed
+        indexes keep them in a temporary memory-mapped file (only the rows that
+        re-ranking touches get paged in), and snapshots map them from disk.
+        """
+        return self.params['compression'] != 'none' or self._mapped_index_path is not None
+    
+    def _allocate_vectors(self, capacity):
+        """Zeroed raw vector buffer: a temporary memory-mapped file for compressed indexes, else RAM"""
+        if self.params['compression'] == 'none' or not capacity:
+            return np.zeros((capacity, self.dim), dtype=np.float32)
+        # The file is unlinked at once and disappears with the last reference to the map
+        spill = tempfile.TemporaryFile(dir=Config.RAG_RAW_VECTORS_DIR or None)
+        return np.memmap(spill, dtype=np.float32, mode='w+', shape=(capacity, self.dim))
+    
+    def _own_vectors(self):
+        """Copy raw vectors mapped from a snapshot into this index's own buffer"""
+        vectors = self._allocate_vectors(self._count)
+        vectors[:] = self.vectors
+        self._vectors = vectors
+        self._ids = np.array(self.ids)
+    
+    def rebuild(self):
+        """Build a fresh index (training it if needed) from the live vectors"""
+        if self._base_is_shared():
+            self._fold_delta()
+        self.active_type = resolve_index_type(self.index_type, self._count)
+        self.active_compression = resolve_compression(self.params['compression'], self._count)
+        index = self._create_index(self.active_type, self.active_compression, self._count)
+        if not index.is_trained:
+            index.train(self._training_sample(index.nlist if self.active_type == 'ivf' else 1))
+            self._trained_size = self._count
+        self._labels = {}
+        self._label_ids = {}
+        self._next_label = 0
+        if self._count:
+            index.add_with_ids(self.vectors, self._assign_labels(self.ids))
+        self.index = index
+        self._tombstones = 0
+        logger.info(f"Built {self.active_type}/{self.active_compression} vector index over {self._count} vectors")
+    
+    def search(self, queries, k, subset=None):
+        """
+        Search for the k nearest IDs of each query.
+        
+        Args:
+            queries: float32 array of shape (n, dim) (or a single vector)
+            k: Neighbours per query
+            subset: Optional chunk IDs to restrict the search to. Small subsets
+                are scanned exactly over the raw vectors; larger ones use a
+                FAISS ID selector so only matching entries are scored.
+        
+        Returns:
+            (distances, ids) arrays of shape (len(queries), k); missing slots have ID -1
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        # Stored vectors are unit length; an unnormalized query would skew every distance
+        queries = np.ascontiguousarray(normalize_rows(queries), dtype=np.float32)
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if not len(self) or k <= 0:
+            return distances, ids
+        
+        base_subset, delta_rows = self._split_subset(subset)
+        self._search_base(queries, k, base_subset, distances, ids)
+        if len(delta_rows):
+            # Delta vectors are few, so they are scanned exactly and merged by distance
+            delta_distances = self._squared_distances(queries, self._delta_vectors[delta_rows])
+            delta_ids = self._delta_ids[delta_rows]
+            for q in range(len(queries)):
+                merged_distances = np.concatenate([distances[q], delta_distances[q]])
+                merged_ids = np.concatenate([ids[q], delta_ids])
+                top = np.argsort(merged_distances, kind='stable')[:k]
+                distances[q], ids[q] = merged_distances[top], merged_ids[top]
+        return distances, ids
+    
+    def _split_subset(self, subset):
+        """
+        Split a search subset between the base and the delta.
+        
+        Returns:
+            (visible base IDs, or None for all of them; array of delta rows)
+        """
+        if subset is None:
+            return None, np.arange(len(self._delta_ids))
+        subset = [int(chunk_id) for chunk_id in subset]
+        base_subset = [chunk_id for chunk_id in subset if chunk_id in self._labels and chunk_id not in self._hidden]
+        delta_rows = np.array([self._delta_rows[chunk_id] for chunk_id in subset if chunk_id in self._delta_rows], dtype=np.int64)
+        return base_subset, delta_rows
+    
+    def _search_base(self, queries, k, subset, distances, ids):
+        """Fill distances and ids (in place) with the k nearest visible base IDs of each query"""
+        if self.index is None or not self._count:
+            return
+        search_params = None
+        if subset is not None:
+            if not subset:
+                return
+            if len(subset) <= Config.RAG_FILTER_EXACT_MAX:
+                self._exact_subset_search(queries, subset, k, distances, ids)
+                return
+            search_params = self._selector_params(subset)
+        
+        rerank = self.active_compression != 'none' and self.params['rerank_factor'] > 1
+        candidates_k = k * self.params['rerank_factor'] if rerank else k
+        if search_params is not None:
+            # Tombstoned and hidden labels are never selected, so no over-fetch is needed
+            fetch_k = min(candidates_k, len(subset))
+            found_distances, found_labels = self.index.search(queries, fetch_k, params=search_params)
+        else:
+            fetch_k = min(candidates_k + self._tombstones + len(self._hidden), self.index.ntotal)
+            found_distances, found_labels = self.index.search(queries, fetch_k)
+        for q in range(len(queries)):
+            candidate_distances = []
+            candidate_ids = []
+            for distance, label in zip(found_distances[q], found_labels[q]):
+                chunk_id = self._label_ids.get(int(label))
+                if chunk_id is None or chunk_id in self._hidden:
+                    continue
+                candidate_distances.append(distance)
+                candidate_ids.append(chunk_id)
+                if len(candidate_ids) == candidates_k:
+                    break
+            if rerank and candidate_ids:
+                candidate_distances, candidate_ids = self._exact_rerank(queries[q], candidate_ids)
+            n = min(k, len(candidate_ids))
+            distances[q, :n] = candidate_distances[:n]
+            ids[q, :n] = candidate_ids[:n]
+    
+    def range_search(self, queries, min_similarity, max_results, subset=None):
+        """
+        Find every ID whose cosine similarity to a query is at least min_similarity.
+        Uses FAISS range search, so the work done grows with the number of
+        matches rather than with a fixed k.
+        
+        Args:
+            queries: float32 array of shape (n, dim) (or a single vector)
+            min_similarity: Cosine similarity threshold
+            max_results: Upper cap on matches returned per query
+            subset: Optional chunk IDs to restrict the search to
+        
+        Returns:
+            List of (similarities, ids) array pairs, one per query, best first
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        queries = np.ascontiguousarray(normalize_rows(queries), dtype=np.float32)
+        empty = (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))
+        if not len(self) or max_results <= 0:
+            return [empty for _ in queries]
+        
+        base_subset, delta_rows = self._split_subset(subset)
+        results = self._range_search_base(queries, min_similarity, max_results, base_subset)
+        if len(delta_rows):
+            delta_similarities = queries @ self._delta_vectors[delta_rows].T
+            delta_ids = self._delta_ids[delta_rows]
+            for q in range(len(queries)):
+                # A zero query (e.g. only out-of-vocabulary words) is "similar" to nothing
+                if not np.any(queries[q]):
+                    continue
+                similarities, chunk_ids = results[q]
+                results[q] = self._top_matches(np.concatenate([similarities, delta_similarities[q]]),
+                                               np.concatenate([chunk_ids, delta_ids]), min_similarity, max_results)
+        return results
+    
+    def _range_search_base(self, queries, min_similarity, max_results, subset):
+        """range_search over the visible base IDs (subset None for all of them)"""
+        empty = (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))
+        if self.index is None or not self._count:
+            return [empty for _ in queries]
+        
+        search_params = None
+        if subset is not None:
+            if not subset:
+                return [empty for _ in queries]
+            if len(subset) <= Config.RAG_FILTER_EXACT_MAX:
+                rows = np.array([self._rows[chunk_id] for chunk_id in subset], dtype=np.int64)
+                similarities = queries @ self._vectors[rows].T
+                subset_ids = np.asarray(subset, dtype=np.int64)
+                return [self._top_matches(similarities[q], subset_ids, min_similarity, max_results)
+                        if np.any(queries[q]) else empty for q in range(len(queries))]
+            search_params = self._selector_params(subset)
+        
+        radius = float(max(0.0, 2.0 - 2.0 * min_similarity))
+        if search_params is not None:
+            limits, found_distances, found_labels = self.index.range_search(queries, radius, params=search_params)
+        else:
+            limits, found_distances, found_labels = self.index.range_search(queries, radius)
+        rerank = self.active_compression != 'none'
+        # A zero query (e.g. only out-of-vocabulary words) is "similar" to nothing
+        has_direction = np.linalg.norm(queries, axis=1) > 0
+        results = []
+        for q in range(len(queries)):
+            if not has_direction[q]:
+                results.append(empty)
+                continue
+            labels = found_labels[limits[q]:limits[q + 1]]
+            similarities = 1.0 - found_distances[limits[q]:limits[q + 1]] / 2.0
+            # Tombstoned HNSW labels have no chunk ID
+            chunk_ids = np.array([self._label_ids.get(int(label), -1) for label in labels], dtype=np.int64)
+            live = chunk_ids >= 0
+            if self._hidden:
+                live &= np.array([int(chunk_id) not in self._hidden for chunk_id in chunk_ids], dtype=bool)
+            chunk_ids, similarities = chunk_ids[live], similarities[live]
+            if rerank and len(chunk_ids):
+                # Compressed distances are approximate; re-score against the raw vectors
+                rows = [self._rows[int(chunk_id)] for chunk_id in chunk_ids]
+                similarities = self._vectors[rows] @ queries[q]
+            results.append(self._top_matches(similarities, chunk_ids, min_similarity, max_results))
+        return results
+    
+    @staticmethod
+    def _top_matches(similarities, chunk_ids, min_similarity, max_results):
+        """Matches at or above the threshold, best first, capped at max_results"""
+        keep = similarities >= min_similarity
+        similarities, chunk_ids = similarities[keep], chunk_ids[keep]
+        if len(similarities) > max_results:
+            top = np.argpartition(-similarities, max_results - 1)[:max_results]
+            similarities, chunk_ids = similarities[top], chunk_ids[top]
+        order = np.argsort(-similarities, kind='stable')
+        return similarities[order].astype(np.float32), chunk_ids[order]
+    
+    def calibrated_similarity(self, percentile):
+        """
+        Cosine similarity reached by only (100 - percentile)% of random pairs of
+        indexed vectors: a corpus-specific bar for "more related than chance".
+        Recomputed when the corpus size changes by more than 10%.
+        """
+        count = len(self)
+        cached = self._calibration
+        if (cached is not None and cached[0] == percentile
+                and abs(count - cached[1]) <= 0.1 * cached[1]):
+            return cached[2]
+        if count < 2:
+            return 0.0
+        # Sample positions over the visible base rows followed by the delta rows
+        base_rows = np.arange(self._count)
+        if self._hidden:
+            base_rows = np.delete(base_rows, [self._rows[chunk_id] for chunk_id in self._hidden])
+        positions = np.sort(np.random.default_rng(0).choice(count, size=min(count, CALIBRATION_SAMPLE), replace=False))
+        from_base = positions[positions < len(base_rows)]
+        sample = np.concatenate([
+            np.asarray(self._vectors[base_rows[from_base]], dtype=np.float32),
+            self._delta_vectors[positions[positions >= len(base_rows)] - len(base_rows)]
+        ])
+        sample = normalize_rows(sample)
+        similarities = sample @ sample.T
+        pairs = similarities[np.triu_indices(len(sample), k=1)]
+        value = float(np.percentile(pairs, percentile))
+        self._calibration = (percentile, count, value)
+        logger.info(f"Calibrated range search threshold: cosine {value:.3f} "
+                    f"({percentile}th percentile of {len(pairs)} random pairs)")
+        return value
+    
+    def _exact_subset_search(self, queries, subset, k, distances, ids):
+        """Exact L2 search over the raw vectors of a small set of IDs"""
+        queries = normalize_rows(queries)
+        rows = np.array([self._rows[chunk_id] for chunk_id in subset], dtype=np.int64)
+        subset_ids = np.asarray(subset, dtype=np.int64)
+        all_distances = self._squared_distances(queries, self._vectors[rows])
+        n = min(k, len(subset))
+        for q in range(len(queries)):
+            top = np.argpartition(all_distances[q], n - 1)[:n] if n < len(subset) else np.arange(n)
+            top = top[np.argsort(all_distances[q][top], kind='stable')]
+            distances[q, :n] = all_distances[q][top]
+            ids[q, :n] = subset_ids[top]
+        return distances, ids
+    
+    @staticmethod
+    def _squared_distances(queries, vectors):
+        """Squared L2 distances between each query and each vector, shape (queries, vectors)"""
+        # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2
+        all_distances = ((queries ** 2).sum(axis=1, keepdims=True)
+                         - 2 * queries @ vectors.T
+                         + (vectors ** 2).sum(axis=1))
+        np.maximum(all_distances, 0, out=all_distances)
+        return all_distances
+    
+    def _selector_params(self, subset):
+        """FAISS search parameters limiting a search to the labels of the given IDs"""
+        selector = faiss.IDSelectorBatch(np.array([self._labels[chunk_id] for chunk_id in subset], dtype=np.int64))
+        if self.active_type == 'ivf':
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        if self.active_type == 'hnsw':
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.params['ef_search'])
+        return faiss.SearchParameters(sel=selector)
+    
+    def distances(self, query, ids):
+        """
+        Exact squared L2 distances from one query to the given IDs, over the
+        raw vectors.
+        
+        Returns:
+            float32 array aligned with ids (inf for IDs not in the index)
+        """
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        result = np.full(len(ids), np.inf, dtype=np.float32)
+        in_delta = [i for i, chunk_id in enumerate(ids) if int(chunk_id) in self._delta_rows]
+        in_base = [i for i, chunk_id in enumerate(ids) if int(chunk_id) in self._rows and int(chunk_id) not in self._hidden]
+        if in_delta:
+            rows = [self._delta_rows[int(ids[i])] for i in in_delta]
+            result[in_delta] = ((self._delta_vectors[rows] - query) ** 2).sum(axis=1)
+        if in_base:
+            rows = [self._rows[int(ids[i])] for i in in_base]
+            result[in_base] = ((self._vectors[rows] - query) ** 2).sum(axis=1)
+        return result
+    
+    def _exact_rerank(self, query, candidate_ids):
+        """Re-score candidates from a compressed index with exact L2 over the raw vectors"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        rows = [self._rows[chunk_id] for chunk_id in candidate_ids]
+        exact = ((self._vectors[rows] - query) ** 2).sum(axis=1)
+        order = np.argsort(exact, kind='stable')
+        return exact[order], np.asarray(candidate_ids, dtype=np.int64)[order]
+    
+    def index_bytes(self):
+        """Approximate size of the FAISS index alone"""
+        if self.index is None:
+            return 0
+        return int(faiss.serialize_index(self.index).nbytes)
+    
+    def raw_vector_bytes(self):
+        """Size of the raw float32 vectors kept for re-ranking and rebuilds"""
+        return int(self._count * self.dim * 4)
+    
+    def memory_bytes(self):
+        """
+        Approximate RAM held by the index: the FAISS index plus the raw vectors,
+        unless those are file-backed (see raw_vectors_on_disk), in which case
+        they occupy page cache only as far as they are read, plus the delta.
+        """
+        raw_bytes = 0 if self.raw_vectors_on_disk else self.raw_vector_bytes()
+        return self.index_bytes() + raw_bytes + self._delta_vectors.nbytes
+    
+    def _assign_labels(self, ids):
+        """Allocate fresh FAISS labels for chunk IDs"""
+        labels = np.arange(self._next_label, self._next_label + len(ids), dtype=np.int64)
+        self._next_label += len(ids)
+        for chunk_id, label in zip(ids, labels):
+            self._labels[int(chunk_id)] = int(label)
+            self._label_ids[int(label)] = int(chunk_id)
+        return labels
+    
+    def _needs_rebuild(self):
+        """Whether growth requires a different index type/compression or a retrain"""
+        if self.index is None:
+            return True
+        if resolve_index_type(self.index_type, self._count) != self.active_type:
+            return True
+        if resolve_compression(self.params['compression'], self._count) != self.active_compression:
+            return True
+        needs_training = self.active_type == 'ivf' or self.active_compression in ('sq8', 'pq')
+        return needs_training and self._count > 4 * self._trained_size
+    
+    def _create_index(self, index_type, compression, count):
+        """Create an empty FAISS index of the given type and compression sized for count vectors"""
+        pq_m = pq_subquantizers(self.dim, self.params['pq_m'] or self.dim // 4)
+        scalar_types = {'sq8': faiss.ScalarQuantizer.QT_8bit, 'fp16': faiss.ScalarQuantizer.QT_fp16}
+        
+        if index_type == 'ivf':
+            nlist = self.params['nlist'] or int(4 * math.sqrt(max(count, 1)))
+            nlist = max(1, min(nlist, count // IVF_MIN_POINTS_PER_LIST))
+            quantizer = faiss.IndexFlatL2(self.dim)
+            if compression in scalar_types:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, self.dim, nlist, scalar_types[compression], faiss.METRIC_L2)
+            elif compression == 'pq':
+                index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, pq_m, PQ_NBITS)
+            else:
+                index = faiss.IndexIVFFlat(quantizer, self.dim, nlist, faiss.METRIC_L2)
+            index.nprobe = min(self.params['nprobe'], nlist)
+            return index
+        
+        if index_type == 'hnsw':
+            if compression in scalar_types:
+                base = faiss.IndexHNSWSQ(self.dim, scalar_types[compression], self.params['hnsw_m'])
+            elif compression == 'pq':
+                base = faiss.IndexHNSWPQ(self.dim, pq_m, self.params['hnsw_m'])
+            else:
+                base = faiss.IndexHNSWFlat(self.dim, self.params['hnsw_m'])
+            base.hnsw.efConstruction = self.params['ef_construction']
+            base.hnsw.efSearch = self.params['ef_search']
+            return faiss.IndexIDMap2(base)
+        
+        if compression in scalar_types:
+            return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(self.dim, scalar_types[compression], faiss.METRIC_L2))
+        if compression == 'pq':
+            return faiss.IndexIDMap2(faiss.IndexPQ(self.dim, pq_m, PQ_NBITS))
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+    
+    def _training_sample(self, nlist):
+        """Random subset of live vectors for IVF / quantizer training"""
+        sample_size = nlist * IVF_MAX_TRAINING_POINTS_PER_LIST
+        if self.active_compression != 'none':
+            sample_size = max(sample_size, QUANTIZER_MAX_TRAINING_POINTS)
+        sample_size = min(self._count, sample_size)
+        if sample_size == self._count:
+            return self.vectors
+        rows = np.random.default_rng(0).choice(self._count, size=sample_size, replace=False)
+        return self.vectors[np.sort(rows)]
+    
+    def _reserve(self, capacity):
+        """Grow the raw vector buffers to hold at least capacity rows"""
+        if capacity <= len(self._ids):
+            return
+        new_capacity = max(capacity, 2 * len(self._ids), 1024)
+        vectors = self._allocate_vectors(new_capacity)
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        vectors[:self._count] = self.vectors
+        ids[:self._count] = self.ids
+        self._vectors = vectors
+        self._ids = ids
@@ -16,9 +16,14 @@ logger = logging.getLogger(__name__)
 class VideoService:
     """Service for generating video summaries"""
     
-    def __init__(self):
-        self.llm_service = LLMService()
-        self.audio_service = AudioService()
+    def __init__(self, llm_service=None, audio_service=None):
+        """
+        Args:
+            llm_service: Shared LLMService (a new one is created if omitted)
+            audio_service: Shared AudioService used for narration (likewise)
+        """
+        self.llm_service = llm_service or LLMService()
+        self.audio_service = audio_service or AudioService(self.llm_service)
         self.video_dir = Config.VIDEO_OUTPUT_DIR
         self.summaries = {}  # In-memory storage
         os.makedirs(self.video_dir, exist_ok=True)
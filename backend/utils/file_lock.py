@@ -0,0 +1,77 @@
+"""
+File locking utility.
+Advisory locks on a lock file, used to coordinate worker processes (e.g.
+gunicorn workers) that share on-disk state such as the embedding cache and
+index snapshots. Where fcntl is unavailable (Windows) locking is a no-op,
+which is safe for the single-process development server.
+"""
+import logging
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; run a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class FileLock:
+    """Shared/exclusive advisory lock on a file, safe across processes and threads"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._held = None  # descriptor while held by try_acquire()
+    
+    def _open(self):
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+    
+    @contextmanager
+    def shared(self):
+        """Hold the lock shared (other readers allowed, writers excluded)"""
+        with self._locked(fcntl.LOCK_SH if fcntl else None):
+            yield
+    
+    @contextmanager
+    def exclusive(self):
+        """Hold the lock exclusively"""
+        with self._locked(fcntl.LOCK_EX if fcntl else None):
+            yield
+    
+    def try_acquire(self):
+        """
+        Take the lock exclusively without waiting and hold it until release()
+        or process exit.
+        
+        Returns:
+            True if the lock was acquired
+        """
+        if self._held is not None:
+            return True
+        fd = self._open()
+        if fcntl:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+        self._held = fd
+        return True
+    
+    def release(self):
+        """Release a lock taken with try_acquire()"""
+        if self._held is not None:
+            os.close(self._held)
+            self._held = None
+    
+    @contextmanager
+    def _locked(self, operation):
+        # Each acquisition uses its own descriptor: flock() locks belong to the
+        # open file description, so threads sharing one would not exclude each other
+        fd = self._open()
+        try:
+            if fcntl:
+                fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)  # closing the descriptor releases the lock
@@ -19,7 +19,7 @@ def download_pdf_from_gdrive(url):
         file_id = url.split('/d/')[1].split('/')[0]
         direct_url = f"https://drive.google.com/uc?export=download&id={file_id}"
         
-        response = requests.get(direct_url, allow_redirects=True)
+        response = requests.get(direct_url, allow_redirects=True, timeout=30)
         response.raise_for_status()
         
         return io.BytesIO(response.content)
@@ -50,6 +50,28 @@ def extract_text_from_pdf(pdf_file):
         logger.error(f"Failed to extract PDF text: {e}")
         raise
 
+def extract_text_from_pdf_bytes(data):
+    """
+    Extract text from raw PDF bytes.
+    A module-level function so it can run in a worker process.
+    Returns: list of page texts
+    """
+    return extract_text_from_pdf(io.BytesIO(data))
+
+def fetch_pdf_bytes(url):
+    """
+    Download a PDF without parsing it.
+    Supports Google Drive and direct PDF URLs.
+    Returns: PDF file contents as bytes
+    """
+    # Try Google Drive first
+    if 'drive.google.com' in url:
+        return download_pdf_from_gdrive(url).getvalue()
+    # Direct PDF URL
+    response = requests.get(url, allow_redirects=True, timeout=30)
+    response.raise_for_status()
+    return response.content
+
 def extract_pdf_from_url(url):
     """
     Download and extract text from PDF URL.
@@ -57,16 +79,7 @@ def extract_pdf_from_url(url):
     Returns: list of page texts
     """
     try:
-        # Try Google Drive first
-        if 'drive.google.com' in url:
-            pdf_file = download_pdf_from_gdrive(url)
-        else:
-            # Direct PDF URL
-            response = requests.get(url, allow_redirects=True, timeout=30)
-            response.raise_for_status()
-            pdf_file = io.BytesIO(response.content)
-        
-        return extract_text_from_pdf(pdf_file)
+        return extract_text_from_pdf_bytes(fetch_pdf_bytes(url))
     except Exception as e:
         logger.error(f"Failed to extract PDF from URL: {e}")
         raise
@@ -0,0 +1,18 @@
+"""
+Shared test setup: the backend runs with local embeddings, dummy provider
+keys and no on-disk caches, so tests never reach the network.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Config reads the environment when it is first imported
+os.environ.setdefault('EMBEDDING_PROVIDER', 'local')
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('GEMINI_API_KEY', '')
+os.environ.setdefault('EMBEDDING_CACHE_ENABLED', 'False')
+os.environ.setdefault('RESPONSE_CACHE_PATH', '')
+
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
@@ -0,0 +1,89 @@
+"""
+Tests for the semantic answer cache: similar questions in the same scope and
+corpus version share an answer; anything else misses. Stored sources keep
+their labels intact.
+"""
+import numpy as np
+import pytest
+from flask import Flask
+from backend.models import db
+from backend.models.chat import ChatSession, ChatMessage
+from backend.services.answer_cache import SemanticAnswerCache, answer_scope
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+def save_answer(text, sources=('Lecture 1',)):
+    session = ChatSession()
+    db.session.add(session)
+    db.session.flush()
+    message = ChatMessage(session_id=session.id, user_message='q', ai_response=text,
+                          sources=ChatMessage.encode_sources(sources))
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_scope_depends_on_mode_and_filters():
+    assert answer_scope('normal', None) == answer_scope('normal', {})
+    assert answer_scope('normal', {'source_id': ['a']}) != answer_scope('normal', None)
+    assert answer_scope('exam', None) != answer_scope('normal', None)
+
+def test_similar_question_gets_the_stored_answer(app):
+    cache = SemanticAnswerCache(threshold=0.95)
+    scope = answer_scope('normal', None)
+    cache.add(unit(1, 0, 0), scope, 'v1', save_answer('Photosynthesis makes sugar.'), ['Lecture 1'])
+    
+    hit = cache.lookup(unit(1, 0.05, 0), scope, 'v1')
+    assert hit['response'] == 'Photosynthesis makes sugar.'
+    assert hit['sources'] == ['Lecture 1']
+    assert hit['similarity'] >= 0.95
+    assert cache.lookup(unit(0, 1, 0), scope, 'v1') is None
+
+def test_other_scope_misses(app):
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.add(unit(1, 0, 0), answer_scope('normal', None), 'v1', save_answer('answer'), [])
+    assert cache.lookup(unit(1, 0, 0), answer_scope('exam', None), 'v1') is None
+
+def test_corpus_change_resets_the_cache(app):
+    cache = SemanticAnswerCache(threshold=0.95)
+    scope = answer_scope('normal', None)
+    cache.add(unit(1, 0, 0), scope, 'v1', save_answer('old answer'), [])
+    
+    assert cache.lookup(unit(1, 0, 0), scope, 'v2') is None
+    assert cache.stats()['corpus_version'] == 'v2'
+
+def test_entries_from_other_workers_are_loaded(app):
+    scope = answer_scope('normal', None)
+    writer = SemanticAnswerCache(threshold=0.95)
+    writer.lookup(unit(1, 0, 0), scope, 'v1')
+    writer.add(unit(1, 0, 0), scope, 'v1', save_answer('shared answer'), ['Lecture 1'])
+    
+    reader = SemanticAnswerCache(threshold=0.95, sync_seconds=0)
+    hit = reader.lookup(unit(1, 0, 0), scope, 'v1')
+    assert hit['response'] == 'shared answer'
+    assert hit['sources'] == ['Lecture 1']
+
+def test_source_labels_with_commas_survive_a_reload(app):
+    scope = answer_scope('normal', None)
+    sources = ['Smith, J. - Lecture 1', 'Notes']
+    writer = SemanticAnswerCache(threshold=0.95)
+    writer.add(unit(1, 0, 0), scope, 'v1', save_answer('answer', sources), sources)
+    
+    reader = SemanticAnswerCache(threshold=0.95, sync_seconds=0)
+    assert reader.lookup(unit(1, 0, 0), scope, 'v1')['sources'] == sources
+
+def test_comma_separated_sources_from_older_rows_are_read():
+    assert ChatMessage.decode_sources('Lecture 1,Lecture 2') == ['Lecture 1', 'Lecture 2']
+    assert ChatMessage.decode_sources(None) == []
+    assert ChatMessage.decode_sources(ChatMessage.encode_sources(['a, b'])) == ['a, b']
@@ -0,0 +1,80 @@
+"""
+Tests for ingest-time deduplication: exact and MinHash near-duplicate
+detection, and citations of duplicate sources surviving in the index.
+"""
+import pytest
+from backend.config import Config
+from backend.services.chunk_dedup import ChunkDeduplicator
+from backend.services.rag_engine import RAGEngine
+
+TEXT = ("The mitochondria is the powerhouse of the cell, producing adenosine triphosphate "
+        "through cellular respiration in a series of reactions across its inner membrane, "
+        "where the electron transport chain pumps protons to drive ATP synthase rotation.")
+OTHER = ("Plate tectonics describes the large scale motion of the lithosphere, whose plates "
+         "move over the asthenosphere and meet at convergent, divergent and transform boundaries.")
+
+def chunk(chunk_id, text):
+    return {'chunk_id': chunk_id, 'text': text}
+
+def indexed(dedup, chunk_id, text):
+    dedup.add(chunk_id, dedup.fingerprint(text))
+
+def test_exact_duplicate_is_found():
+    dedup = ChunkDeduplicator()
+    indexed(dedup, 1, TEXT)
+    unique, duplicates = dedup.deduplicate([chunk(2, TEXT)])
+    assert unique == []
+    assert duplicates == [(chunk(2, TEXT), 1, 'exact')]
+
+def test_near_duplicate_is_found():
+    dedup = ChunkDeduplicator(threshold=0.8)
+    indexed(dedup, 1, TEXT)
+    edited = TEXT.replace('synthase rotation', 'synthase turning')
+    _, duplicates = dedup.deduplicate([chunk(2, edited)])
+    assert [(canonical, kind) for _, canonical, kind in duplicates] == [(1, 'near')]
+
+def test_distinct_text_is_kept():
+    dedup = ChunkDeduplicator()
+    indexed(dedup, 1, TEXT)
+    unique, duplicates = dedup.deduplicate([chunk(2, OTHER)])
+    assert [c['chunk_id'] for c, _ in unique] == [2]
+    assert duplicates == []
+
+def test_duplicates_within_a_batch_are_found():
+    unique, duplicates = ChunkDeduplicator().deduplicate([chunk(1, TEXT), chunk(2, OTHER), chunk(3, TEXT)])
+    assert [c['chunk_id'] for c, _ in unique] == [1, 2]
+    assert [(c['chunk_id'], canonical) for c, canonical, _ in duplicates] == [(3, 1)]
+
+def test_short_texts_only_match_exactly():
+    dedup = ChunkDeduplicator(min_tokens=8)
+    indexed(dedup, 1, 'short note about cells')
+    assert dedup.deduplicate([chunk(2, 'short note about cell')])[1] == []
+
+def test_removed_and_excluded_chunks_are_not_originals():
+    dedup = ChunkDeduplicator()
+    indexed(dedup, 1, TEXT)
+    assert dedup.deduplicate([chunk(2, TEXT)], exclude={1})[1] == []
+    dedup.remove([1])
+    assert dedup.deduplicate([chunk(2, TEXT)])[1] == []
+    assert len(dedup) == 0
+
+@pytest.fixture
+def rag(monkeypatch):
+    monkeypatch.setattr(Config, 'DEDUP_ENABLED', True)
+    monkeypatch.setattr(Config, 'RAG_EMBEDDING_DEADLINE_MS', 0)
+    return RAGEngine()
+
+def test_duplicate_source_is_cited_not_reindexed(rag):
+    rag._index_source_chunks('a', [{'text': TEXT, 'source': 'Book A'}, {'text': OTHER, 'source': 'Book A'}])
+    rag._index_source_chunks('b', [{'text': TEXT, 'source': 'Book B'}])
+    
+    generation = rag.generations.current
+    assert len(generation.chunks) == len(generation.index) == 2
+    kept = generation.chunks[generation.sources['b'][0]]
+    assert {citation['source'] for citation in kept['citations']} == {'Book A', 'Book B'}
+    
+    # Removing the original keeps the chunk for the source still citing it
+    rag.remove_source('a')
+    generation = rag.generations.current
+    assert list(generation.chunks) == generation.sources['b']
+    assert generation.chunks[generation.sources['b'][0]]['source'] == 'Book B'
@@ -0,0 +1,107 @@
+"""
+Tests for the columnar chunk store: chunks round-trip through save/load
+with or without a memory-mapped text blob, copies are independent, and
+deletes hide base and tail rows alike.
+"""
+import pytest
+from backend.config import Config
+from backend.services.chunk_store import ChunkStore
+
+def make_chunks():
+    return {
+        3: {'text': 'Photosynthesis happens in chloroplasts.', 'source': 'Lecture 1', 'page': 2,
+            'chunk_index': 0, 'total_chunks': 2, 'token_count': 7},
+        1: {'text': 'Zellatmung – Mitochondrien ⚡', 'source': 'Vorlesung', 'page': 0, 'source_id': 'abc'},
+        7: {'text': '', 'source': 'Lecture 1', 'timestamp': '01:02', 'page': 'iv'},
+        5: {'text': 'No source at all.', 'source': None, 'chunk_index': -2}
+    }
+
+def stored(chunks):
+    """Chunk dicts as the store returns them"""
+    return {chunk_id: dict(chunk, chunk_id=chunk_id) for chunk_id, chunk in chunks.items()}
+
+def fill(store, chunks):
+    for chunk_id, chunk in chunks.items():
+        store[chunk_id] = chunk
+    return store
+
+@pytest.mark.parametrize('mmap_text', [True, False])
+def test_save_and_load_round_trip(tmp_path, mmap_text):
+    chunks = make_chunks()
+    state = fill(ChunkStore(), chunks).save(str(tmp_path))
+    loaded = ChunkStore.load(str(tmp_path), mmap_text=mmap_text)
+    
+    assert state['chunks'] == 4
+    assert list(loaded) == [1, 3, 5, 7]
+    assert {chunk_id: loaded[chunk_id] for chunk_id in loaded} == stored(chunks)
+    assert loaded.text(1) == chunks[1]['text']
+    with pytest.raises(KeyError):
+        loaded[2]
+
+@pytest.mark.parametrize('mmap_text', [True, False])
+def test_changes_to_a_loaded_store_are_saved(tmp_path, mmap_text):
+    chunks = make_chunks()
+    (tmp_path / 'first').mkdir()
+    fill(ChunkStore(), chunks).save(str(tmp_path / 'first'))
+    store = ChunkStore.load(str(tmp_path / 'first'), mmap_text=mmap_text)
+    del store[3]
+    store[1] = {'text': 'rewritten', 'source': 'Lecture 2'}
+    store[9] = {'text': 'new', 'source': 'Lecture 1', 'page': 4}
+    
+    (tmp_path / 'second').mkdir()
+    store.save(str(tmp_path / 'second'))
+    loaded = ChunkStore.load(str(tmp_path / 'second'), mmap_text=mmap_text)
+    
+    expected = stored({1: {'text': 'rewritten', 'source': 'Lecture 2'}, 5: chunks[5], 7: chunks[7],
+                       9: {'text': 'new', 'source': 'Lecture 1', 'page': 4}})
+    assert {chunk_id: loaded[chunk_id] for chunk_id in loaded} == expected
+
+def test_deletes_hide_base_and_tail_rows(tmp_path):
+    fill(ChunkStore(), make_chunks()).save(str(tmp_path))
+    store = ChunkStore.load(str(tmp_path))
+    store[11] = {'text': 'tail', 'source': 'x'}
+    
+    del store[3]
+    del store[11]
+    assert 3 not in store and 11 not in store
+    assert len(store) == 3 and sorted(store) == [1, 5, 7]
+    with pytest.raises(KeyError):
+        del store[3]
+    with pytest.raises(KeyError):
+        store.text(11)
+    
+    store[3] = {'text': 'back again', 'source': 'y'}
+    assert store[3]['text'] == 'back again' and len(store) == 4
+
+def test_copies_are_independent(tmp_path):
+    fill(ChunkStore(), make_chunks()).save(str(tmp_path))
+    original = ChunkStore.load(str(tmp_path))
+    original[11] = {'text': 'tail', 'source': 'x'}
+    before = {chunk_id: original[chunk_id] for chunk_id in original}
+    
+    clone = original.copy()
+    del clone[3]
+    del clone[11]
+    clone[1] = {'text': 'changed', 'source': 'y'}
+    clone[12] = {'text': 'added', 'source': 'z'}
+    
+    assert {chunk_id: original[chunk_id] for chunk_id in original} == before
+    assert sorted(clone) == [1, 5, 7, 12]
+    assert clone[1]['text'] == 'changed' and clone[12]['source'] == 'z'
+    # The read-only base is shared rather than copied
+    assert clone._base_text is original._base_text
+
+def test_a_large_tail_is_folded_into_the_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_DELTA_MIN_ROWS', 0)
+    fill(ChunkStore(), make_chunks()).save(str(tmp_path))
+    original = ChunkStore.load(str(tmp_path))
+    del original[5]
+    original[20] = {'text': 'tail one', 'source': 'x'}
+    original[21] = {'text': 'tail two', 'source': 'x', 'page': 1}
+    expected = {chunk_id: original[chunk_id] for chunk_id in original}
+    
+    clone = original.copy()
+    
+    assert not clone._tail_rows and clone._base_text is not original._base_text
+    assert {chunk_id: clone[chunk_id] for chunk_id in clone} == expected
+    assert {chunk_id: original[chunk_id] for chunk_id in original} == expected
@@ -0,0 +1,66 @@
+"""
+Tests for context packing: neighbouring chunks are stitched back together
+without their shared overlap, and passages are packed by score into the
+token budget with their citations.
+"""
+from backend.services.context_packer import merge_overlap, merge_neighbours, pack_context, context_sources
+
+SHARED = ' '.join(f'word{i}' for i in range(20))
+
+def chunk(text, source='Lecture 1', index=None, score=0.5, tokens=10, **fields):
+    return dict(fields, text=text, source=source, chunk_index=index, similarity=score, token_count=tokens)
+
+def test_merge_overlap_drops_the_repeated_text():
+    assert merge_overlap(f"Intro. {SHARED}", f"{SHARED} Outro.") == f"Intro. {SHARED} Outro."
+
+def test_merge_overlap_without_shared_text_joins_on_a_new_line():
+    assert merge_overlap("First part.", "Second part.") == "First part.\nSecond part."
+    assert merge_overlap("First part.", "") == "First part.\n"
+
+def test_merge_neighbours_joins_consecutive_chunks_of_one_page():
+    chunks = [
+        chunk(f"{SHARED} Outro.", index=1, score=0.9, tokens=30, page=2),
+        chunk(f"Intro. {SHARED}", index=0, score=0.4, tokens=30, page=2),
+        chunk("Later.", index=3, page=2),
+        chunk("Other page.", index=2, page=3),
+        chunk("Other source.", source='Lecture 2', index=2, page=2)
+    ]
+    passages = {passage['text']: passage for passage in merge_neighbours(chunks)}
+    
+    assert set(passages) == {f"Intro. {SHARED} Outro.", "Later.", "Other page.", "Other source."}
+    merged = passages[f"Intro. {SHARED} Outro."]
+    assert [member['chunk_index'] for member in merged['chunks']] == [0, 1]
+    assert merged['score'] == 0.9
+    # Stored counts are scaled down by the overlap that was dropped
+    assert 30 < merged['tokens'] < 60
+
+def test_pack_context_skips_passages_over_budget_but_keeps_smaller_ones():
+    chunks = [
+        chunk("best", source='A', score=0.9, tokens=50),
+        chunk("too long", source='B', score=0.8, tokens=40),
+        chunk("short", source='C', score=0.7, tokens=10)
+    ]
+    context, included = pack_context(chunks, max_tokens=62, with_sources=False)
+    
+    assert context == "best\n\nshort"
+    assert [c['source'] for c in included] == ['A', 'C']
+
+def test_pack_context_truncates_a_best_passage_larger_than_the_budget():
+    text = 'x' * 400
+    context, included = pack_context([chunk(text, tokens=100)], max_tokens=20, with_sources=False)
+    
+    assert included[0]['text'] == text
+    assert 0 < len(context) < 100 and text.startswith(context)
+
+def test_pack_context_cites_merged_sources():
+    chunks = [
+        chunk("Deduplicated.", source='A', score=0.9, citations=[{'source': 'A'}, {'source': 'B'}]),
+        chunk("Plain.", source='C', score=0.5)
+    ]
+    context, included = pack_context(chunks, max_tokens=1000)
+    
+    assert context == "[Source: A, B]\nDeduplicated.\n\n[Source: C]\nPlain."
+    assert context_sources(included) == ['A', 'B', 'C']
+
+def test_pack_context_of_nothing_is_empty():
+    assert pack_context([], 100) == ("", [])
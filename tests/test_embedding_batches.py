@@ -0,0 +1,111 @@
+"""
+Tests for remote embedding calls against a fake provider client: inputs are
+split into bounded batches, transient errors are retried with exponential
+backoff, and a batch that keeps failing fails the whole call.
+"""
+import asyncio
+from types import SimpleNamespace
+import httpx
+import numpy as np
+import pytest
+from openai import BadRequestError, RateLimitError
+from backend.config import Config
+from backend.services.llm_service import LLMService, estimate_tokens, split_into_batches
+
+def texts(count):
+    return [f'text {i}' for i in range(count)]
+
+def provider_error(error_class, status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request('POST', 'https://api.example.com/embeddings'))
+    return error_class(f'status {status}', response=response, body=None)
+
+class FakeEmbeddings:
+    """embeddings.create() that embeds 'text i' as [i, 1] and fails as scripted"""
+    
+    def __init__(self, failures):
+        self.failures = failures  # first text of a batch -> errors to raise, in order
+        self.calls = []
+    
+    async def create(self, model, input, extra_body=None):
+        self.calls.append(list(input))
+        errors = self.failures.get(input[0])
+        if errors:
+            raise errors.pop(0)
+        data = [SimpleNamespace(index=i, embedding=[float(text.split()[1]), 1.0]) for i, text in enumerate(input)]
+        # Providers may return items out of order
+        return SimpleNamespace(data=data[::-1])
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Backoff sleeps, recorded instead of waited out"""
+    recorded = []
+    sleep = asyncio.sleep
+    
+    async def fake_sleep(delay, *args, **kwargs):
+        recorded.append(delay)
+        await sleep(0)
+    monkeypatch.setattr(asyncio, 'sleep', fake_sleep)
+    return recorded
+
+@pytest.fixture
+def embed(monkeypatch):
+    monkeypatch.setattr(Config, 'EMBEDDING_PROVIDER', 'openai')
+    monkeypatch.setattr(Config, 'OPENAI_EMBEDDING_FALLBACK_URLS', [])
+    monkeypatch.setattr(Config, 'EMBEDDING_BATCH_MAX_ITEMS', 3)
+    monkeypatch.setattr(Config, 'EMBEDDING_MAX_RETRIES', 2)
+    monkeypatch.setattr(Config, 'EMBEDDING_RETRY_BASE_DELAY', 1.0)
+    
+    def embed(inputs, failures=None):
+        service = LLMService()
+        client = SimpleNamespace(embeddings=FakeEmbeddings(failures or {}))
+        service._embedding_clients = lambda: {'openai': client}
+        return service.generate_embeddings(inputs, use_cache=False), client.embeddings.calls
+    return embed
+
+def test_batches_are_bounded_by_items_and_tokens():
+    assert split_into_batches(texts(8), max_items=3, max_tokens=1000) == [(0, 3), (3, 6), (6, 8)]
+    long_text = 'word ' * 50
+    limit = estimate_tokens(long_text) + 2
+    assert split_into_batches([long_text, 'b', 'c', long_text], max_items=10, max_tokens=limit) == [(0, 3), (3, 4)]
+    # A text over the token limit still gets a batch of its own
+    assert split_into_batches([long_text, 'b'], max_items=10, max_tokens=10) == [(0, 1), (1, 2)]
+    assert split_into_batches([], max_items=3, max_tokens=10) == []
+
+def test_embeddings_are_requested_in_batches_and_returned_in_order(embed):
+    embeddings, calls = embed(texts(8))
+    
+    assert sorted(calls) == [texts(8)[0:3], texts(8)[3:6], texts(8)[6:8]]
+    assert embeddings.dtype == np.float32
+    assert embeddings[:, 0].tolist() == list(range(8))
+
+def test_transient_errors_are_retried_with_backoff(embed, delays):
+    failures = {'text 0': [provider_error(RateLimitError, 429), provider_error(RateLimitError, 429)]}
+    embeddings, calls = embed(texts(2), failures)
+    
+    assert embeddings[:, 0].tolist() == [0, 1]
+    assert len(calls) == 3
+    # Exponential backoff with up to 50% jitter
+    assert 1.0 <= delays[0] <= 1.5 and 2.0 <= delays[1] <= 3.0
+
+def test_retry_after_header_extends_the_backoff(embed, delays):
+    failures = {'text 0': [provider_error(RateLimitError, 429, headers={'retry-after': '5'})]}
+    embed(texts(2), failures)
+    assert 5.0 <= delays[0] <= 7.5
+
+def test_only_the_failed_batch_is_retried(embed, delays):
+    failures = {'text 3': [provider_error(RateLimitError, 429)]}
+    embeddings, calls = embed(texts(8), failures)
+    
+    assert embeddings[:, 0].tolist() == list(range(8))
+    assert sorted(call[0] for call in calls) == ['text 0', 'text 3', 'text 3', 'text 6']
+
+def test_a_batch_that_keeps_failing_fails_the_call(embed, delays):
+    failures = {'text 3': [provider_error(RateLimitError, 429) for _ in range(3)]}
+    with pytest.raises(RateLimitError):
+        embed(texts(8), failures)
+    assert len(delays) == Config.EMBEDDING_MAX_RETRIES
+
+def test_client_errors_are_not_retried(embed, delays):
+    with pytest.raises(BadRequestError):
+        embed(texts(2), {'text 0': [provider_error(BadRequestError, 400)]})
+    assert delays == []
@@ -0,0 +1,52 @@
+"""
+Tests for the persistent embedding cache. Two EmbeddingCache objects on the
+same directory behave like two worker processes sharing the files.
+"""
+import numpy as np
+from backend.services.embedding_cache import EmbeddingCache
+
+DIM = 4
+
+def vector_for(i):
+    return np.full(DIM, float(i), dtype=np.float32)
+
+def test_hits_return_the_stored_vector(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), 'model')
+    cache.put_many(['a', 'b'], np.stack([vector_for(1), vector_for(2)]))
+    
+    a, missing, b = cache.get_many(['a', 'nope', 'b'])
+    assert np.array_equal(a, vector_for(1))
+    assert missing is None
+    assert np.array_equal(b, vector_for(2))
+
+def test_models_do_not_share_keys(tmp_path):
+    first = EmbeddingCache(str(tmp_path), 'model-a')
+    second = EmbeddingCache(str(tmp_path), 'model-b')
+    first.put_many(['text'], vector_for(1).reshape(1, -1))
+    assert second.get_many(['text']) == [None]
+
+def test_writes_from_another_process_are_seen(tmp_path):
+    writer = EmbeddingCache(str(tmp_path), 'model')
+    writer.put_many(['seed'], vector_for(0).reshape(1, -1))
+    reader = EmbeddingCache(str(tmp_path), 'model')
+    
+    writer.put_many(['later'], vector_for(7).reshape(1, -1))
+    
+    assert np.array_equal(reader.get_many(['later'])[0], vector_for(7))
+
+def test_reused_slots_never_return_another_keys_vector(tmp_path):
+    # Room for 32 entries, so the writes below keep evicting and reusing slots
+    max_mb = 32 * (DIM * 4 + 16) / (1024 * 1024)
+    first = EmbeddingCache(str(tmp_path), 'model', max_mb=max_mb)
+    first.put_many(['key-0'], vector_for(0).reshape(1, -1))
+    second = EmbeddingCache(str(tmp_path), 'model', max_mb=max_mb)
+    
+    for i in range(1, 200):
+        writer, reader = (first, second) if i % 2 else (second, first)
+        writer.put_many([f'key-{i}'], vector_for(i).reshape(1, -1))
+        keys = [f'key-{j}' for j in range(max(0, i - 40), i + 1)]
+        for j, vector in zip(range(max(0, i - 40), i + 1), reader.get_many(keys)):
+            assert vector is None or np.array_equal(vector, vector_for(j))
+    
+    # The newest entry is never the one evicted
+    assert np.array_equal(first.get_many(['key-199'])[0], vector_for(199))
@@ -0,0 +1,139 @@
+"""
+Tests for index generations: publish and pin semantics, and per-source
+updates that publish new generations instead of changing the pinned one,
+sharing its structures' bases rather than copying them.
+"""
+import random
+import threading
+import time
+from backend.config import Config
+from backend.services.index_generation import IndexGeneration, GenerationRegistry
+from backend.services.rag_engine import RAGEngine
+
+WORDS = "atom bond charge electron ion isotope molecule neutron orbital proton reaction valence".split()
+
+def make_chunks(count, seed):
+    rng = random.Random(seed)
+    return [{'text': ' '.join(rng.choice(WORDS) for _ in range(20)) + f' part{seed}x{i}', 'source': f'src{seed}'}
+            for i in range(count)]
+
+def test_publish_assigns_increasing_versions():
+    registry = GenerationRegistry()
+    first = registry.current.version
+    assert registry.publish(IndexGeneration()) == first + 1
+    assert registry.current.version == first + 1
+
+def test_pinned_generation_is_released_after_last_reader():
+    registry = GenerationRegistry(IndexGeneration(chunks={1: {'text': 'x'}}))
+    with registry.pin() as old:
+        registry.publish(IndexGeneration())
+        # Still readable while pinned, even though it was replaced
+        assert old.retired and old.chunks == {1: {'text': 'x'}}
+        assert registry.stats()['retiring']
+    assert not registry.stats()['retiring']
+    assert old.chunks is None or not old.chunks
+
+def test_unpinned_generation_is_released_on_publish():
+    registry = GenerationRegistry(IndexGeneration(chunks={1: {'text': 'x'}}))
+    old = registry.current
+    registry.publish(IndexGeneration())
+    assert old.retired
+    assert not registry.stats()['retiring']
+
+def test_updates_do_not_change_a_pinned_generation():
+    rag = RAGEngine()
+    rag._index_source_chunks('a', make_chunks(10, 1))
+    
+    with rag.generations.pin() as pinned:
+        ids_before = set(pinned.chunks)
+        rag._index_source_chunks('b', make_chunks(5, 2))
+        rag.remove_source('a')
+        
+        assert set(pinned.sources) == {'a'}
+        assert set(pinned.chunks) == ids_before
+        assert len(pinned.index) == 10
+        assert len(pinned.lexical_index) == 10
+    
+    current = rag.generations.current
+    assert current is not pinned
+    assert set(current.sources) == {'b'}
+    assert len(current.index) == len(current.chunks) == 5
+
+def test_copy_is_independent():
+    rag = RAGEngine()
+    rag._index_source_chunks('a', make_chunks(10, 1))
+    original = rag.generations.current
+    clone = original.copy()
+    
+    rag._remove_source_from(clone, 'a')
+    
+    assert len(original.chunks) == len(original.index) == len(original.lexical_index) == 10
+    assert len(clone.chunks) == len(clone.index) == len(clone.lexical_index) == 0
+
+def test_updates_during_a_rebuild_are_replayed(monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_EMBEDDING_DEADLINE_MS', 0)
+    rag = RAGEngine()
+    building = threading.Event()
+    
+    def slow_env_sources(db_sources):
+        def loader(parse_pool=None):
+            building.set()
+            time.sleep(1.0)
+            return make_chunks(8, 3)
+        return [('env:pdf:https://example.com/a.pdf', loader)]
+    
+    rag._env_source_loaders = slow_env_sources
+    rebuild = threading.Thread(target=rag.initialize)
+    rebuild.start()
+    assert building.wait(5)
+    rag._index_source_chunks('added', make_chunks(4, 4))
+    # The update was not held up by the rebuild
+    assert rebuild.is_alive()
+    rebuild.join(10)
+    
+    assert set(rag.generations.current.sources) == {'env:pdf:https://example.com/a.pdf', 'added'}
+    assert rag.search('part4x1', top_k=1)[0]['source'] == 'src4'
+
+def build_engine(chunks):
+    rag = RAGEngine()
+    rag._env_source_loaders = lambda db_sources: [('env:pdf:https://example.com/a.pdf', lambda parse_pool=None: chunks)]
+    rag.initialize()
+    return rag
+
+def test_updates_share_the_unchanged_bases():
+    rag = build_engine(make_chunks(40, 5))
+    
+    with rag.generations.pin() as base:
+        rag._index_source_chunks('b', make_chunks(5, 6))
+        rag.remove_source('env:pdf:https://example.com/a.pdf')
+        current = rag.generations.current
+        
+        assert current.index.index is base.index.index
+        assert current.lexical_index._base_postings is base.lexical_index._base_postings
+        assert current.chunks._base_text is base.chunks._base_text
+        assert current.dedup._base_hashes is base.dedup._base_hashes
+        assert len(base.chunks) == len(base.index) == len(base.lexical_index) == len(base.dedup) == 40
+        assert len(current.chunks) == len(current.index) == len(current.lexical_index) == len(current.dedup) == 5
+    
+    assert rag.search('part6x2', top_k=1)[0]['source'] == 'src6'
+
+def test_large_deltas_are_folded_into_new_bases(monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_DELTA_MIN_ROWS', 0)
+    rag = build_engine(make_chunks(40, 5))
+    
+    with rag.generations.pin() as base:
+        rag._index_source_chunks('b', make_chunks(10, 6))
+        # The next copy folds the previous update's delta
+        rag._index_source_chunks('c', make_chunks(1, 7))
+        current = rag.generations.current
+        
+        assert current.index.index is not base.index.index
+        assert current.chunks._base_text is not base.chunks._base_text
+        assert current.lexical_index._base_postings is not base.lexical_index._base_postings
+        assert current.dedup._base_hashes is not base.dedup._base_hashes
+        assert len(base.chunks) == len(base.index) == len(base.lexical_index) == 40
+        assert len(current.chunks) == len(current.index) == len(current.lexical_index) == len(current.dedup) == 51
+    
+    assert rag.search('part5x3', top_k=1)[0]['source'] == 'src5'
+    assert rag.search('part6x9', top_k=1)[0]['source'] == 'src6'
+    assert rag.search('part7x0', top_k=1)[0]['source'] == 'src7'
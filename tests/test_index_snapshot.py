@@ -0,0 +1,80 @@
+"""
+Tests for on-disk index snapshots: a saved engine loads back with the same
+sources, chunks and search results.
+"""
+import os
+import random
+import pytest
+from backend.config import Config
+from backend.services.index_snapshot import latest_snapshot, read_snapshot
+from backend.services.rag_engine import RAGEngine
+
+WORDS = ("cell membrane protein enzyme nucleus ribosome osmosis diffusion gradient mitosis "
+         "meiosis chromosome allele genotype phenotype mutation species habitat biome niche").split()
+
+def make_chunks(rng, count, source):
+    return [{'text': ' '.join(rng.choice(WORDS) for _ in range(25)) + f' item{i}', 'source': source, 'page': i + 1}
+            for i in range(count)]
+
+@pytest.fixture
+def rag(monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_EMBEDDING_DEADLINE_MS', 0)
+    rng = random.Random(3)
+    engine = RAGEngine()
+    engine._index_source_chunks('0b6e2a9c-1f4d-4c1e-9a57-2f1d8c3b7e10', make_chunks(rng, 30, 'Lecture 1'),
+                                version='2024-01-01T00:00:00', source_type='pdf_url')
+    engine._index_source_chunks('12345', make_chunks(rng, 20, 'Lecture 2'), version='v2', source_type='pdf_file')
+    engine._index_source_chunks('env:pdf:https://example.com/a.pdf', make_chunks(rng, 10, 'Notes'))
+    return engine
+
+def test_round_trip_preserves_sources_and_chunks(rag, tmp_path):
+    path = rag.save_index(str(tmp_path))
+    assert latest_snapshot(str(tmp_path)) == path
+    
+    loaded = RAGEngine()
+    assert loaded.load_index(path)
+    before, after = rag.generations.current, loaded.generations.current
+    
+    assert after.sources == before.sources
+    assert after.source_versions == before.source_versions
+    assert after.source_types == before.source_types
+    # Source keys stay strings, even when they happen to be all digits
+    assert '12345' in after.sources
+    assert len(after.chunks) == len(before.chunks)
+    for chunk_id in before.chunks:
+        assert after.chunks[chunk_id] == before.chunks[chunk_id]
+
+def test_round_trip_preserves_search_results(rag, tmp_path):
+    loaded = RAGEngine()
+    loaded.load_index(rag.save_index(str(tmp_path)))
+    
+    for query in ('enzyme protein item3', 'mitosis chromosome', 'species habitat niche'):
+        expected = [chunk['chunk_id'] for chunk in rag.search(query, top_k=5)]
+        assert [chunk['chunk_id'] for chunk in loaded.search(query, top_k=5)] == expected
+
+def test_loaded_index_accepts_updates(rag, tmp_path):
+    loaded = RAGEngine()
+    loaded.load_index(rag.save_index(str(tmp_path)))
+    
+    loaded.remove_source('12345')
+    loaded._index_source_chunks('new', make_chunks(random.Random(5), 5, 'Lecture 3'))
+    
+    generation = loaded.generations.current
+    assert '12345' not in generation.sources
+    assert len(generation.sources['new']) == 5
+    assert len(generation.index) == len(generation.chunks)
+
+def test_snapshot_files_are_verified(rag, tmp_path):
+    path = rag.save_index(str(tmp_path))
+    with open(os.path.join(path, 'sources.json'), 'a') as f:
+        f.write(' ')
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+
+def test_old_snapshots_are_pruned(rag, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_SNAPSHOT_KEEP', 2)
+    paths = [rag.save_index(str(tmp_path)) for _ in range(4)]
+    
+    remaining = sorted(name for name in os.listdir(tmp_path) if name.startswith('snapshot-'))
+    assert len(remaining) == 2
+    assert latest_snapshot(str(tmp_path)) == paths[-1]
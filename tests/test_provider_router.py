@@ -0,0 +1,92 @@
+"""
+Tests for latency-aware provider routing: ordering, failover, hedging and
+the circuit breaker.
+"""
+import asyncio
+import pytest
+from backend.services.provider_router import ProviderRouter, MIN_SAMPLES
+
+def router(**options):
+    options.setdefault('hedge_default_seconds', 0.05)
+    return ProviderRouter(['a', 'b'], **options)
+
+def returning(value, delay=0.0, log=None):
+    async def call():
+        if log is not None:
+            log.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return call
+
+def failing(message, log=None):
+    async def call():
+        if log is not None:
+            log.append(message)
+        raise RuntimeError(message)
+    return call
+
+def test_prefers_configured_order_without_latency_data():
+    assert router().order() == ['a', 'b']
+
+def test_prefers_the_faster_provider_once_measured():
+    r = router()
+    for _ in range(MIN_SAMPLES):
+        r.record('a', seconds=0.5)
+        r.record('b', seconds=0.1)
+    assert r.order() == ['b', 'a']
+
+def test_fails_over_to_the_next_provider():
+    r = router(hedge_enabled=False)
+    assert asyncio.run(r.acall({'a': failing('a down'), 'b': returning('from b')})) == 'from b'
+    assert r.providers['a'].failures == 1
+
+def test_raises_the_last_error_when_all_fail():
+    r = router(hedge_enabled=False)
+    with pytest.raises(RuntimeError, match='b down'):
+        asyncio.run(r.acall({'a': failing('a down'), 'b': failing('b down')}))
+
+def test_slow_primary_is_hedged_and_the_backup_wins():
+    r = router(hedge_default_seconds=0.05)
+    calls = []
+    result = asyncio.run(r.acall({'a': returning('from a', delay=1.0, log=calls), 'b': returning('from b', log=calls)}))
+    assert result == 'from b'
+    assert calls == ['from a', 'from b']
+    assert r.hedged_calls == 1
+    assert r.providers['b'].backup_wins == 1
+
+def test_fast_primary_is_not_hedged():
+    r = router(hedge_default_seconds=0.5)
+    calls = []
+    assert asyncio.run(r.acall({'a': returning('from a', log=calls), 'b': returning('from b', log=calls)})) == 'from a'
+    assert calls == ['from a']
+    assert r.hedged_calls == 0
+
+def test_repeated_failures_open_the_circuit():
+    r = router(failure_threshold=2, cooldown_seconds=60)
+    for _ in range(2):
+        r.record('a', error=RuntimeError('down'))
+    assert not r.providers['a'].healthy
+    # An open provider is only tried after the healthy ones
+    assert r.order() == ['b', 'a']
+    r.providers['a'].open_until = 0
+    assert r.providers['a'].healthy
+
+def test_cancelled_hedge_loser_records_a_censored_latency():
+    r = router(hedge_default_seconds=0.05)
+    assert asyncio.run(r.acall({'a': returning('from a', delay=1.0), 'b': returning('from b')})) == 'from b'
+    a = r.providers['a']
+    assert list(a.censored) == [True]
+    assert 0.05 <= a.latencies[0] < 1.0
+    assert a.calls == 0 and a.failures == 0
+
+def test_censored_latencies_keep_the_slow_tail_in_the_percentile():
+    r = router()
+    a = r.providers['a']
+    for _ in range(18):
+        a.record_success(0.1)
+    # The slowest calls were cancelled by hedges after 0.5s
+    for _ in range(2):
+        a.record_cancelled(0.5)
+    assert a.percentile(50) == pytest.approx(0.1)
+    assert a.percentile(95) == pytest.approx(0.5)
+    assert r.hedge_delay('a') == pytest.approx(0.5)
@@ -0,0 +1,81 @@
+"""
+Tests for hybrid retrieval: reciprocal rank fusion and the similarity
+threshold applied to BM25 hits.
+"""
+import random
+import numpy as np
+import pytest
+from backend.config import Config
+from backend.services.lexical_index import reciprocal_rank_fusion
+from backend.services.rag_engine import RAGEngine
+
+FILLER = ("river mountain forest valley meadow canyon glacier desert island harbor "
+          "lantern compass anchor saddle barrel ladder candle mirror pillow basket").split()
+
+@pytest.fixture
+def rag(monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_RETRIEVAL_MODE', 'hybrid')
+    monkeypatch.setattr(Config, 'RAG_VECTOR_SEARCH', 'topk')
+    monkeypatch.setattr(Config, 'DEDUP_ENABLED', False)
+    rng = random.Random(7)
+    chunks = [{'text': ' '.join(rng.choice(FILLER) for _ in range(30)), 'source': 'filler'} for _ in range(40)]
+    chunks.append({'text': 'photosynthesis converts light energy into chemical energy inside chloroplasts',
+                   'source': 'biology'})
+    chunks.append({'text': 'photosynthesis ' + ' '.join(rng.choice(FILLER) for _ in range(30)),
+                   'source': 'filler'})
+    engine = RAGEngine()
+    engine._index_source_chunks('test', chunks)
+    return engine
+
+def query_vector_for(rag, text):
+    return rag.generations.current.embedding_model.transform([text])[0]
+
+def test_rrf_ranks_items_found_by_both_lists_first():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=60)
+    assert fused[0][0] == 3
+    assert [item for item, _ in fused] == [3, 1, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+
+def test_rrf_scores_are_rank_based():
+    fused = dict(reciprocal_rank_fusion([['a', 'b']], k=10))
+    assert fused == {'a': pytest.approx(1 / 11), 'b': pytest.approx(1 / 12)}
+
+def test_lexical_only_hits_below_threshold_are_dropped(rag, monkeypatch):
+    monkeypatch.setattr(Config, 'SIMILARITY_THRESHOLD', 0.95)
+    generation = rag.generations.current
+    query_vector = query_vector_for(rag, 'photosynthesis converts light energy into chemical energy inside chloroplasts')
+    
+    results = rag._fuse_results(generation, 'photosynthesis', query_vector, [], top_k=5)
+    
+    # Both chunks mention the word, but only the one about it clears the floor
+    assert [chunk['source'] for chunk in results] == ['biology']
+    assert results[0]['similarity'] >= 0.95
+    assert 'lexical_score' in results[0]
+
+def test_lexical_only_hits_carry_similarity_when_kept(rag, monkeypatch):
+    monkeypatch.setattr(Config, 'SIMILARITY_THRESHOLD', 0.0)
+    generation = rag.generations.current
+    query_vector = query_vector_for(rag, 'photosynthesis')
+    
+    results = rag._fuse_results(generation, 'photosynthesis', query_vector, [], top_k=5)
+    
+    assert len(results) == 2
+    assert all('similarity' in chunk and 'fusion_score' in chunk for chunk in results)
+
+def test_search_results_all_clear_the_threshold(rag, monkeypatch):
+    threshold = 0.8
+    monkeypatch.setattr(Config, 'SIMILARITY_THRESHOLD', threshold)
+    monkeypatch.setattr(Config, 'RAG_EMBEDDING_DEADLINE_MS', 0)
+    
+    for query in ('photosynthesis', 'river forest lantern', 'chemical energy'):
+        for chunk in rag.search(query, top_k=5):
+            assert chunk['similarity'] >= threshold
+
+def test_zero_query_vector_keeps_bm25_hits(rag, monkeypatch):
+    monkeypatch.setattr(Config, 'SIMILARITY_THRESHOLD', 0.99)
+    generation = rag.generations.current
+    zero = np.zeros(generation.index.dim, dtype=np.float32)
+    
+    results = rag._fuse_results(generation, 'photosynthesis', zero, [], top_k=5)
+    
+    assert len(results) == 2
@@ -0,0 +1,92 @@
+"""
+Tests for reconciling the index with the ContentSource table and the
+environment-configured sources.
+"""
+import random
+import threading
+import pytest
+from flask import Flask
+from backend.config import Config
+from backend.models import db
+from backend.models.content import ContentSource
+from backend.services.index_generation import IndexGeneration
+from backend.services.rag_engine import RAGEngine
+
+WORDS = "atom bond charge electron ion isotope molecule neutron orbital proton reaction valence".split()
+ENV_PDF = 'https://example.com/notes.pdf'
+
+def make_chunks(label, count=4):
+    rng = random.Random(label)
+    return [{'text': ' '.join(rng.choice(WORDS) for _ in range(20)) + f' {label}{i}', 'source': label}
+            for i in range(count)]
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'PDF_URLS', [ENV_PDF])
+    monkeypatch.setattr(Config, 'YOUTUBE_VIDEOS', [])
+    monkeypatch.setattr(Config, 'INGEST_PARSE_WORKERS', 0)
+    monkeypatch.setattr(RAGEngine, '_load_env_pdf_chunks', lambda self, url, parse_pool=None: make_chunks(url))
+    monkeypatch.setattr(RAGEngine, '_load_source_chunks', lambda self, source, parse_pool=None: make_chunks(source.id))
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+def add_db_source(url):
+    source = ContentSource(source_type='pdf_url', source_url=url, title=url)
+    db.session.add(source)
+    db.session.commit()
+    return source
+
+def test_reconcile_keeps_env_sources(app):
+    source = add_db_source('https://example.com/db.pdf')
+    rag = RAGEngine()
+    rag.initialize()
+    expected = {source.id, f'env:pdf:{ENV_PDF}'}
+    assert set(rag.generations.current.sources) == expected
+    
+    assert rag.reconcile() is False
+    assert set(rag.generations.current.sources) == expected
+    assert rag.reconcile() is False
+    assert set(rag.generations.current.sources) == expected
+
+def test_reconcile_adds_and_drops_db_sources(app):
+    first = add_db_source('https://example.com/first.pdf')
+    rag = RAGEngine()
+    rag.initialize()
+    
+    second = add_db_source('https://example.com/second.pdf')
+    assert rag.reconcile() is True
+    assert set(rag.generations.current.sources) == {first.id, second.id, f'env:pdf:{ENV_PDF}'}
+    
+    db.session.delete(first)
+    db.session.commit()
+    assert rag.reconcile() is True
+    assert set(rag.generations.current.sources) == {second.id, f'env:pdf:{ENV_PDF}'}
+
+def test_reconcile_copies_a_generation_an_update_replaces(app, monkeypatch):
+    add_db_source('https://example.com/db.pdf')
+    rag = RAGEngine()
+    rag.initialize()
+    rag._index_source_chunks('upload', make_chunks('upload'))
+    new_source = add_db_source('https://example.com/new.pdf')
+    
+    # Publish a remove_source while reconcile is copying the generation it started from
+    original_copy = IndexGeneration.copy
+    raced = []
+    def copy_during_update(generation):
+        if not raced:
+            raced.append(True)
+            remover = threading.Thread(target=rag.remove_source, args=('upload',))
+            remover.start()
+            remover.join()
+        return original_copy(generation)
+    monkeypatch.setattr(IndexGeneration, 'copy', copy_during_update)
+    
+    assert rag.reconcile() is True
+    current = rag.generations.current
+    assert new_source.id in current.sources and 'upload' not in current.sources
+    assert len(current.chunks) == len(current.index) == len(current.lexical_index) > 0
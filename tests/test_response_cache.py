@@ -0,0 +1,79 @@
+"""
+Tests for response cache keys: distinct requests never share a key, and the
+key does not depend on which provider in the routing pool is preferred.
+Cache lookups run off the provider event loop.
+"""
+import asyncio
+import time
+import pytest
+from backend.config import Config
+from backend.services.llm_service import LLMService
+from backend.services.response_cache import ResponseCache, MemoryResponseTier, SQLiteResponseTier, response_cache_key
+
+def key(provider='openai', model='gpt', temperature=0.7, max_tokens=100, system='sys', context='ctx', user='q'):
+    return response_cache_key(provider, model, temperature, max_tokens, system, context, user)
+
+def test_same_request_same_key():
+    assert key() == key()
+
+@pytest.mark.parametrize('changed', [
+    {'provider': 'gemini'},
+    {'model': 'gpt-other'},
+    {'temperature': 0.2},
+    {'max_tokens': 101},
+    {'system': 'sys2'},
+    {'context': None},
+    {'user': 'q2'},
+])
+def test_any_field_changes_the_key(changed):
+    assert key(**changed) != key()
+
+def test_moving_text_between_fields_changes_the_key():
+    # Plain concatenation would make these identical
+    assert key(system='ab', context='c') != key(system='a', context='bc')
+    assert key(context='', user='question') != key(context='question', user='')
+
+def test_memory_and_sqlite_tiers_round_trip(tmp_path):
+    cache = ResponseCache([MemoryResponseTier(), SQLiteResponseTier(str(tmp_path / 'responses.sqlite'), 10, 3600)])
+    cache.put(key(), 'answer')
+    assert cache.get(key()) == 'answer'
+    assert cache.get(key(user='other')) is None
+
+def make_service(monkeypatch, preferred):
+    monkeypatch.setattr(Config, 'LLM_PROVIDER', preferred)
+    monkeypatch.setattr(Config, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(Config, 'LLM_ROUTING_ENABLED', True)
+    return LLMService()
+
+def test_request_key_covers_the_routing_pool_not_the_preferred_provider(monkeypatch):
+    openai_first = make_service(monkeypatch, 'openai')._request_key('sys', 'q', 'ctx', 100)
+    gemini_first = make_service(monkeypatch, 'gemini')._request_key('sys', 'q', 'ctx', 100)
+    assert openai_first == gemini_first
+    
+    monkeypatch.setattr(Config, 'GEMINI_MODEL', 'gemini-other')
+    assert make_service(monkeypatch, 'openai')._request_key('sys', 'q', 'ctx', 100) != openai_first
+
+class SlowCache:
+    """Response cache whose lookups block like a busy SQLite file"""
+    
+    def __init__(self, response):
+        self.response = response
+    
+    def get(self, key):
+        time.sleep(0.5)
+        return self.response
+
+def test_cache_lookups_do_not_block_the_event_loop(monkeypatch):
+    service = make_service(monkeypatch, 'openai')
+    service.response_cache = SlowCache('cached answer')
+    
+    async def main():
+        lookup = asyncio.ensure_future(service.agenerate_response('sys', 'q'))
+        start = time.perf_counter()
+        await asyncio.sleep(0.05)
+        ticked = time.perf_counter() - start
+        return await lookup, ticked
+    
+    response, ticked = asyncio.run(main())
+    assert response == 'cached answer'
+    assert ticked < 0.3
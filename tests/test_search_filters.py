@@ -0,0 +1,74 @@
+"""
+Tests for filtered search: source_id and source_type filters restrict
+vector, lexical and range retrieval to the matching sources, and a filter
+matching nothing returns no results.
+"""
+import random
+import pytest
+from backend.config import Config
+from backend.services.rag_engine import RAGEngine
+
+FILLER = ("river mountain forest valley meadow canyon glacier desert island harbor "
+          "lantern compass anchor saddle barrel ladder candle mirror pillow basket").split()
+ENV_PDF = 'env:pdf:https://example.com/notes.pdf'
+SOURCES = {'lecture': 'pdf_file', 'video': 'youtube', ENV_PDF: None}
+QUERY = 'photosynthesis chloroplast'
+
+# (RAG_RETRIEVAL_MODE, RAG_VECTOR_SEARCH)
+RETRIEVAL = [('vector', 'topk'), ('vector', 'range'), ('lexical', 'topk'), ('hybrid', 'topk'), ('hybrid', 'range')]
+
+@pytest.fixture(params=RETRIEVAL, ids=lambda params: '-'.join(params))
+def rag(request, monkeypatch):
+    mode, vector_search = request.param
+    monkeypatch.setattr(Config, 'RAG_RETRIEVAL_MODE', mode)
+    monkeypatch.setattr(Config, 'RAG_VECTOR_SEARCH', vector_search)
+    monkeypatch.setattr(Config, 'SIMILARITY_THRESHOLD', 0.0)
+    monkeypatch.setattr(Config, 'RAG_RANGE_MIN_SIMILARITY', 0.01)
+    monkeypatch.setattr(Config, 'DEDUP_ENABLED', False)
+    rng = random.Random(3)
+    engine = RAGEngine()
+    for source_key, source_type in SOURCES.items():
+        chunks = [{'text': ' '.join(rng.choice(FILLER) for _ in range(30)), 'source': source_key} for _ in range(8)]
+        chunks.append({'text': f'{QUERY} light energy notes from {source_key}', 'source': source_key})
+        engine._index_source_chunks(source_key, chunks, source_type=source_type)
+    return engine
+
+def sources_of(results):
+    return {chunk['source'] for chunk in results}
+
+def test_unfiltered_search_finds_every_source(rag):
+    assert sources_of(rag.search(QUERY, top_k=10)) == set(SOURCES)
+
+@pytest.mark.parametrize('filters, expected', [
+    ({'source_id': 'lecture'}, {'lecture'}),
+    ({'source_id': ['video', ENV_PDF]}, {'video', ENV_PDF}),
+    ({'source_type': 'video'}, {'video'}),
+    ({'source_type': 'pdf'}, {'lecture', ENV_PDF}),
+    ({'source_type': 'pdf_url'}, {ENV_PDF}),
+    ({'source_id': ['lecture', 'video'], 'source_type': 'pdf'}, {'lecture'})
+])
+def test_filters_keep_only_matching_sources(rag, filters, expected):
+    results = rag.search(QUERY, top_k=10, filters=filters)
+    assert sources_of(results) == expected
+    assert any(QUERY in chunk['text'] for chunk in results)
+
+@pytest.mark.parametrize('filters', [
+    {'source_id': 'missing'},
+    {'source_id': 'lecture', 'source_type': 'youtube'}
+])
+def test_filters_matching_no_source_return_nothing(rag, filters):
+    assert rag.search(QUERY, top_k=10, filters=filters) == []
+    assert rag.search_batch([QUERY, 'river'], top_k=10, filters=filters) == [[], []]
+
+def test_batch_search_applies_the_filter_to_every_query(rag):
+    results = rag.search_batch([QUERY, 'river mountain'], top_k=10, filters={'source_type': 'youtube'})
+    assert [sources_of(batch) for batch in results] == [{'video'}, {'video'}]
+
+def test_lexical_search_with_no_matching_term_in_the_filtered_sources_is_empty(monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_RETRIEVAL_MODE', 'lexical')
+    engine = RAGEngine()
+    engine._index_source_chunks('lecture', [{'text': 'photosynthesis in plants', 'source': 'lecture'}], source_type='pdf_file')
+    engine._index_source_chunks('video', [{'text': 'orbits of planets', 'source': 'video'}], source_type='youtube')
+    
+    assert sources_of(engine.search('photosynthesis')) == {'lecture'}
+    assert engine.search('photosynthesis', filters={'source_id': 'video'}) == []
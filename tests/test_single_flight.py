@@ -0,0 +1,104 @@
+"""
+Tests for request coalescing: identical concurrent calls share one result,
+and one error, without leaving stale entries behind.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from backend.services.single_flight import SingleFlight, AsyncSingleFlight, request_fingerprint
+
+def test_fingerprint_separates_parts():
+    assert request_fingerprint('ab', 'c') != request_fingerprint('a', 'bc')
+    assert request_fingerprint('a', 'b') == request_fingerprint('a', 'b')
+
+def run_concurrently(flight, fn, callers=5):
+    """Call flight.do from several threads while fn is held in flight; returns results or exceptions"""
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def leader_fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return fn()
+    
+    outcomes = [None] * callers
+    
+    def call(i):
+        try:
+            outcomes[i] = flight.do('key', leader_fn)
+        except Exception as e:
+            outcomes[i] = e
+    
+    threads = [threading.Thread(target=call, args=(0,))]
+    threads[0].start()
+    started.wait(5)
+    threads += [threading.Thread(target=call, args=(i,)) for i in range(1, callers)]
+    for thread in threads[1:]:
+        thread.start()
+    # Let the followers join the call before it completes
+    while flight.stats()['shared'] < callers - 1:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes, len(calls)
+
+def test_threads_share_one_call():
+    flight = SingleFlight('test')
+    outcomes, calls = run_concurrently(flight, lambda: 'result')
+    assert calls == 1
+    assert outcomes == ['result'] * 5
+    assert flight.stats() == {'calls': 5, 'shared': 4, 'in_flight': 0}
+
+def test_threads_all_get_the_error():
+    flight = SingleFlight('test')
+    error = RuntimeError('provider down')
+    
+    def fail():
+        raise error
+    
+    outcomes, calls = run_concurrently(flight, fail)
+    assert calls == 1
+    assert all(outcome is error for outcome in outcomes)
+    # A failed call is not remembered: the next caller tries again
+    assert flight.stats()['in_flight'] == 0
+    assert flight.do('key', lambda: 'recovered') == 'recovered'
+
+def test_async_callers_share_one_call_and_its_error():
+    flight = AsyncSingleFlight('test')
+    calls = []
+    
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise ValueError('bad request')
+    
+    async def main():
+        return await asyncio.gather(*(flight.do('key', fail) for _ in range(4)), return_exceptions=True)
+    
+    outcomes = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.stats()['in_flight'] == 0
+
+def test_async_cancelled_waiter_does_not_cancel_the_call():
+    flight = AsyncSingleFlight('test')
+    
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'done'
+    
+    async def main():
+        first = asyncio.ensure_future(flight.do('key', slow))
+        second = asyncio.ensure_future(flight.do('key', slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    
+    assert asyncio.run(main()) == 'done'
+    assert flight.stats()['calls'] == 2
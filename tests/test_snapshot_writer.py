@@ -0,0 +1,47 @@
+"""
+Tests for the single snapshot writer: one holder of the writer lock, and
+engines that are not the writer never write snapshots.
+"""
+import os
+import subprocess
+import sys
+from backend.services.index_snapshot import acquire_writer_role, request_index_update, index_update_requests
+from backend.services.rag_engine import RAGEngine
+
+def test_only_one_process_gets_the_writer_role(tmp_path):
+    lock = acquire_writer_role(str(tmp_path))
+    assert lock is not None
+    try:
+        other = subprocess.run(
+            [sys.executable, '-c',
+             'import sys; from backend.services.index_snapshot import acquire_writer_role; '
+             'sys.exit(0 if acquire_writer_role(sys.argv[1]) is None else 1)', str(tmp_path)],
+            cwd=os.path.dirname(os.path.dirname(__file__))
+        )
+        assert other.returncode == 0
+    finally:
+        lock.release()
+    
+    # Released (as at process exit), the role can be taken over
+    taken_over = acquire_writer_role(str(tmp_path))
+    assert taken_over is not None
+    taken_over.release()
+
+def test_followers_do_not_write_snapshots(tmp_path):
+    rag = RAGEngine()
+    rag.is_snapshot_writer = False
+    assert rag.save_index(str(tmp_path)) is None
+    assert not any(name.startswith('snapshot-') for name in os.listdir(tmp_path))
+
+def test_update_requests_are_distinguishable(tmp_path):
+    root = str(tmp_path)
+    assert index_update_requests(root) == (None, None)
+    
+    request_index_update(root=root)
+    after_reconcile = index_update_requests(root)
+    assert after_reconcile[0] is not None and after_reconcile[1] is None
+    
+    request_index_update(rebuild=True, root=root)
+    after_rebuild = index_update_requests(root)
+    assert after_rebuild[0] == after_reconcile[0]
+    assert after_rebuild[1] is not None
@@ -0,0 +1,113 @@
+"""
+Tests for VectorIndex search: results do not depend on the query's length,
+for every index type and compression, filtered or not; and copies share a
+read-only base while their own changes live in a delta.
+"""
+import numpy as np
+import pytest
+from backend.config import Config
+from backend.services.vector_index import VectorIndex
+
+@pytest.fixture(scope='module')
+def vectors():
+    return np.random.default_rng(11).random((2000, 32), dtype=np.float32)
+
+@pytest.mark.parametrize('index_type', ['flat', 'hnsw', 'ivf'])
+@pytest.mark.parametrize('compression', ['none', 'sq8'])
+def test_scaled_queries_get_the_same_results(vectors, index_type, compression):
+    index = VectorIndex(32, index_type=index_type, compression=compression)
+    index.add(list(range(len(vectors))), vectors)
+    queries = vectors[:3]
+    
+    distances, ids = index.search(queries, 5)
+    scaled_distances, scaled_ids = index.search(queries * 9.0, 5)
+    
+    assert np.array_equal(ids, scaled_ids)
+    assert np.allclose(distances, scaled_distances, atol=1e-4)
+    assert list(ids[:, 0]) == [0, 1, 2]
+
+def test_filtered_search_is_scale_invariant(vectors):
+    index = VectorIndex(32, index_type='flat')
+    index.add(list(range(len(vectors))), vectors)
+    subset = list(range(0, 200, 2))
+    
+    distances, ids = index.search(vectors[4] * 0.01, 3, subset=subset)
+    
+    assert ids[0, 0] == 4
+    assert distances[0, 0] == pytest.approx(0.0, abs=1e-5)
+    assert set(ids[0]) <= set(subset)
+
+def test_distances_match_search(vectors):
+    index = VectorIndex(32, index_type='flat')
+    index.add(list(range(len(vectors))), vectors)
+    distances, ids = index.search(vectors[7] * 3.0, 4)
+    
+    assert np.allclose(index.distances(vectors[7], ids[0]), distances[0], atol=1e-4)
+    assert np.isinf(index.distances(vectors[7], [999999])[0])
+
+def build(vectors, ids, index_type='flat'):
+    index = VectorIndex(32, index_type=index_type)
+    index.add(ids, vectors[ids])
+    return index
+
+def test_copies_share_the_base_and_keep_their_changes_apart(vectors):
+    original = build(vectors, list(range(500)))
+    clone = original.copy()
+    clone.add(list(range(500, 520)), vectors[500:520])
+    clone.remove([3, 4])
+    
+    assert clone.index is original.index
+    assert len(original) == 500 and len(clone) == 518
+    assert original.search(vectors[3], 1)[1][0, 0] == 3
+    assert original.search(vectors[510], 1)[1][0, 0] != 510
+    assert clone.search(vectors[510], 1)[1][0, 0] == 510
+    assert clone.search(vectors[3], 1)[1][0, 0] != 3
+    assert 3 in original and 3 not in clone and 510 in clone
+
+@pytest.mark.parametrize('subset', [None, list(range(0, 700, 3))])
+def test_search_over_a_delta_matches_a_fresh_index(vectors, subset):
+    clone = build(vectors, list(range(600))).copy()
+    clone.add(list(range(600, 700)), vectors[600:700])
+    clone.remove(list(range(0, 600, 7)))
+    # Re-adding a base ID replaces its vector with a delta one
+    clone.add([1], vectors[1000:1001])
+    
+    live = [i for i in range(700) if i % 7 or i >= 600]
+    fresh_vectors = vectors.copy()
+    fresh_vectors[1] = vectors[1000]
+    fresh = build(fresh_vectors, live)
+    queries = vectors[[1, 2, 650, 699]]
+    
+    distances, ids = clone.search(queries, 8, subset=subset)
+    fresh_distances, fresh_ids = fresh.search(queries, 8, subset=subset)
+    assert np.array_equal(ids, fresh_ids)
+    assert np.allclose(distances, fresh_distances, atol=1e-4)
+    
+    for (similarities, found), (fresh_similarities, fresh_found) in zip(
+            clone.range_search(queries, 0.8, 20, subset=subset), fresh.range_search(queries, 0.8, 20, subset=subset)):
+        assert np.array_equal(found, fresh_found)
+        assert np.allclose(similarities, fresh_similarities, atol=1e-4)
+    assert np.allclose(clone.distances(vectors[5], ids[0]), fresh.distances(vectors[5], ids[0]), atol=1e-4)
+
+def test_a_large_delta_is_folded_into_a_private_base(vectors, monkeypatch):
+    monkeypatch.setattr(Config, 'RAG_DELTA_MIN_ROWS', 0)
+    original = build(vectors, list(range(200)))
+    clone = original.copy()
+    clone.add(list(range(200, 230)), vectors[200:230])
+    
+    assert clone.index is not original.index
+    assert not len(clone._delta_ids) and len(clone) == 230
+    assert clone.search(vectors[220], 1)[1][0, 0] == 220
+    assert len(original) == 200 and original.index.ntotal == 200
+
+def test_saving_a_copy_writes_the_merged_index(vectors, tmp_path):
+    clone = build(vectors, list(range(300))).copy()
+    clone.add(list(range(300, 320)), vectors[300:320])
+    clone.remove([0, 1])
+    state = clone.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path), state, mmap=False)
+    
+    assert len(loaded) == len(clone) == 318
+    assert np.array_equal(loaded.search(vectors[:5], 4)[1], clone.search(vectors[:5], 4)[1])
+    # The copy itself keeps serving from its delta
+    assert len(clone._delta_ids) == 20